@@ -0,0 +1,547 @@
+""" Module to verify, configure and query an OSG installation from Python
+
+The functions here do the work of osg-configure -v, -c and -q, and list the
+system services a configuration needs, but return result objects instead of
+printing messages and exiting, so they can be called many times from a
+single process.
+"""
+
+import configparser
+import logging
+import os
+
+from osg_configure.modules import configfile
+from osg_configure.modules import configurescheduler
+from osg_configure.modules import configurestate
+from osg_configure.modules import exceptions
+from osg_configure.modules import moduleregistry
+from osg_configure.modules import profiling
+from osg_configure.modules import utilities
+from osg_configure.modules import validation
+
+__all__ = ['OUTPUT_DIRECTORY',
+           'DEFAULT_JOB_ENVIRONMENT_ATTRIBUTES',
+           'Result',
+           'VerifyResult',
+           'ConfigureResult',
+           'QueryResult',
+           'ServicesResult',
+           'load_snapshot',
+           'load_modules',
+           'verify',
+           'configure',
+           'query',
+           'enabled_services']
+
+OUTPUT_DIRECTORY = '/var/lib/osg'
+DEFAULT_JOB_ENVIRONMENT_ATTRIBUTES = ['OSG_SITE_NAME',
+                                      'OSG_HOSTNAME',
+                                      'OSG_GRID',
+                                      'OSG_APP',
+                                      'OSG_DATA',
+                                      'OSG_WN_TMP',
+                                      'OSG_SITE_READ',
+                                      'OSG_SITE_WRITE',
+                                      'OSG_SQUID_LOCATION',
+                                      'PATH']
+
+logger = logging.getLogger(__name__)
+
+
+class _RunFailed(Exception):
+    """Raised to end a verify or configure run"""
+
+    def __init__(self, message, exception=None):
+        super().__init__(message)
+        self.message = message
+        self.exception = exception
+
+
+class Result:
+    """
+    Base class for the results of the functions in this module; true if the
+    operation succeeded.  If it failed, error holds a message saying why, and
+    exception the underlying exception, if any.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.error = None
+        self.exception = None
+
+    def fail(self, message, exception=None):
+        """Mark the result as failed"""
+        self.ok = False
+        self.error = message
+        self.exception = exception
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.ok:
+            return "<%s ok>" % self.__class__.__name__
+        return "<%s failed: %s>" % (self.__class__.__name__, self.error)
+
+
+class VerifyResult(Result):
+    """
+    Result of verify(): attributes holds the attributes from every module,
+    checked_modules the names of the modules whose settings were checked
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.attributes = {}
+        self.checked_modules = []
+
+
+class ConfigureResult(Result):
+    """
+    Result of configure(): configured_modules holds the names of the modules
+    that were configured, skipped_modules the names of those that were not,
+    changed_files the files that were changed, and invalid_attributes is True
+    if the configuration did not verify but force was given
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.configured_modules = []
+        self.skipped_modules = []
+        self.changed_files = []
+        self.invalid_attributes = False
+
+
+class QueryResult(Result):
+    """
+    Result of query(): results holds a configfile.QueryResult for each option
+    found, not_found the patterns that did not match any option
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.results = []
+        self.not_found = []
+
+
+class ServicesResult(Result):
+    """
+    Result of enabled_services(): services holds the names of the system
+    services that the configuration needs enabled
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.services = set()
+
+
+def load_snapshot(config_dir=configfile.CONFIG_DIRECTORY, cache_file=None, previous=None):
+    """
+    Read and parse the config files in config_dir
+
+    Keyword arguments:
+    cache_file -- if given, the parsed files are loaded from and saved to it
+    previous -- an earlier ConfigSnapshot of config_dir; files that have
+                not changed since are not parsed again
+
+    Raises:
+    exceptions.Error -- the config files can't be read or are not valid
+    """
+    try:
+        with profiling.phase("config read"):
+            return configfile.ConfigSnapshot(config_directory=config_dir, cache_file=cache_file, previous=previous)
+    except IOError as e:
+        raise exceptions.Error("Can't read configuration files: %s" % e)
+
+
+def load_modules(names=None):
+    """
+    Return new instances of the configuration modules with the given names,
+    or of every module if names is None
+
+    Raises:
+    exceptions.Error -- a module does not exist or can't be loaded
+    """
+    if names is None:
+        infos = moduleregistry.MODULES
+    else:
+        infos = []
+        for name in names:
+            info = moduleregistry.find_module(name)
+            if info is None:
+                raise exceptions.Error("%s specified but that module is not present" % name)
+            infos.append(info)
+    try:
+        with profiling.phase("module discovery"):
+            return moduleregistry.load_modules(infos)
+    except ImportError as e:
+        raise exceptions.Error("Can't get configuration modules: %s" % e)
+
+
+def _parse_configurations(modules, snapshot):
+    """
+    Have every module parse its settings from the configuration snapshot.
+    LocalSettings gets the case-preserving view of the configuration since the
+    variables it sets go into the environment; every other module gets the
+    case-folded view.
+    """
+    for module in modules:
+        # so log messages name the files in this snapshot that set an option
+        module.config_snapshot = snapshot
+        try:
+            with profiling.phase("parse_configuration %s" % module.__class__.__name__):
+                if module.__class__.__name__ == 'LocalSettings':
+                    module.parse_configuration(snapshot.case_sensitive_config)
+                else:
+                    module.parse_configuration(snapshot.config)
+        except exceptions.SettingError as exception:
+            raise _RunFailed("Error in %s while parsing configuration" % module.__class__.__name__, exception)
+        except configparser.ParsingError as exception:
+            raise _RunFailed("Error while parsing configuration: %s" % exception)
+
+
+def _check_configuration(modules, attributes, force=False):
+    """
+    Check the parsed configuration to make sure that it will work; unless
+    force is True, stop at the first module whose check fails
+    """
+    if not modules:
+        logger.warning("No configuration modules found")
+        return False
+
+    status = True
+    for module in modules:
+        with profiling.phase("check_attributes %s" % module.__class__.__name__):
+            status &= module.check_attributes(attributes)
+        if (not status) and (not force):
+            break
+    return status
+
+
+def _job_environment_files(output_dir):
+    """
+    Return the paths of the files _write_job_environment() writes in
+    output_dir: the local job environment file and the job environment file
+    """
+    return (os.path.join(output_dir, "osg-local-job-environment.conf"),
+            os.path.join(output_dir, "osg-job-environment.conf"))
+
+
+def _write_job_environment(output_dir, all_attributes, local_site_attributes, job_environment_attributes_list,
+                           attribute_to_option_map):
+    """
+    Write out attributes to osg config files in output_dir.
+    There are two files: osg-job-environment.conf and
+    osg-local-job-environment.conf. Only local_site_attributes goes in
+    osg-local-job-environment.conf. An error will result if a key in
+    'job_environment_attributes_list' is missing from 'all_attributes'.
+    (Exception: OSG_SQUID_LOCATION)
+
+    :param all_attributes: OSG attributes from all .ini files, including the
+      local site attributes from the "Local Settings" section
+    :param local_site_attributes: the attributes from the "Local Settings" section
+    :param job_environment_attributes_list: The required job attributes to write
+    :param attribute_to_option_map: list of (section, name) tuples of the
+      config option that is mapped to each attribute; gives better error
+      messages if required attributes are missing from 'all_attributes'
+    """
+    local_filename, filename = _job_environment_files(output_dir)
+    try:
+        utilities.write_attribute_file(local_filename, local_site_attributes)
+    except IOError as exception:
+        raise _RunFailed("Error writing attributes to osg-local-job-environment.conf", exception)
+
+    try:
+        temp = {}
+        for key in job_environment_attributes_list:
+            try:
+                temp[key] = all_attributes[key]
+            except KeyError as exception:
+                if key == 'OSG_SQUID_LOCATION':
+                    continue
+                errmsg = "Missing job environment key (%s), exiting." % key
+                if key in attribute_to_option_map:
+                    errmsg += "\nThe job environment key may be specified as:\n"
+                    for section, name in attribute_to_option_map[key]:
+                        if section:
+                            errmsg += "Option %r in section %r\n" % (name, section)
+                        else:
+                            errmsg += "Option %r\n" % (name)
+                raise _RunFailed(errmsg, exception)
+        utilities.write_attribute_file(filename, temp)
+    except IOError as exception:
+        raise _RunFailed("Error writing attributes to osg-job-environment.conf", exception)
+
+
+def verify(config_dir=configfile.CONFIG_DIRECTORY, snapshot=None, previous_snapshot=None, module_objects=None):
+    """
+    Verify the configuration to make sure that it's sane and points to valid
+    information
+
+    Keyword arguments:
+    config_dir -- directory holding the config files
+    snapshot -- ConfigSnapshot to verify instead of reading config_dir
+    previous_snapshot -- if given, only check the modules whose config
+                         sections differ between it and the snapshot
+    module_objects -- module objects to use instead of new instances of
+                      every module
+
+    Returns:
+    a VerifyResult
+    """
+    result = VerifyResult()
+    try:
+        if snapshot is None:
+            snapshot = load_snapshot(config_dir)
+        modules = module_objects if module_objects is not None else load_modules()
+        if not modules:
+            raise _RunFailed("No modules found")
+
+        _parse_configurations(modules, snapshot)
+
+        modules_to_check = modules
+        if previous_snapshot is not None:
+            modules_to_check = [module for module in modules
+                                if (configurestate.module_input_hashes(module, snapshot.case_sensitive_config) !=
+                                    configurestate.module_input_hashes(module,
+                                                                       previous_snapshot.case_sensitive_config))]
+
+        for module in modules:
+            result.attributes.update(module.get_attributes())
+        result.checked_modules = [module.module_name() for module in modules_to_check]
+
+        if modules_to_check and not _check_configuration(modules_to_check, result.attributes):
+            raise _RunFailed("Invalid attributes found")
+    except _RunFailed as e:
+        result.fail(e.message, e.exception)
+    except exceptions.Error as e:
+        result.fail(str(e), e)
+    return result
+
+
+def configure(config_dir=configfile.CONFIG_DIRECTORY, output_dir=OUTPUT_DIRECTORY, modules=None, force=False,
+              full=False, jobs=configurescheduler.DEFAULT_WORKERS, state_file=configurestate.STATE_FILE,
+              snapshot=None, module_objects=None):
+    """
+    Configure the system from the config files
+
+    Keyword arguments:
+    config_dir -- directory holding the config files
+    output_dir -- directory to write the job environment files to
+    modules -- names of the modules to configure; if None, every module
+               whose config sections have changed since the last
+               successful run (or every module, if full is True)
+    force -- if True, configure even if verification fails
+    full -- if True, configure every module even if the config sections it
+            depends on have not changed since the last successful run, and
+            reconfigure services even if their configuration has not changed
+    jobs -- the maximum number of modules to configure at once
+    state_file -- file recording what each module was last configured with
+    snapshot -- ConfigSnapshot to use instead of reading config_dir
+    module_objects -- module objects to use instead of new instances of
+                      every module
+
+    Returns:
+    a ConfigureResult
+    """
+    result = ConfigureResult()
+    try:
+        _configure(result, config_dir, output_dir, modules, force, full, jobs, state_file, snapshot,
+                   module_objects)
+    except _RunFailed as e:
+        result.fail(e.message, e.exception)
+    except exceptions.Error as e:
+        result.fail(str(e), e)
+    return result
+
+
+def _configure(result, config_dir, output_dir, module_names, force, full, jobs, state_file, snapshot,
+               modules):
+    if snapshot is None:
+        snapshot = load_snapshot(config_dir)
+    if modules is None:
+        modules = load_modules()
+    if not modules:
+        raise _RunFailed("No modules found")
+    if not validation.valid_location(output_dir):
+        raise _RunFailed("Output directory %s not present" % output_dir)
+
+    config = snapshot.config
+    _parse_configurations(modules, snapshot)
+
+    all_attributes = {}
+    local_site_attributes = {}
+    attribute_to_option_map = {}
+    for module in modules:
+        if module.__class__.__name__ == 'LocalSettings':
+            local_site_attributes.update(module.get_attributes())
+
+        all_attributes.update(module.get_attributes())
+
+        section = module.config_section
+        for opt in module.options.values():
+            name, attribute = opt.name, opt.mapping
+            if attribute:
+                attribute_to_option_map[attribute] = attribute_to_option_map.get(attribute, []) + [(section, name)]
+
+    if not _check_configuration(modules, all_attributes, force):
+        if not force:
+            raise _RunFailed("Invalid attributes found")
+        logger.warning("Invalid attributes found but forcing configuration.")
+        result.invalid_attributes = True
+
+    if module_names is not None:
+        # check whether the modules we want to configure are present
+        present = [x.module_name().lower() for x in modules]
+        for name in module_names:
+            if name.lower() not in present:
+                raise _RunFailed("%s specified but that module is not present" % name)
+        module_names = [name.lower() for name in module_names]
+
+    configure_state = configurestate.ConfigureState(state_file=state_file)
+    modules_to_configure = []
+    for module in modules:
+        if module_names is not None:
+            if module.module_name().lower() not in module_names:
+                logger.debug("Skipping %s configuration" % (module.__class__.__name__))
+                result.skipped_modules.append(module.module_name())
+                continue
+        elif not full and not configure_state.module_changed(
+                module, configurestate.module_state(module, snapshot.case_sensitive_config)):
+            logger.debug("Skipping %s configuration: its config sections, rpms, and files have not "
+                         "changed since the last run" % (module.__class__.__name__))
+            result.skipped_modules.append(module.module_name())
+            continue
+        logger.debug("Configuring %s" % (module.__class__.__name__))
+        modules_to_configure.append(module)
+
+    # Stage the files the modules write and write them all at once at the
+    # end, so a failure part way through does not leave a half-configured
+    # system
+    utilities.clear_changed_files()
+    utilities.begin_transaction()
+    try:
+        results = configurescheduler.configure_modules(modules_to_configure,
+                                                       all_attributes, max_workers=jobs)
+        configured_modules = [entry for entry, ok in zip(modules_to_configure, results) if ok is not False]
+
+        if utilities.ce_installed():
+            job_environment_attributes_list = list(DEFAULT_JOB_ENVIRONMENT_ATTRIBUTES)
+            gateway_module = condor_module = None
+            for module in modules:
+                if module.__class__.__name__ == 'GatewayConfiguration':
+                    gateway_module = module
+                elif module.__class__.__name__ == 'CondorConfiguration':
+                    condor_module = module
+
+            if not configfile.jobmanager_enabled(config):
+                logger.warning("CE install detected, but no batch systems are enabled in "
+                               "any of the *.ini files. osg-configure will not configure "
+                               "any of the batch systems. This may lead to your CE being "
+                               "unable to run jobs.")
+            else:
+                if ((gateway_module and not gateway_module.htcondor_gateway_enabled) or
+                        (condor_module and not condor_module.enabled)):
+                    try:
+                        job_environment_attributes_list.remove('PATH')
+                        logger.info('Not setting PATH (not HTCondor-CE with Condor).')
+                    except ValueError:
+                        pass
+
+            with profiling.phase("attribute file writes"):
+                _write_job_environment(output_dir, all_attributes, local_site_attributes,
+                                       job_environment_attributes_list, attribute_to_option_map)
+
+            if gateway_module and gateway_module.htcondor_gateway_enabled:
+                # Reconfigure htcondor-ce after writing the attributes files
+                # so the job route expressions get re-evaluated and the changes go into effect
+                utilities.request_reconfig('condor-ce', 'condor_ce_reconfig',
+                                           paths=_job_environment_files(output_dir))
+        else:
+            logger.debug("Skipped writing job attributes (not a CE)")
+    except exceptions.ConfigureError as e:
+        utilities.rollback_transaction()
+        logger.debug("Got ConfigureError %s" % e)
+        raise _RunFailed("Can't configure module", e)
+    except:
+        utilities.rollback_transaction()
+        raise
+
+    with profiling.phase("commit"):
+        if not utilities.commit_transaction():
+            raise _RunFailed("Unable to write the configuration files; the previous versions were kept")
+    result.changed_files = utilities.changed_files()
+    for filename in result.changed_files:
+        logger.debug("Changed %s" % filename)
+
+    # Reconfigure the services whose configuration changed during this run
+    with profiling.phase("service reconfig"):
+        utilities.run_requested_reconfigs(force=full)
+
+    # Record the state after the commit, so it has the files as this run wrote them
+    for module in configured_modules:
+        configure_state.record(module, configurestate.module_state(module, snapshot.case_sensitive_config))
+        result.configured_modules.append(module.module_name())
+    if not configure_state.save():
+        logger.warning("Unable to save configuration state to %s; modules configured in this "
+                       "run will be configured again on the next run" % configure_state.state_file)
+
+
+def query(patterns, config_dir=configfile.CONFIG_DIRECTORY, snapshot=None):
+    """
+    Look up where options are set and what their values are
+
+    Arguments:
+    patterns -- list of options to look for given as section.option, or
+                just option to look in every section; section and option
+                can be glob patterns
+
+    Keyword arguments:
+    config_dir -- directory holding the config files
+    snapshot -- ConfigSnapshot to query instead of reading config_dir
+
+    Returns:
+    a QueryResult
+    """
+    result = QueryResult()
+    try:
+        if snapshot is None:
+            snapshot = load_snapshot(config_dir)
+    except exceptions.Error as e:
+        result.fail(str(e), e)
+        return result
+    result.results = snapshot.query(patterns)
+    found_patterns = set(x.pattern for x in result.results)
+    result.not_found = [pattern for pattern in patterns if pattern not in found_patterns]
+    return result
+
+
+def enabled_services(config_dir=configfile.CONFIG_DIRECTORY, snapshot=None, module_objects=None):
+    """
+    Find the system services that should be enabled for the configuration
+
+    Keyword arguments:
+    config_dir -- directory holding the config files
+    snapshot -- ConfigSnapshot to use instead of reading config_dir
+    module_objects -- module objects to use instead of new instances of
+                      every module
+
+    Returns:
+    a ServicesResult
+    """
+    result = ServicesResult()
+    try:
+        if snapshot is None:
+            snapshot = load_snapshot(config_dir)
+        modules = module_objects if module_objects is not None else load_modules()
+        if not modules:
+            raise _RunFailed("No modules found")
+
+        _parse_configurations(modules, snapshot)
+        for module in modules:
+            result.services |= module.enabled_services()
+    except _RunFailed as e:
+        result.fail(e.message, e.exception)
+    except exceptions.Error as e:
+        result.fail(str(e), e)
+    return result
@@ -5,12 +5,12 @@ configuration
 import errno
 import os
 import logging
-import subprocess
 import pwd
 import shutil
 import stat
 import re
 
+from osg_configure.modules import commandrunner
 from osg_configure.modules import utilities
 from osg_configure.modules import configfile
 from osg_configure.modules import validation
@@ -18,6 +18,10 @@ from osg_configure.modules.jobmanagerconfiguration import JobManagerConfiguratio
 
 __all__ = ['BoscoConfiguration']
 
+# how long to let bosco_cluster run; installing a cluster copies the
+# bosco software to the remote host
+BOSCO_CLUSTER_TIMEOUT = 1800
+
 
 class BoscoConfiguration(JobManagerConfiguration):
     """Class to handle attributes related to Bosco job manager configuration"""
@@ -206,6 +210,11 @@ class BoscoConfiguration(JobManagerConfiguration):
         self.log('BoscoConfiguration.configure completed')
         return True
         
+    def stage_writes(self):
+        """The remote cluster install uses the ssh key and config written
+        during configure()"""
+        return False
+
     def _installBosco(self, username):
         """
         Install Bosco on the remote cluster for a given username
@@ -260,13 +269,17 @@ class BoscoConfiguration(JobManagerConfiguration):
 
     def _run_bosco_cluster(self, user_gid, user_home, user_name, user_uid):
         # Function to demote to a specified uid and gid
-        def demote(uid, gid):
+        def demote(uid, gid, groups):
             def result():
+                os.setgroups(groups)
                 os.setgid(gid)
                 os.setuid(uid)
 
             return result
 
+        # look up the groups here; the preexec_fn should do as little as possible
+        user_groups = os.getgrouplist(user_name, user_gid)
+
         try:
 
             # Set the user home directory
@@ -281,11 +294,11 @@ class BoscoConfiguration(JobManagerConfiguration):
             if self.opt_val("install_cluster") == "if_needed":
                 # Only install if it's not in the clusterlist
                 cmd = [self.bosco_cluster, "-l"]
-                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                           preexec_fn=demote(user_uid, user_gid), env=env,
-                                           encoding="latin-1")
-                stdout, stderr = process.communicate()
-                returncode = process.returncode
+                result = commandrunner.run(cmd, timeout=BOSCO_CLUSTER_TIMEOUT, env=env,
+                                           preexec_fn=demote(user_uid, user_gid, user_groups))
+                if result.error is not None:
+                    raise OSError(result.error)
+                stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
                 if returncode == 2:
                     self.log("Bosco clusterlist empty", level=logging.DEBUG)
                 elif returncode == 0:
@@ -310,11 +323,11 @@ class BoscoConfiguration(JobManagerConfiguration):
             install_cmd += ["-a", endpoint, batch]
 
             self.log("Bosco command to execute: %s" % install_cmd, level=logging.DEBUG)
-            process = subprocess.Popen(install_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       preexec_fn=demote(user_uid, user_gid), env=env,
-                                       encoding="latin-1")
-            stdout, stderr = process.communicate()
-            returncode = process.returncode
+            result = commandrunner.run(install_cmd, timeout=BOSCO_CLUSTER_TIMEOUT, env=env,
+                                       preexec_fn=demote(user_uid, user_gid, user_groups))
+            if result.error is not None:
+                raise OSError(result.error)
+            stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
             if returncode:
                 self.log("Bosco installation command failed with exit code %i" % returncode, level=logging.ERROR)
                 self.log("stdout:\n%s" % stdout, level=logging.ERROR)
@@ -139,8 +139,7 @@ class CondorConfiguration(JobManagerConfiguration):
             self.write_binpaths_to_blah_config('condor', self.condor_bin_location)
             self.write_htcondor_ce_sentinel()
 
-        if not utilities.reconfig_service('condor', 'condor_reconfig'):
-            self.log('Error reloading condor config', level=logging.WARNING)
+        utilities.request_reconfig('condor', 'condor_reconfig')
 
         self.warn_on_non_default_local_config_dir()
 
@@ -155,6 +154,13 @@ class CondorConfiguration(JobManagerConfiguration):
         """Return a boolean that indicates whether this module can be configured separately"""
         return True
 
+    def shared_resources(self):
+        # reads the HTCondor config and asks for condor to be reconfigured
+        return super().shared_resources() | {utilities.HTCONDOR_CONFIG_PATH}
+
+    def input_rpms(self):
+        return super().input_rpms() | {'htcondor-ce'}
+
     def setup_htcondor_ce_config(self):
         """
         Populate the config file that tells htcondor-ce where the condor
@@ -169,6 +175,14 @@ class CondorConfiguration(JobManagerConfiguration):
         def get_condor_ce_config_val(variable):
             return utilities.get_condor_config_val(variable, executable='condor_ce_config_val', quiet_undefined=True)
 
+        # Look up everything we need with one run each of condor_config_val
+        # and condor_ce_config_val
+        utilities.condor_config_view().prefetch(['SCHEDD_NAME', 'FULL_HOSTNAME', 'COLLECTOR_HOST', 'SPOOL',
+                                                 'COLLECTOR_PORT', 'LOCAL_CONFIG_DIR'])
+        utilities.condor_config_view('condor_ce_config_val').prefetch(['JOB_ROUTER_SCHEDD2_NAME',
+                                                                       'JOB_ROUTER_SCHEDD2_POOL',
+                                                                       'JOB_ROUTER_SCHEDD2_SPOOL'])
+
         # Get values for the settings we want to update. We can get the
         # values from condor_config_val; in the case of JOB_ROUTER_SCHEDD2_NAME,
         # we have FULL_HOSTNAME as a fallback in case SCHEDD_NAME is missing.
@@ -297,7 +297,7 @@ in your config.ini file."""
             probe = 'gridftp-transfer'
 
         try:
-            buf = open(probe_file, "r", encoding="latin-1").read()
+            buf = utilities.current_contents(probe_file)
             buf = self.replace_setting(buf, 'ProbeName', "%s:%s" % (probe, local_host))
             buf = self.replace_setting(buf, 'SiteName', local_resource)
             buf = self.replace_setting(buf, 'Grid', self.grid_group)
@@ -327,6 +327,33 @@ in your config.ini file."""
         """Return a boolean that indicates whether this module can be configured separately"""
         return False
 
+    def input_sections(self, configuration):
+        """Return a set with the names of the config sections this module's
+        configuration depends on"""
+        # resource and host_name come from the Site Information attributes
+        return {self.config_section, 'Site Information', 'Condor'}
+
+    def shared_resources(self):
+        """Return a set with the files and services that configure() changes
+        that other modules may change as well"""
+        # the probe's history directory comes from the HTCondor or HTCondor-CE config
+        return {utilities.HTCONDOR_CONFIG_PATH, utilities.HTCONDOR_CE_CONFIG_PATH}
+
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        # requirements_are_installed()
+        return {'htcondor-ce'} | set(CE_PROBE_RPMS)
+
+    def output_files(self):
+        """Return a set with the paths of the files configure() writes"""
+        files = set(GRATIA_CONFIG_FILES.values())
+        try:
+            files.update(self.get_installed_probe_config_files_by_probe().values())
+        except EnvironmentError:
+            pass
+        return files
+
     def _check_servers(self):
         """
         Returns True or False depending whether the server_list is a valid list
@@ -379,6 +406,9 @@ in your config.ini file."""
             else:
                 self.enabled_probe_hosts[probe_name] = ':'.join(tmp[1:])
 
+        # _check_servers() needs to know whether these resolve
+        validation.prefetch_domains([host.split(':')[0] for host in self.enabled_probe_hosts.values()])
+
     def _configure_default_ce(self, configuration):
         """
         Configure gratia for a ce which does not have the gratia section
@@ -422,7 +452,7 @@ in your config.ini file."""
         Set to suppress grid local jobs (pre-routed jobs)
         """
         config_location = GRATIA_CONFIG_FILES['htcondor-ce']
-        buf = open(config_location, "r", encoding="latin-1").read()
+        buf = utilities.current_contents(config_location)
         buf = self.replace_setting(buf, 'SuppressGridLocalRecords', '1')
         
         if not utilities.atomic_write(config_location, buf):
@@ -1,11 +1,12 @@
 """This module provides a class to handle configuration
  for CE collector info services"""
 
+import importlib.util
 import re
 from configparser import ConfigParser
-import subprocess
 import logging
 
+from osg_configure.modules import commandrunner
 from osg_configure.modules import exceptions
 from osg_configure.modules import utilities
 from osg_configure.modules import configfile
@@ -24,10 +25,12 @@ BAN_VOMS_MAPFILE = reversevomap.BAN_MAPFILE
 BAN_MAPFILE = '/etc/grid-security/ban-mapfile'
 
 
+# The HTCondor bindings are only imported if extra_transforms need them, so
+# just check that they're there
 try:
-    import classad
-except ImportError:
-    classad = None
+    HAVE_CLASSAD = importlib.util.find_spec('classad') is not None
+except (ImportError, ValueError):
+    HAVE_CLASSAD = False
 
 
 class InfoServicesConfiguration(BaseConfiguration):
@@ -55,6 +58,8 @@ class InfoServicesConfiguration(BaseConfiguration):
         self.htcondor_gateway_enabled = None
         self.authorization_method = None
         self.configuration = None
+        self.section_index = None
+        self.needs_classad = False
         self.ce_attributes_str = ""
 
         self.log("InfoServicesConfiguration.__init__ completed")
@@ -110,8 +115,12 @@ class InfoServicesConfiguration(BaseConfiguration):
         self.htcondor_gateway_enabled = configuration.get('Gateway', 'htcondor_gateway_enabled', fallback=False)
 
         self.configuration = configuration  # save for later: the ce_attributes module reads the whole config.
+        self.section_index = subcluster.SectionIndex(configuration)
+        # only extra_transforms need the HTCondor bindings
+        self.needs_classad = any(configuration.get(section, 'extra_transforms', fallback='').strip()
+                                 for section in self.section_index.sections)
 
-        if utilities.ce_installed() and not subcluster.check_config(configuration):
+        if utilities.ce_installed() and not subcluster.check_config(configuration, self.section_index):
             self.log("On a CE but no valid 'Subcluster', 'Resource Entry', or 'Pilot' sections defined."
                      " This is required to advertise the capabilities of your cluster to the central collector."
                      " Jobs may not be sent to this CE.",
@@ -119,11 +128,12 @@ class InfoServicesConfiguration(BaseConfiguration):
             raise exceptions.SettingError("No Subcluster, Resource Entry, or Pilot sections")
 
         # Check resource catalog
-        # This is a bit clunky to parse it here and not use the result in
-        # configure(), but at this point we don't have a way of knowing what
-        # default_allowed_vos should be.
-        if self.ce_collector_required_rpms_installed and self.htcondor_gateway_enabled and classad is not None:
-            subcluster.resource_catalog_from_config(configuration, default_allowed_vos=["*"])
+        # Build the catalog here to validate the subcluster sections; it is
+        # built with the same default_allowed_vos as ce_attributes uses in
+        # configure(), so that call gets the remembered result.
+        if (self.ce_collector_required_rpms_installed and self.htcondor_gateway_enabled and
+                (HAVE_CLASSAD or not self.needs_classad)):
+            subcluster.resource_catalog_from_config(configuration, default_allowed_vos=[], index=self.section_index)
 
         self.log('InfoServicesConfiguration.parse_configuration completed')
 
@@ -144,18 +154,24 @@ class InfoServicesConfiguration(BaseConfiguration):
             return True
 
         if self.ce_collector_required_rpms_installed and self.htcondor_gateway_enabled:
-            if classad is None:
-                self.log("Cannot configure HTCondor CE info services: unable to import HTCondor Python bindings."
+            if self.needs_classad and not HAVE_CLASSAD:
+                self.log("Cannot configure HTCondor CE info services: extra_transforms is set, which needs the"
+                         " HTCondor Python bindings, and they can't be imported."
                          "\nEnsure the 'classad' Python module is installed and accessible to Python scripts."
                          "\nIf using HTCondor from RPMs, install the 'python3-condor' RPM."
                          "\nIf not, you may need to add the directory containing the Python bindings to PYTHONPATH."
                          "\nHTCondor version must be at least 8.2.0.", level=logging.WARNING)
             else:
                 try:
-                    self.ce_attributes_str = ce_attributes.get_ce_attributes_str(self.configuration)
+                    self.ce_attributes_str = ce_attributes.get_ce_attributes_str(self.configuration,
+                                                                                 self.section_index)
                 except exceptions.SettingError as err:
                     self.log("Error in info services configuration: %s" % err, level=logging.ERROR)
                     return False
+                # formatting the catalog again to measure it is not free for
+                # sites with many entries, so only do it when debugging
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self._log_resource_catalog_size()
                 self._configure_ce_collector()
 
         self.log("InfoServicesConfiguration.configure completed")
@@ -170,6 +186,32 @@ class InfoServicesConfiguration(BaseConfiguration):
         configured separately"""
         return False
 
+    def input_sections(self, configuration):
+        """Return a set with the names of the config sections this module's
+        configuration depends on"""
+        # the CE attributes are made from the batch system sections and the
+        # Subcluster, Resource Entry and Pilot sections
+        sections = {self.config_section, 'Site Information', 'Gateway', 'BOSCO'}
+        sections.update(ce_attributes.BATCH_SYSTEMS)
+        sections.update(subcluster.SectionIndex(configuration).sections)
+        return sections
+
+    def shared_resources(self):
+        """Return a set with the files and services that configure() changes
+        that other modules may change as well"""
+        # writes the CE collector config and reads it back with condor_ce_config_val
+        return {utilities.HTCONDOR_CE_CONFIG_PATH}
+
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        # utilities.rpm_installed('htcondor-ce') and utilities.ce_installed()
+        return {'htcondor-ce', 'osg-ce', 'osg-htcondor-ce'}
+
+    def output_files(self):
+        """Return a set with the paths of the files configure() writes"""
+        return {CE_COLLECTOR_ATTRIBUTES_FILE, CE_COLLECTOR_CONFIG_FILE}
+
     def enabled_services(self):
         """
         Return a list of  system services needed for module to work
@@ -199,6 +241,16 @@ class InfoServicesConfiguration(BaseConfiguration):
                 self.log("Generated OSG_ResourceCatalog is overridden by %s" % resourcecatalog_location,
                          level=logging.WARNING)
 
+    def _log_resource_catalog_size(self):
+        """Log how big OSG_ResourceCatalog is in the config and in the ad
+        advertised to the collectors"""
+        resource_catalog = subcluster.resource_catalog_from_config(self.configuration, default_allowed_vos=[],
+                                                                   index=self.section_index)
+        sizes = resource_catalog.size_report()
+        self.log("OSG_ResourceCatalog has %d entries: %d bytes of config; the advertised attribute is %d bytes"
+                 % (len(resource_catalog.entries), sizes['config'], sizes['advertised']),
+                 level=logging.DEBUG)
+
     def _write_ce_collector_attributes_file(self, attributes_file):
         """Write config file that contains the osg attributes for the
         CE-Collector to advertise
@@ -234,19 +286,17 @@ CONDOR_VIEW_HOST = %s
 
         """
         errlevel = logging.ERROR
-        try:
-            process = subprocess.Popen(['condor_ce_config_val', '-verbose', 'OSG_ResourceCatalog'],
-                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       encoding="latin-1")
-            output, error = process.communicate()
-            if process.returncode != 0:
-                if not (error and error.startswith('Not defined:')):
-                    self.log('condor_ce_config_val OSG_ResourceCatalog failed; exit %d; error %s' % (
-                    process.returncode, error),
-                             level=errlevel)
-                return None
-        except OSError as err:
-            self.log('Could not run condor_ce_config_val: %s' % str(err), level=errlevel)
+        result = commandrunner.run(['condor_ce_config_val', '-verbose', 'OSG_ResourceCatalog'],
+                                   timeout=utilities.QUERY_TIMEOUT)
+        if result.error is not None:
+            self.log('Could not run condor_ce_config_val: %s' % result.error, level=errlevel)
+            return None
+        output, error = result.stdout, result.stderr
+        if result.returncode != 0:
+            if not (error and error.startswith('Not defined:')):
+                self.log('condor_ce_config_val OSG_ResourceCatalog failed; exit %d; error %s' % (
+                result.returncode, error),
+                         level=errlevel)
             return None
         output = output.strip()
         match = re.search(r'# at: (\S+), line \d+', output)
@@ -1,5 +1,6 @@
 """ Module to handle attributes and configuration for RSV service """
 
+import io
 import os
 import re
 import shutil
@@ -15,6 +16,10 @@ from osg_configure.modules.baseconfiguration import BaseConfiguration
 
 __all__ = ['RsvConfiguration']
 
+CONDOR_CRON_SYSCONFIG = "/etc/sysconfig/condor-cron"
+CONDOR_CRON_LOCATION_CONFIG = "/etc/condor-cron/config.d/condor_location"
+CONDOR_CRON_IDS_CONFIG = "/etc/condor-cron/config.d/condor_ids"
+
 
 class RsvConfiguration(BaseConfiguration):
     """Class to handle attributes and configuration related to osg-rsv services"""
@@ -305,6 +310,33 @@ class RsvConfiguration(BaseConfiguration):
         """Return a boolean that indicates whether this module can be configured separately"""
         return True
 
+    def stage_writes(self):
+        """rsv-control reads the files written during configure()"""
+        return False
+
+    def input_sections(self, configuration):
+        """Return a set with the names of the config sections this module's
+        configuration depends on"""
+        return {self.config_section, 'Site Information', 'Gateway', 'Misc Services'}
+
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        return {'rsv-core', 'rsv-consumers-zabbix'}
+
+    def output_files(self):
+        """Return a set with the paths of the files configure() writes"""
+        files = {self.rsv_conf,
+                 os.path.join(self.rsv_conf_dir, 'consumers/nagios-consumer.conf'),
+                 os.path.join(self.rsv_conf_dir, 'consumers/zabbix-consumer.conf'),
+                 CONDOR_CRON_SYSCONFIG,
+                 CONDOR_CRON_LOCATION_CONFIG,
+                 CONDOR_CRON_IDS_CONFIG}
+        if self.htcondor_gateway_enabled:
+            files.update(os.path.join(self.rsv_metrics_dir, host, "allmetrics.conf")
+                         for host in self._htcondor_ce_hosts)
+        return files
+
     def _check_gridftp_settings(self):
         """ Check gridftp settings and make sure they are valid """
         status_check = self._validate_host_list(self._gridftp_hosts, "gridftp_hosts")
@@ -737,30 +769,31 @@ class RsvConfiguration(BaseConfiguration):
 
         # Put the location into the condor-cron-env.sh file so that the condor-cron
         # wrappers and init script have the binaries in their PATH
-        sysconf_file = "/etc/sysconfig/condor-cron"
-        try:
-            sysconf = open(sysconf_file, 'w')
-            if self.options['condor_location'].value:
-                sysconf.write("PATH=%s/bin:%s/sbin:$PATH\n" % (condor_dir,
-                                                               condor_dir))
-                sysconf.write("export PATH\n")
-            sysconf.close()
-            self.log("Wrote %s", sysconf_file, level=logging.DEBUG)
-        except IOError as err:
-            self.log("Error trying to write to file (%s): %s" % (sysconf_file, err))
-            raise exceptions.ConfigureError
+        sysconf_file = CONDOR_CRON_SYSCONFIG
+        contents = ""
+        if self.options['condor_location'].value:
+            contents = "PATH=%s/bin:%s/sbin:$PATH\nexport PATH\n" % (condor_dir, condor_dir)
+        self._write_file(sysconf_file, contents)
 
         # Adjust the Condor-Cron configuration
-        conf_file = "/etc/condor-cron/config.d/condor_location"
-        try:
-            config = open(conf_file, 'w')
-            if self.options['condor_location'].value:
-                config.write("RELEASE_DIR = %s" % condor_dir)
-            config.close()
-            self.log("Wrote %s", conf_file, level=logging.DEBUG)
-        except IOError as err:
-            self.log("Error trying to write to file (%s): %s" % (conf_file, err))
+        conf_file = CONDOR_CRON_LOCATION_CONFIG
+        contents = ""
+        if self.options['condor_location'].value:
+            contents = "RELEASE_DIR = %s" % condor_dir
+        self._write_file(conf_file, contents)
+
+    def _write_file(self, path, contents):
+        """Write contents to path with atomic_write, raising ConfigureError if that fails"""
+        if not utilities.atomic_write(path, contents):
+            self.log("Error trying to write to file (%s)" % path, level=logging.ERROR)
             raise exceptions.ConfigureError
+        self.log("Wrote %s", path, level=logging.DEBUG)
+
+    def _write_config(self, path, config):
+        """Write the contents of a ConfigParser to path, raising ConfigureError if that fails"""
+        buf = io.StringIO()
+        config.write(buf)
+        self._write_file(path, buf.getvalue())
 
     def _validate_host_list(self, hosts, setting):
         """ Validate a list of hosts """
@@ -797,12 +830,7 @@ class RsvConfiguration(BaseConfiguration):
 
     def _write_rsv_conf(self, config):
         """Write the contents of a ConfigParser back to the rsv.conf file"""
-        config_fp = open(self.rsv_conf, 'w')
-        try:
-            config.write(config_fp)
-            self.log("Wrote %s", self.rsv_conf, level=logging.DEBUG)
-        finally:
-            config_fp.close()
+        self._write_config(self.rsv_conf, config)
 
     def _configure_cert_info(self):
         """ Configure certificate information """
@@ -880,16 +908,7 @@ class RsvConfiguration(BaseConfiguration):
             config.add_section('allmetrics')
         config.set('allmetrics', 'ce-type', 'htcondor-ce')
 
-        config_fp = open(allmetrics_conf_path, 'w')
-        try:
-            try:
-                config.write(config_fp)
-                self.log("Wrote %s", allmetrics_conf_path, level=logging.DEBUG)
-            except EnvironmentError as err:
-                self.log("Error writing to %s: %s" % (allmetrics_conf_path, str(err)), level=logging.ERROR)
-                raise exceptions.ConfigureError
-        finally:
-            config_fp.close()
+        self._write_config(allmetrics_conf_path, config)
 
     def _configure_consumers(self):
         """ Enable the appropriate consumers """
@@ -953,10 +972,7 @@ class RsvConfiguration(BaseConfiguration):
 
         config.set("nagios-consumer", "args", args)
 
-        config_fp = open(nagios_conf_file, 'w')
-        config.write(config_fp)
-        config_fp.close()
-        self.log("Wrote %s", nagios_conf_file, level=logging.DEBUG)
+        self._write_config(nagios_conf_file, config)
 
     def _configure_zabbix_files(self):
         """ Store the zabbix configuration """
@@ -980,10 +996,7 @@ class RsvConfiguration(BaseConfiguration):
 
         config.set("zabbix-consumer", "args", args)
 
-        config_fp = open(zabbix_conf_file, 'w')
-        config.write(config_fp)
-        config_fp.close()
-        self.log("Wrote %s", zabbix_conf_file, level=logging.DEBUG)
+        self._write_config(zabbix_conf_file, config)
 
     def load_rsv_meta_files(self):
         """ All the RSV meta files are in INI format.  Pull them in so that we know what
@@ -1120,7 +1133,7 @@ class RsvConfiguration(BaseConfiguration):
 
         """
         # check the uid/gid in the condor_ids file
-        condor_id_fname = "/etc/condor-cron/config.d/condor_ids"
+        condor_id_fname = CONDOR_CRON_IDS_CONFIG
         ids = open(condor_id_fname, "r", encoding="latin-1").read()
         id_regex = re.compile(r'^\s*CONDOR_IDS\s+=\s+(\d+)\.(\d+).*', re.MULTILINE)
         condor_ent = pwd.getpwnam('cndrcron')
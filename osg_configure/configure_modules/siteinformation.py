@@ -75,6 +75,8 @@ class SiteInformation(BaseConfiguration):
                              "site_policy",
                              "sponsor",
                          ])
+        # check_attributes() needs to know whether host_name resolves
+        validation.prefetch_domains([self.opt_val("host_name")])
         self.log('SiteInformation.parse_configuration completed')
 
     # pylint: disable-msg=W0613
@@ -149,6 +149,11 @@ class SquidConfiguration(BaseConfiguration):
         """Return a boolean that indicates whether this module can be configured separately"""
         return True
 
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        return {'htcondor-ce', 'frontier-squid'}
+
     def get_attributes(self, converter=str):
         """
         Get attributes for the osg attributes file using the dict in self.options
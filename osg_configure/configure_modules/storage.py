@@ -174,6 +174,12 @@ class StorageConfiguration(BaseConfiguration):
         """Return a boolean that indicates whether this module can be configured separately"""
         return True
 
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        # utilities.gateway_installed()
+        return {'htcondor-ce'}
+
     def _app_dir_in_oasis(self, app_dir):
         return app_dir.startswith('/cvmfs/oasis.opensciencegrid.org')
 
@@ -0,0 +1,122 @@
+""" Module to verify the configuration of many hosts at once
+
+Each config directory (laid out like /etc/osg/config.d) is verified in a
+separate worker process.  Verification has no side effects: files the
+modules would write are staged and thrown away, and the probes of the host
+(installed rpms, HTCondor configuration, paths, users and DNS) are answered
+from a host profile instead of the machine running the verification.
+"""
+
+import concurrent.futures
+import logging
+import os
+import time
+
+from osg_configure import api
+from osg_configure.modules import hostprofile
+from osg_configure.modules import utilities
+
+__all__ = ['verify_tree',
+           'verify_trees']
+
+logger = logging.getLogger(__name__)
+
+
+class _RecordingHandler(logging.Handler):
+    """Handler that keeps the messages logged while verifying a tree"""
+
+    def __init__(self, level=logging.WARNING):
+        super().__init__(level)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append({'level': record.levelname,
+                              'message': record.getMessage()})
+
+
+def _init_worker(profile):
+    """Set up a worker process to verify trees against profile"""
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.setLevel(logging.WARNING)
+    profile.install()
+
+
+def verify_tree(config_dir):
+    """
+    Verify the config files in config_dir, without writing anything
+
+    Returns:
+    a dict with config_dir, ok, error, checked_modules, messages (the
+    warnings and errors logged, as dicts with level and message) and
+    wall_time
+    """
+    start = time.perf_counter()
+    handler = _RecordingHandler()
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    utilities.begin_transaction()
+    try:
+        result = api.verify(config_dir)
+    except Exception as err:  # reported with the tree instead of ending the run
+        result = api.VerifyResult()
+        result.fail("Unexpected error: %s" % err, err)
+    finally:
+        utilities.rollback_transaction()
+        utilities.clear_changed_files()
+        root_logger.removeHandler(handler)
+    error = result.error
+    if result.exception is not None and str(result.exception) not in error:
+        error = "%s: %s" % (error, result.exception)
+    return {'config_dir': config_dir,
+            'ok': result.ok,
+            'error': error,
+            'checked_modules': result.checked_modules,
+            'messages': handler.messages,
+            'wall_time': time.perf_counter() - start}
+
+
+def verify_trees(config_dirs, profile_file=None, max_workers=None):
+    """
+    Verify the config files in each of config_dirs, on a pool of worker
+    processes
+
+    Arguments:
+    config_dirs -- list of config directories to verify
+
+    Keyword arguments:
+    profile_file -- JSON host profile (see hostprofile.HostProfile) that
+                    answers the host probes; if None, no rpms are installed,
+                    HTCondor defines no variables, and the path, user and
+                    DNS checks pass
+    max_workers -- the number of worker processes; defaults to the number
+                   of CPUs
+
+    Returns:
+    a report dict with ok (True if every tree verified), failed (the trees
+    that did not), trees (the result of verify_tree() for each tree, in the
+    order of config_dirs) and wall_time
+
+    Raises:
+    exceptions.Error -- the profile file can't be read
+    """
+    start = time.perf_counter()
+    if profile_file is None:
+        profile = hostprofile.HostProfile()
+    else:
+        profile = hostprofile.HostProfile.load(profile_file)
+    config_dirs = [os.path.abspath(x) for x in config_dirs]
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(config_dirs)))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                                initargs=(profile,)) as executor:
+        trees = list(executor.map(verify_tree, config_dirs))
+
+    failed = [tree['config_dir'] for tree in trees if not tree['ok']]
+    return {'ok': not failed,
+            'failed': failed,
+            'trees': trees,
+            'wall_time': time.perf_counter() - start}
@@ -26,6 +26,8 @@ class BaseConfiguration:
         self.enabled = False
         self.options = {}
         self.config_section = ""
+        # the ConfigSnapshot the configuration was parsed from, if known
+        self.config_snapshot = None
 
     def set_status(self, configuration):
         """
@@ -77,6 +79,36 @@ class BaseConfiguration:
         """Return a string with the name of the module"""
         return "BaseConfiguration"
 
+    # pylint: disable-msg=W0613
+    def input_sections(self, configuration):
+        """Return a set with the names of the config sections this module's
+        configuration depends on; configure() does not need to be rerun
+        if none of them have changed"""
+        return {self.config_section}
+
+    def input_rpms(self):
+        """Return a set with the names of the rpms whose presence changes
+        what configure() does"""
+        return set()
+
+    def output_files(self):
+        """Return a set with the paths of the files configure() writes;
+        configure() is rerun if any of them was changed by something else,
+        so a module that writes files must list all of them"""
+        return set()
+
+    def shared_resources(self):
+        """Return a set with the files and services that configure() changes
+        that other modules may change as well; modules that share any of
+        them are never configured at the same time"""
+        return set()
+
+    def stage_writes(self):
+        """Return True if the files configure() writes can be staged and
+        written together at the end of the run; modules that run commands
+        which read the files they have just written must return False"""
+        return True
+
     def separately_configurable(self):
         """Return a boolean that indicates whether this module can be configured separately"""
         return False
@@ -102,8 +134,10 @@ class BaseConfiguration:
         exception = kwargs.get('exception', False)
         message = ""
         if 'option' in kwargs and 'section' in kwargs:
-            file_location = configfile.get_option_location(kwargs['option'],
-                                                           kwargs['section'])
+            if self.config_snapshot is not None:
+                file_location = self.config_snapshot.get_option_location(kwargs['option'], kwargs['section'])
+            else:
+                file_location = configfile.get_option_location(kwargs['option'], kwargs['section'])
             if file_location is not None:
                 message = "Option '%s' in section '%s' located in %s: " % (kwargs['option'],
                                                                            kwargs['section'],
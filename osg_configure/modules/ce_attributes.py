@@ -68,13 +68,14 @@ def get_batch_systems_from_config(config: ConfigParser) -> str:
     return utilities.classad_quote(",".join(sorted(batch_systems)))
 
 
-def get_resource_catalog_from_config(config: ConfigParser) -> str:
-    return subcluster.resource_catalog_from_config(config, default_allowed_vos=[]).format_value()
+def get_resource_catalog_from_config(config: ConfigParser, index: subcluster.SectionIndex = None) -> str:
+    return subcluster.resource_catalog_from_config(config, default_allowed_vos=[], index=index).format_value()
 
 
-def get_attributes(config: ConfigParser) -> Dict[str, str]:
+def get_attributes(config: ConfigParser, index: subcluster.SectionIndex = None) -> Dict[str, str]:
     """Turn config from .ini files into a dict of condor settings.
 
+    index is the subcluster.SectionIndex of config, if already made.
     """
     attributes = {}
 
@@ -90,7 +91,7 @@ def get_attributes(config: ConfigParser) -> Dict[str, str]:
     if batch_systems and batch_systems != '""':
         attributes["OSG_BatchSystems"] = batch_systems
 
-    resource_catalog = get_resource_catalog_from_config(config)
+    resource_catalog = get_resource_catalog_from_config(config, index)
     if resource_catalog and resource_catalog != "{}":
         attributes["OSG_ResourceCatalog"] = resource_catalog
 
@@ -99,7 +100,8 @@ def get_attributes(config: ConfigParser) -> Dict[str, str]:
 
 def get_ce_attributes_str(
         config: ConfigParser,
+        index: subcluster.SectionIndex = None,
 ) -> str:
-    attributes = get_attributes(config)
+    attributes = get_attributes(config, index)
     attributes["SCHEDD_ATTRS"] = "$(SCHEDD_ATTRS), " + ", ".join(attributes.keys())
     return "\n".join(f"{key} = {value}" for key, value in attributes.items())
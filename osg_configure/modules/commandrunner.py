@@ -0,0 +1,226 @@
+""" Module to run external commands with deadlines, a limit on how many run at once, and timing records """
+
+import concurrent.futures
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+__all__ = ['DEFAULT_TIMEOUT',
+           'MAX_CONCURRENT',
+           'EXIT_TIMEOUT',
+           'EXIT_NOT_FOUND',
+           'EXIT_NOT_EXECUTABLE',
+           'CommandResult',
+           'CommandRunner',
+           'get_runner',
+           'run',
+           'run_many',
+           'add_observer',
+           'remove_observer']
+
+DEFAULT_TIMEOUT = 600
+MAX_CONCURRENT = 8
+# how many CommandResults a CommandRunner keeps in records
+MAX_RECORDS = 1000
+# how long to wait for the output of a killed command
+KILL_GRACE = 5
+
+# exit codes used for commands that did not exit on their own, the same as
+# the ones used by the shell and timeout(1)
+EXIT_TIMEOUT = 124
+EXIT_NOT_EXECUTABLE = 126
+EXIT_NOT_FOUND = 127
+
+logger = logging.getLogger(__name__)
+
+# argv -- the command run, as a list
+# returncode -- the exit status; 128 + the signal number if it was killed by
+#               a signal, EXIT_TIMEOUT if it ran past its deadline,
+#               EXIT_NOT_FOUND or EXIT_NOT_EXECUTABLE if it could not be run
+# stdout, stderr -- the captured output ('' if not captured)
+# wall_time -- how many seconds it took
+# timed_out -- True if it was killed for running past its deadline
+# error -- why it could not be run, or None
+CommandResult = namedtuple('CommandResult', 'argv returncode stdout stderr wall_time timed_out error')
+
+# functions called with each CommandResult; profiling uses this
+_observers = []
+
+
+def add_observer(observer):
+    """
+    Call observer(result) with the CommandResult of every command run with
+    run() or run_many()
+    """
+    _observers.append(observer)
+
+
+def remove_observer(observer):
+    """Stop calling an observer passed to add_observer()"""
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _normalize_returncode(returncode):
+    if returncode < 0:
+        return 128 - returncode
+    return returncode
+
+
+class CommandRunner:
+    """
+    Runs external commands with subprocess, so commands can be run from any
+    thread (including the threads configuring modules concurrently) and
+    several can run at once.  At most max_concurrent commands run at a time;
+    each is started in a session of its own, and the whole session is killed
+    if the command runs longer than its timeout, so commands it started
+    (e.g. the ssh run by bosco_cluster) don't outlive it.  The CommandResults
+    of the last max_records commands run are kept in records, without their
+    output, so a long-running process (e.g. osg-configure --watch) doesn't
+    keep every command's output forever; use add_observer() to see every
+    result in full.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_records=MAX_RECORDS):
+        self.max_concurrent = max(1, max_concurrent)
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+
+    def _run(self, argv, timeout=DEFAULT_TIMEOUT, capture=True, merge_stderr=False, input=None, **popen_kwargs):
+        """Run argv in the calling thread and return its CommandResult; the arguments are the same as for run()"""
+        if isinstance(argv, str):
+            argv = shlex.split(argv)
+        argv = [str(x) for x in argv]
+        stdout = stderr = None
+        if capture:
+            stdout = subprocess.PIPE
+            stderr = subprocess.STDOUT if merge_stderr else subprocess.PIPE
+        stdin = subprocess.PIPE if input is not None else subprocess.DEVNULL
+        with self._semaphore:
+            start = time.perf_counter()
+            try:
+                process = subprocess.Popen(argv, stdin=stdin, stdout=stdout, stderr=stderr,
+                                           start_new_session=True, **popen_kwargs)
+            except OSError as err:
+                if isinstance(err, FileNotFoundError):
+                    returncode = EXIT_NOT_FOUND
+                else:
+                    returncode = EXIT_NOT_EXECUTABLE
+                result = CommandResult(argv, returncode, '', '', time.perf_counter() - start, False, str(err))
+                return self._record(result)
+
+            timed_out = False
+            try:
+                output, error = process.communicate(input.encode('latin-1') if input is not None else None,
+                                                    timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                # a command that left its session may still hold the output open
+                try:
+                    output, error = process.communicate(timeout=KILL_GRACE)
+                except subprocess.TimeoutExpired:
+                    output = error = None
+                    process.wait()
+                    for pipe in (process.stdin, process.stdout, process.stderr):
+                        if pipe is not None:
+                            pipe.close()
+            returncode = EXIT_TIMEOUT if timed_out else _normalize_returncode(process.returncode)
+            result = CommandResult(argv, returncode,
+                                   (output or b'').decode('latin-1'), (error or b'').decode('latin-1'),
+                                   time.perf_counter() - start, timed_out, None)
+            if timed_out:
+                logger.warning("%s did not finish within %s seconds and was killed" % (" ".join(argv), timeout))
+            return self._record(result)
+
+    def _record(self, result):
+        with self._lock:
+            self.records.append(result._replace(stdout='', stderr=''))
+        return result
+
+    def run(self, argv, timeout=DEFAULT_TIMEOUT, capture=True, merge_stderr=False, input=None, **popen_kwargs):
+        """
+        Run a command in the calling thread and wait for it to finish
+
+        Arguments:
+        argv -- the command as a list of arguments, or a string that is split
+                like the shell would (no shell features are supported)
+
+        Keyword arguments:
+        timeout -- the number of seconds after which the command is killed
+        capture -- if False, the command's output goes to our stdout and
+                   stderr instead of being captured
+        merge_stderr -- if True, stderr is captured along with stdout
+        input -- string to send to the command's stdin
+        any other keyword arguments (env, cwd, preexec_fn...) are passed to
+        subprocess.Popen
+
+        Returns:
+        a CommandResult
+        """
+        result = self._run(argv, timeout=timeout, capture=capture, merge_stderr=merge_stderr, input=input,
+                           **popen_kwargs)
+        self._notify([result])
+        return result
+
+    def run_many(self, commands):
+        """
+        Run several commands at once (up to the runner's limit) and wait for
+        all of them to finish
+
+        Arguments:
+        commands -- list of argv, or of (argv, dict of keyword arguments to run())
+
+        Returns:
+        a list of the CommandResult of each command, in the same order as commands
+        """
+        calls = []
+        for command in commands:
+            if isinstance(command, tuple):
+                calls.append(command)
+            else:
+                calls.append((command, {}))
+        if len(calls) <= 1:
+            results = [self._run(argv, **kwargs) for argv, kwargs in calls]
+        else:
+            workers = min(len(calls), self.max_concurrent)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._run, argv, **kwargs) for argv, kwargs in calls]
+                results = [future.result() for future in futures]
+        self._notify(results)
+        return results
+
+    @staticmethod
+    def _notify(results):
+        # observers are called in the thread that asked for the commands, so
+        # they can tell what that thread was doing
+        for result in results:
+            for observer in list(_observers):
+                observer(result)
+
+
+_runner = CommandRunner()
+
+
+def get_runner():
+    """Return the CommandRunner that run() and run_many() use"""
+    return _runner
+
+
+def run(argv, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Run a command with the shared CommandRunner; see CommandRunner.run()"""
+    return _runner.run(argv, timeout=timeout, **kwargs)
+
+
+def run_many(commands):
+    """Run several commands at once with the shared CommandRunner; see CommandRunner.run_many()"""
+    return _runner.run_many(commands)
@@ -1,9 +1,13 @@
 """ Module to hold various utility functions """
 
+import fnmatch
 import glob
 import configparser
+import hashlib
+import json
+import logging
 import os
-import sys
+from collections import namedtuple
 
 from osg_configure.modules import exceptions
 from osg_configure.modules import utilities
@@ -12,11 +16,23 @@ from osg_configure.modules import validation
 __all__ = ['get_option_location',
            'get_file_list',
            'read_config_files',
+           'ConfigSnapshot',
+           'OptionIndex',
+           'OptionLocation',
+           'QueryResult',
            'get_option',
            'jobmanager_enabled',
            'Option']
 
 CONFIG_DIRECTORY = '/etc/osg/config.d'
+CONFIG_CACHE_FILE = '/var/lib/osg/osg-configure-config-cache.json'
+# Increase this whenever the format of the cache file changes
+CONFIG_CACHE_VERSION = 2
+# How many config directories the cache file holds the contents of (e.g. the
+# one osg-configure reads and the one osg-ce-attributes-generator is given)
+CONFIG_CACHE_SNAPSHOTS = 4
+
+logger = logging.getLogger(__name__)
 
 
 def read_config_files(**kwargs):
@@ -29,6 +45,8 @@ def read_config_files(**kwargs):
     case_sensitive -- indicates whether the ConfigParser should be case
       sensitive when parsing the config file, this is needed for Local Options
       section
+    cache_file -- if given, the parsed config is loaded from (and saved to)
+      this file instead of parsing files that have not changed
 
     Raises:
     IOError -- error when parsing files
@@ -36,26 +54,406 @@ def read_config_files(**kwargs):
 
     config_dir = kwargs.get('config_directory', CONFIG_DIRECTORY)
     case_sensitive = kwargs.get('case_sensitive', False)
-    if not validation.valid_directory(config_dir):
-        raise IOError("%s does not exist" % config_dir)
-    file_list = get_file_list(config_directory=config_dir)
-    for filename in file_list:
-        if not validation.valid_ini_file(filename):
-            sys.stderr.write("Error found in %s\n" % filename)
-            sys.exit(1)
-    try:
-        config = configparser.SafeConfigParser()
+    cache_file = kwargs.get('cache_file', None)
+    snapshot = ConfigSnapshot(config_directory=config_dir, cache_file=cache_file)
+    return snapshot.get_config(case_sensitive=case_sensitive)
+
+
+class ConfigSnapshot:
+    """
+    The contents of the config files in a config directory, read, validated
+    and parsed exactly once.  Both the case-folded view used by most modules
+    and the case-preserving view needed by the Local Settings section are
+    built from the same parsed values, so a single snapshot can be shared by
+    every phase of a run.
+
+    If a cache file is given, the parsed contents are saved to it, and
+    loaded from it instead of parsing the files again as long as none of the
+    config files have been added, removed or changed.  Similarly, if an
+    earlier snapshot of the same directory is given, files that have not
+    changed since it was taken are not parsed again.
+
+    If validate is False, the files are only parsed, the way
+    ConfigParser.read() would: they are not checked against osg-configure's
+    requirements, and files that can't be read are skipped.
+    """
+
+    def __init__(self, config_directory=CONFIG_DIRECTORY, cache_file=None, previous=None, validate=True):
+        """
+        Read and validate every config file in config_directory
+
+        Raises:
+        IOError -- error when reading files
+        ConfigFileError -- a config file is not valid
+        """
+        if not os.path.isdir(config_directory):
+            raise IOError("%s does not exist" % config_directory)
+        self.config_directory = config_directory
+        self.validate = validate
+        self.file_list = get_file_list(config_directory=config_directory)
+        # list of (filename, entries) pairs in the order the files are read;
+        # see _read_file_entries() for the format of entries
+        self.file_entries = None
+        self.from_cache = False
+
+        fingerprints = None
+        if cache_file or previous is not None:
+            fingerprints = _get_fingerprints(self.file_list)
+        # list of [path, mtime, size, inode] for each file, or None if unknown
+        self.fingerprints = fingerprints
+        if cache_file:
+            self.file_entries = _load_cache(cache_file, config_directory, fingerprints, validate)
+            self.from_cache = self.file_entries is not None
+
+        if self.file_entries is None:
+            reusable_entries = {}
+            if previous is not None and previous.validate == validate:
+                reusable_entries = previous._unchanged_file_entries(fingerprints)
+            self.file_entries = []
+            unread_files = []
+            for filename in self.file_list:
+                if filename in reusable_entries:
+                    self.file_entries.append((filename, reusable_entries[filename]))
+                    continue
+                try:
+                    entries = _read_file_entries(filename, validate)
+                except EnvironmentError:
+                    unread_files.append(filename)
+                    continue
+                if entries is None:
+                    raise exceptions.ConfigFileError("Error found in %s" % filename)
+                self.file_entries.append((filename, entries))
+            if unread_files and validate:
+                msg = "Can't read following config files:\n %s" % ("\n".join(unread_files))
+                raise IOError(msg)
+            if cache_file and fingerprints is not None and not unread_files:
+                _save_cache(cache_file, config_directory, fingerprints, validate, self.file_entries)
+
+        self.option_index = OptionIndex()
+        for filename, entries in self.file_entries:
+            self.option_index.add_file(filename, entries)
+        self._configs = {}
+
+    def get_config(self, case_sensitive=False):
+        """
+        Return a ConfigParser object holding the merged contents of the config
+        files; option names are lowercased unless case_sensitive is True.
+        The same object is returned on every call, so callers must not modify it.
+        """
+        if case_sensitive not in self._configs:
+            self._configs[case_sensitive] = self._build_config(case_sensitive)
+        return self._configs[case_sensitive]
+
+    @property
+    def config(self):
+        """The case-folded view of the config"""
+        return self.get_config(case_sensitive=False)
+
+    @property
+    def case_sensitive_config(self):
+        """The case-preserving view of the config"""
+        return self.get_config(case_sensitive=True)
+
+    def get_option_location(self, option, section):
+        """
+        Return the name of the file that sets the value of the given option,
+        or None if the option or section is not defined
+        """
+        location = self.option_index.location(section, option)
+        if location is None:
+            return None
+        return location.filename
+
+    def query(self, patterns):
+        """
+        Look up options given as "section.option" or just "option" (to look
+        in every section); section and option may be glob patterns such as
+        "Subcluster*.ram_mb".  Section names are case-sensitive, option names
+        are not.
+
+        Returns a list of QueryResults, in the order of patterns and then of
+        sections and options in the config; patterns that match nothing have
+        no results.
+        """
+        config = self.config
+        results = []
+        for pattern in patterns:
+            if '.' in pattern:
+                # option names can't have dots but section names can
+                section_pattern, option_pattern = pattern.rsplit('.', 1)
+            else:
+                section_pattern, option_pattern = '*', pattern
+            option_pattern = option_pattern.lower()
+            for section in config.sections():
+                if not fnmatch.fnmatchcase(section, section_pattern):
+                    continue
+                for option in config.options(section):
+                    if not fnmatch.fnmatchcase(option, option_pattern):
+                        continue
+                    location = self.option_index.location(section, option)
+                    if location is None:
+                        continue
+                    try:
+                        value = config.get(section, option)
+                    except configparser.InterpolationError:
+                        value = location.value
+                    results.append(QueryResult(pattern, section, option, value,
+                                               location.filename, location.lineno))
+        return results
+
+    def _unchanged_file_entries(self, fingerprints):
+        """
+        Return a dict mapping the name of each file in fingerprints that has
+        not changed since this snapshot was taken to its entries
+        """
+        if self.fingerprints is None or fingerprints is None:
+            return {}
+        entries_by_file = dict(self.file_entries)
+        old_fingerprints = dict((fingerprint[0], fingerprint) for fingerprint in self.fingerprints)
+        unchanged = {}
+        for fingerprint in fingerprints:
+            path = fingerprint[0]
+            if old_fingerprints.get(path) == fingerprint and path in entries_by_file:
+                unchanged[path] = entries_by_file[path]
+        return unchanged
+
+    def _build_config(self, case_sensitive):
+        config = configparser.ConfigParser(interpolation=_ReadInterpolation())
         if case_sensitive:
             config.optionxform = str
-    except configparser.Error as e:
-        raise IOError("Can't read and parse config files:\n%s" % e)
-    read_files = config.read(file_list, encoding="latin-1")
-    read_files.sort()
-    if file_list != read_files:
-        unread_files = set(file_list).difference(read_files)
-        msg = "Can't read following config files:\n %s" % ("\n".join(unread_files))
-        raise IOError(msg)
-    return config
+        for _, entries in self.file_entries:
+            for section, options in entries:
+                if section != config.default_section and not config.has_section(section):
+                    config.add_section(section)
+                for option, value, _ in options:
+                    config.set(section, option, value)
+        return config
+
+
+def _read_file_entries(filename, validate=True):
+    """
+    Read and validate a config file; if validate is False, the file is only
+    parsed.
+
+    Returns a list of [section, options] pairs in file order, where options
+    is a list of [option, raw value, line number] triples; option names keep
+    their case.  Lists are used so the result can be stored as JSON.
+    Returns None if the file is not valid.
+
+    Raises:
+    EnvironmentError -- the file can't be read
+    ConfigFileError -- the file can't be parsed (if validate is False)
+    """
+    with open(filename, "r", encoding="latin-1") as file_handle:
+        contents = file_handle.read()
+    if validate:
+        parsed_file = validation.parse_ini_string(contents, filename)
+        if parsed_file is None:
+            return None
+    else:
+        parsed_file = configparser.RawConfigParser(default_section=validation.NO_DEFAULT_SECTION)
+        parsed_file.optionxform = str
+        try:
+            parsed_file.read_string(contents, filename)
+        except configparser.Error as err:
+            raise exceptions.ConfigFileError("Error found in %s: %s" % (filename, err))
+    line_numbers = _option_line_numbers(contents)
+    entries = []
+    for section in parsed_file.sections():
+        options = [[option, value, line_numbers.get((section, option))]
+                   for option, value in parsed_file.items(section)]
+        entries.append([section, options])
+    return entries
+
+
+def _get_fingerprints(file_list):
+    """
+    Return a list of [path, mtime, size, inode] for each file in file_list,
+    or None if any of the files can't be examined
+    """
+    fingerprints = []
+    for filename in file_list:
+        try:
+            stat_result = os.stat(filename)
+        except OSError:
+            return None
+        fingerprints.append([filename, stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino])
+    return fingerprints
+
+
+def _directory_fingerprint(config_directory, fingerprints, validate):
+    """
+    Return a key for the contents of config_directory: a hash of its path,
+    the fingerprints of its files, and whether they are validated
+    """
+    contents = json.dumps([os.path.abspath(config_directory), bool(validate), fingerprints])
+    return hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+
+def _read_cache(cache_file):
+    """Return the list of snapshots saved in cache_file, or [] if there is no usable cache"""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file_handle:
+            cache = json.load(file_handle)
+        if cache["version"] != CONFIG_CACHE_VERSION:
+            logger.debug("Ignoring config cache %s from a different version", cache_file)
+            return []
+        return list(cache["snapshots"])
+    except FileNotFoundError:
+        return []
+    except (EnvironmentError, ValueError, KeyError, TypeError) as err:
+        logger.debug("Ignoring unusable config cache %s: %s", cache_file, err)
+        return []
+
+
+def _load_cache(cache_file, config_directory, fingerprints, validate=True):
+    """
+    Return the file entries saved in cache_file, or None if there is no
+    usable cache for config_directory whose files match fingerprints
+    """
+    if fingerprints is None:
+        return None
+    key = _directory_fingerprint(config_directory, fingerprints, validate)
+    for snapshot in _read_cache(cache_file):
+        try:
+            if snapshot["key"] != key:
+                continue
+            file_entries = [(filename, entries) for filename, entries in snapshot["files"]]
+        except (KeyError, TypeError, ValueError) as err:
+            logger.debug("Ignoring unusable config cache %s: %s", cache_file, err)
+            return None
+        if [filename for filename, _ in file_entries] != [fp[0] for fp in fingerprints]:
+            logger.debug("Config cache %s is inconsistent", cache_file)
+            return None
+        return file_entries
+    logger.debug("Config cache %s has nothing for %s as it is now", cache_file, config_directory)
+    return None
+
+
+def _save_cache(cache_file, config_directory, fingerprints, validate, file_entries):
+    """
+    Save the file entries for config_directory to cache_file, replacing any
+    earlier contents of the same directory and keeping the contents of the
+    CONFIG_CACHE_SNAPSHOTS most recently saved directories; failures are
+    ignored
+    """
+    config_directory = os.path.abspath(config_directory)
+    snapshot = {"key": _directory_fingerprint(config_directory, fingerprints, validate),
+                "config_directory": config_directory,
+                "validate": bool(validate),
+                "files": [[filename, entries] for filename, entries in file_entries]}
+    snapshots = [snapshot]
+    for other in _read_cache(cache_file):
+        if len(snapshots) >= CONFIG_CACHE_SNAPSHOTS:
+            break
+        try:
+            if (other["config_directory"], other["validate"]) == (config_directory, bool(validate)):
+                continue
+        except (KeyError, TypeError):
+            continue
+        snapshots.append(other)
+    cache = {"version": CONFIG_CACHE_VERSION,
+             "snapshots": snapshots}
+    if not utilities.atomic_write(cache_file, json.dumps(cache), encoding="utf-8", mode=0o644):
+        logger.debug("Unable to write config cache %s", cache_file)
+
+
+class OptionLocation(namedtuple('OptionLocation', 'filename lineno value')):
+    """Where an option is set: the file, line number and raw (uninterpolated) value"""
+    __slots__ = ()
+
+
+class QueryResult(namedtuple('QueryResult', 'pattern section option value filename lineno')):
+    """An option found by ConfigSnapshot.query() and the pattern that matched it"""
+    __slots__ = ()
+
+
+class OptionIndex:
+    """
+    Index of where each option in a set of config files is set, built from
+    the files as they are read.  Option names are case-insensitive, section
+    names are case-sensitive, as in the ConfigParser objects used by modules.
+    """
+
+    def __init__(self):
+        # (section, lowercased option) -> list of OptionLocations in the order they were read
+        self._locations = {}
+        self._sections = set()
+
+    def add_file(self, filename, entries):
+        """
+        Add the options set in a file to the index.  Files must be added in
+        the order they are read.
+
+        Arguments:
+        filename -- name of the file
+        entries -- the contents of the file as returned by _read_file_entries()
+        """
+        for section, options in entries:
+            self._sections.add(section)
+            for option, value, lineno in options:
+                location = OptionLocation(filename, lineno, value)
+                self._locations.setdefault((section, option.lower()), []).append(location)
+
+    def history(self, section, option):
+        """
+        Return every place the option is set in the section, oldest first;
+        each location is overridden by the ones that follow it, and the last
+        one gives the value in effect.  Options set in the [DEFAULT] section
+        are used if the section itself does not set the option.
+        """
+        return list(self._get_locations(section, option))
+
+    def location(self, section, option):
+        """
+        Return the OptionLocation of the value in effect for the option in the
+        section, or None if the option is not set
+        """
+        locations = self._get_locations(section, option)
+        if not locations:
+            return None
+        return locations[-1]
+
+    def _get_locations(self, section, option):
+        if section not in self._sections:
+            return []
+        key = (section, option.lower())
+        if key not in self._locations:
+            key = (configparser.DEFAULTSECT, option.lower())
+        return self._locations.get(key, [])
+
+
+def _option_line_numbers(contents):
+    """
+    Return a dict mapping (section, option) to the line number the option is
+    set on, for contents that have already been validated with
+    validation.parse_ini_string (so there are no continuation lines)
+    """
+    line_numbers = {}
+    section = None
+    for lineno, line in enumerate(contents.splitlines(), 1):
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+        match = configparser.RawConfigParser.SECTCRE.match(line)
+        if match:
+            section = match.group('header')
+            continue
+        match = configparser.RawConfigParser.OPTCRE.match(line)
+        if match and section is not None:
+            line_numbers.setdefault((section, match.group('option').rstrip()), lineno)
+    return line_numbers
+
+
+class _ReadInterpolation(configparser.BasicInterpolation):
+    """
+    BasicInterpolation that does not check the syntax of values as they are
+    set, the same as when ConfigParser.read() loads them; errors are raised
+    when a value is interpolated instead
+    """
+
+    def before_set(self, parser, section, option, value):
+        return value
 
 
 def get_option_location(option, section, **kwargs):
@@ -64,30 +462,37 @@ def get_option_location(option, section, **kwargs):
     Returns None if option or section is not defined.  NOTE: does not handle
     variable interpolation
 
+    Uses the index of the given ConfigSnapshot if there is one; otherwise
+    the files are read directly.
+
     Formal arguments:
     option -- option name to look for
     section -- section that the option is located in
 
     Keyword arguments:
     config_directory -- indicates which directory holds the config files
+    snapshot -- ConfigSnapshot to look the option up in instead of reading
+                the config directory
 
     Raises:
     IOError -- Can't read a given file
-    Exception -- Can't parse a config file in the config directory
+    ConfigFileError -- Can't parse a config file in the config directory
     """
     config_dir = kwargs.get('config_directory', CONFIG_DIRECTORY)
-    file_list = get_file_list(config_directory=config_dir)
-    file_list.reverse()
-    for fn in file_list:
-        try:
-            config = configparser.SafeConfigParser()
-            config.readfp(open(fn, "r", encoding="latin-1"))
-            if config.has_option(section, option):
-                return fn
-        except configparser.Error as e:
-            raise Exception("Can't parse %s:\n%s" % (fn, e))
-
-    return None
+    snapshot = kwargs.get('snapshot', None)
+    if snapshot is not None:
+        return snapshot.get_option_location(option, section)
+
+    option_index = OptionIndex()
+    for fn in get_file_list(config_directory=config_dir):
+        entries = _read_file_entries(fn)
+        if entries is None:
+            raise exceptions.ConfigFileError("Can't parse %s" % fn)
+        option_index.add_file(fn, entries)
+    location = option_index.location(section, option)
+    if location is None:
+        return None
+    return location.filename
 
 
 def get_file_list(**kwargs):
@@ -0,0 +1,138 @@
+""" Module to run the configure() step of several configuration modules concurrently """
+
+import concurrent.futures
+import logging
+import threading
+
+from osg_configure.modules import profiling
+from osg_configure.modules import utilities
+
+__all__ = ['DEFAULT_WORKERS',
+           'configure_modules']
+
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+_thread_state = threading.local()
+
+
+class _BufferingHandler(logging.Handler):
+    """
+    Handler that holds on to the log records made while configuring a module
+    so they can be logged in module order once the module is done; records
+    made outside of a module's configure() are passed straight on to the
+    original handlers
+    """
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.handlers = handlers
+
+    def emit(self, record):
+        records = getattr(_thread_state, 'records', None)
+        if records is not None:
+            records.append(record)
+        else:
+            self.forward([record])
+
+    def forward(self, records):
+        for record in records:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+def _configure(module, attributes, records):
+    _thread_state.records = records
+    try:
+        with profiling.phase("configure %s" % module.__class__.__name__):
+            if not module.stage_writes():
+                with utilities.unstaged_writes():
+                    return module.configure(attributes)
+            return module.configure(attributes)
+    finally:
+        _thread_state.records = None
+
+
+def configure_modules(modules, attributes, max_workers=DEFAULT_WORKERS):
+    """
+    Call configure(attributes) on each module, running up to max_workers at
+    once.  A module is not started while another module that shares one of
+    its shared_resources() is running; since every module's writes are staged
+    until the end of the run, no module can see another's output, so there
+    is no other ordering between them.  Log messages from each
+    module are logged in the order of modules, regardless of which module
+    finishes first.
+
+    If a module raises an exception, no further modules are started and the
+    exception is re-raised once the running modules have finished; if several
+    raise, the one from the earliest module in modules is re-raised.
+
+    Arguments:
+    modules -- list of module objects to configure
+    attributes -- the attributes to pass to configure()
+    max_workers -- the maximum number of modules to configure at once
+
+    Returns:
+    a list of the value returned by each module's configure(), in the same
+    order as modules
+    """
+    resources = dict((module, set(module.shared_resources())) for module in modules)
+    records = dict((module, []) for module in modules)
+    results = {}
+    errors = {}
+    pending = list(modules)
+    running = {}
+    held_resources = set()
+    next_to_log = 0
+
+    root_logger = logging.getLogger()
+    original_handlers = list(root_logger.handlers)
+    buffering_handler = _BufferingHandler(original_handlers)
+    for handler in original_handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(buffering_handler)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            while pending or running:
+                if not errors:
+                    for module in list(pending):
+                        if len(running) >= max_workers:
+                            break
+                        if resources[module] & held_resources:
+                            continue
+                        pending.remove(module)
+                        held_resources |= resources[module]
+                        future = executor.submit(_configure, module, attributes, records[module])
+                        running[future] = module
+                elif not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    module = running.pop(future)
+                    held_resources -= resources[module]
+                    try:
+                        results[module] = future.result()
+                    except Exception as err:  # re-raised below
+                        errors[module] = err
+
+                while next_to_log < len(modules) and (modules[next_to_log] in results or
+                                                      modules[next_to_log] in errors):
+                    buffering_handler.forward(records[modules[next_to_log]])
+                    next_to_log += 1
+    finally:
+        root_logger.removeHandler(buffering_handler)
+        for handler in original_handlers:
+            root_logger.addHandler(handler)
+        # log anything not logged yet, e.g. from modules that finished after
+        # an earlier module failed
+        for module in modules[next_to_log:]:
+            buffering_handler.forward(records[module])
+
+    for module in modules:
+        if module in errors:
+            raise errors[module]
+    return [results[module] for module in modules]
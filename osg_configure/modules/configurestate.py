@@ -0,0 +1,116 @@
+""" Module to keep track of the configuration each module was last configured with """
+
+import hashlib
+import json
+import logging
+from configparser import ConfigParser
+from typing import Dict, Optional
+
+from osg_configure.modules import utilities
+from osg_configure.version import __version__
+
+__all__ = ['section_hash',
+           'module_input_hashes',
+           'file_hash',
+           'module_state',
+           'ConfigureState']
+
+STATE_FILE = '/var/lib/osg/osg-configure-state.json'
+# Increase this whenever the format of the state file changes
+STATE_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+def section_hash(config: ConfigParser, section: str) -> Optional[str]:
+    """
+    Return a hash of the contents of a section (including the values it gets
+    from the DEFAULT section), or None if the section is not present
+    """
+    if not config.has_section(section):
+        return None
+    contents = json.dumps(sorted(config.items(section, raw=True)))
+    return hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+
+def module_input_hashes(module, config: ConfigParser) -> Dict[str, Optional[str]]:
+    """
+    Return a dict mapping each section the module reads to the hash of its
+    contents
+    """
+    return dict((section, section_hash(config, section))
+                for section in sorted(module.input_sections(config)))
+
+
+def file_hash(path: str) -> Optional[str]:
+    """
+    Return a hash of the contents of a file, or None if it is missing or
+    can't be read
+    """
+    try:
+        with open(path, "rb") as file_handle:
+            return hashlib.sha256(file_handle.read()).hexdigest()
+    except EnvironmentError:
+        return None
+
+
+def module_state(module, config: ConfigParser) -> Dict[str, Optional[str]]:
+    """
+    Return a dict describing everything a module's configuration depends on:
+    the hashes of the sections it reads, whether the rpms it checks for are
+    installed, and the hashes of the files it writes (so a module is
+    configured again if a package was installed or removed, or if someone
+    else changed or deleted its output)
+    """
+    state = module_input_hashes(module, config)
+    for rpm_name in sorted(module.input_rpms()):
+        state["rpm:" + rpm_name] = "installed" if utilities.rpm_installed(rpm_name) else "not installed"
+    for path in sorted(module.output_files()):
+        state["file:" + path] = file_hash(path)
+    return state
+
+
+class ConfigureState:
+    """
+    The inputs each module was configured with in earlier successful runs,
+    used to skip configuring modules whose input sections, rpms, and output
+    files have not changed.
+    """
+
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        # module name -> dict from module_state()
+        self.modules = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as file_handle:
+                state = json.load(file_handle)
+            if state["version"] != STATE_VERSION or state["osg_configure_version"] != __version__:
+                logger.debug("Ignoring state from a different version of osg-configure in %s", self.state_file)
+                return
+            self.modules = dict(state["modules"])
+        except FileNotFoundError:
+            pass
+        except (EnvironmentError, ValueError, KeyError, TypeError) as err:
+            logger.debug("Ignoring unusable state file %s: %s", self.state_file, err)
+
+    def module_changed(self, module, input_hashes: Dict[str, Optional[str]]) -> bool:
+        """
+        Return True if the module has not been configured with exactly these
+        inputs in an earlier run
+        """
+        return self.modules.get(module.module_name()) != input_hashes
+
+    def record(self, module, input_hashes: Dict[str, Optional[str]]):
+        """Record that the module was successfully configured with these inputs"""
+        self.modules[module.module_name()] = input_hashes
+
+    def save(self) -> bool:
+        """Write the state file; returns True if successful"""
+        state = {"version": STATE_VERSION,
+                 "osg_configure_version": __version__,
+                 "modules": self.modules}
+        return utilities.atomic_write(self.state_file, json.dumps(state, indent=1, sort_keys=True),
+                                      encoding="utf-8", mode=0o644)
@@ -0,0 +1,161 @@
+""" Module to wait for changes to the files in a config directory """
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+
+from osg_configure.modules import configfile
+
+__all__ = ['ConfigWatcher']
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF)
+
+
+def _inotify_watch(directory):
+    """
+    Return a non-blocking inotify file descriptor watching directory, or None
+    if inotify is not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError) as err:
+        logger.debug("inotify is not available: %s", err)
+        return None
+
+    inotify_fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if inotify_fd < 0:
+        logger.debug("inotify_init1 failed: %s", os.strerror(ctypes.get_errno()))
+        return None
+    if inotify_add_watch(inotify_fd, os.fsencode(directory), WATCH_MASK) < 0:
+        logger.debug("Unable to watch %s: %s", directory, os.strerror(ctypes.get_errno()))
+        os.close(inotify_fd)
+        return None
+    return inotify_fd
+
+
+# struct inotify_event: wd, mask, cookie and len, followed by len bytes of name
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _inotify_masks(data):
+    """Return the masks of the inotify events in data"""
+    masks = []
+    offset = 0
+    while offset + _INOTIFY_EVENT.size <= len(data):
+        _, mask, _, name_length = _INOTIFY_EVENT.unpack_from(data, offset)
+        masks.append(mask)
+        offset += _INOTIFY_EVENT.size + name_length
+    return masks
+
+
+class ConfigWatcher:
+    """
+    Waits for the config files in a directory to change, using inotify if it
+    is available and checking the files every poll_interval seconds if not.
+    If the directory itself is deleted or moved away, the watch is set up
+    again on whatever is at its path, polling until that is possible.
+    """
+
+    def __init__(self, config_directory=configfile.CONFIG_DIRECTORY, poll_interval=5.0):
+        self.config_directory = config_directory
+        self.poll_interval = poll_interval
+        self.inotify_fd = _inotify_watch(config_directory)
+        # True when the watched directory went away and the watch has to be
+        # set up again
+        self._watch_lost = False
+        self._fingerprints = self._get_fingerprints()
+
+    def _get_fingerprints(self):
+        return configfile._get_fingerprints(configfile.get_file_list(config_directory=self.config_directory))
+
+    def _rearm(self):
+        """Watch the config directory again after it was deleted or moved away"""
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+        self.inotify_fd = _inotify_watch(self.config_directory)
+        self._watch_lost = self.inotify_fd is None
+        if self._watch_lost:
+            logger.warning("%s has gone away; checking for it every %d seconds" %
+                           (self.config_directory, self.poll_interval))
+        else:
+            logger.debug("Watching %s again", self.config_directory)
+
+    def _wait_for_event(self, timeout):
+        """Return True if a change may have happened within timeout seconds"""
+        if self.inotify_fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            if self._watch_lost and os.path.isdir(self.config_directory):
+                self._rearm()
+            return True
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return False
+        # which files changed doesn't matter, only whether the directory
+        # itself went away
+        masks = []
+        try:
+            while True:
+                data = os.read(self.inotify_fd, 65536)
+                if not data:
+                    break
+                masks.extend(_inotify_masks(data))
+        except BlockingIOError:
+            pass
+        if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED) for mask in masks):
+            self._rearm()
+        return True
+
+    def changed(self):
+        """
+        Return True if any config file has been added, removed or changed
+        since the last call
+        """
+        fingerprints = self._get_fingerprints()
+        if fingerprints == self._fingerprints:
+            return False
+        self._fingerprints = fingerprints
+        return True
+
+    def wait_for_change(self, debounce=2.0):
+        """
+        Block until the config files change, then until they have stopped
+        changing for debounce seconds, so a burst of edits (e.g. from
+        configuration management) is handled at once
+        """
+        while True:
+            self._wait_for_event(None)
+            if self.changed():
+                break
+        deadline = time.time() + debounce
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            if self._wait_for_event(remaining) and self.changed():
+                deadline = time.time() + debounce
+
+    def close(self):
+        """Stop watching"""
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
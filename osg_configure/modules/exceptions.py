@@ -11,6 +11,11 @@ class SettingError(Error):
     pass
 
 
+class ConfigFileError(Error):
+    """Class for exceptions due to config files that are not valid"""
+    pass
+
+
 class ConfigureError(Error):
     """Class for exceptions due to problems while running vdt configure scripts"""
     pass
@@ -0,0 +1,92 @@
+""" Module to describe the host a configuration is meant for, so it can be verified elsewhere """
+
+import json
+import logging
+
+from osg_configure.modules import exceptions
+from osg_configure.modules import utilities
+from osg_configure.modules import validation
+
+__all__ = ['HostProfile']
+
+logger = logging.getLogger(__name__)
+
+
+class HostProfile:
+    """
+    The answers to the host probes made while verifying a configuration,
+    standing in for the host the configuration is meant for.  A profile file
+    is a JSON object with any of the keys:
+
+    rpms -- list of the rpms installed
+    condor_config_val -- object mapping the name of a condor_config_val
+                         executable (condor_config_val, condor_ce_config_val)
+                         to an object of the variables it defines
+    paths -- list of the files and directories present; if not given, every
+             path is assumed to be present
+    users -- list of the users present; if not given, every user is assumed
+             to be present
+    resolvable_hosts -- list of the hosts that resolve; if not given, every
+                        host is assumed to resolve
+
+    Since the checks that look at the host (paths, users and DNS) can not
+    be answered from elsewhere, they pass unless the profile says otherwise.
+    """
+
+    def __init__(self, rpms=(), condor_config_val=None, paths=None, users=None, resolvable_hosts=None):
+        self.rpms = set(rpms)
+        self.condor_config_val = dict(condor_config_val or {})
+        self.paths = None if paths is None else set(path.rstrip('/') or '/' for path in paths)
+        self.users = None if users is None else set(users)
+        self.resolvable_hosts = None if resolvable_hosts is None else set(resolvable_hosts)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Return the HostProfile in the JSON file filename
+
+        Raises:
+        exceptions.Error -- the file can't be read or is not a valid profile
+        """
+        try:
+            with open(filename, "r", encoding="utf-8") as file_handle:
+                profile = json.load(file_handle)
+        except (OSError, ValueError) as err:
+            raise exceptions.Error("Can't read host profile %s: %s" % (filename, err))
+        if not isinstance(profile, dict):
+            raise exceptions.Error("Host profile %s is not a JSON object" % filename)
+        unknown = set(profile) - set(['rpms', 'condor_config_val', 'paths', 'users', 'resolvable_hosts'])
+        if unknown:
+            raise exceptions.Error("Unknown keys in host profile %s: %s" % (filename, ", ".join(sorted(unknown))))
+        return cls(**profile)
+
+    def installed_rpms(self, rpm_names):
+        """rpm backend for utilities.set_rpm_backend()"""
+        return self.rpms.intersection(rpm_names)
+
+    def path_exists(self, path, kind):
+        """Return True if path is present; kind is ignored"""
+        if self.paths is None:
+            return True
+        return (path.rstrip('/') or '/') in self.paths
+
+    def user_exists(self, username):
+        """Return True if the user is present"""
+        return self.users is None or username in self.users
+
+    def resolves(self, host):
+        """Return True if the host resolves"""
+        return self.resolvable_hosts is None or host in self.resolvable_hosts
+
+    def install(self):
+        """Answer the host probes from this profile"""
+        utilities.set_rpm_backend(self.installed_rpms)
+        utilities.set_condor_config_stubs(self.condor_config_val)
+        validation.set_host_checks(self)
+
+    @staticmethod
+    def uninstall():
+        """Go back to probing the local host"""
+        utilities.set_rpm_backend()
+        utilities.set_condor_config_stubs()
+        validation.set_host_checks()
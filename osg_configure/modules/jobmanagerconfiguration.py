@@ -29,6 +29,20 @@ class JobManagerConfiguration(BaseConfiguration):
                 self.htcondor_gateway_enabled = configuration.getboolean('Gateway', 'htcondor_gateway_enabled')
         self.log('JobManagerConfiguration.parse_configuration completed')
 
+    def input_sections(self, configuration):
+        return super().input_sections(configuration) | {'Gateway'}
+
+    def shared_resources(self):
+        return super().shared_resources() | {self.BLAH_CONFIG, self.HTCONDOR_CE_CONFIG_FILE,
+                                             utilities.HTCONDOR_CE_CONFIG_PATH}
+
+    def input_rpms(self):
+        # utilities.ce_installed()
+        return super().input_rpms() | {'osg-ce', 'osg-htcondor-ce'}
+
+    def output_files(self):
+        return super().output_files() | {self.BLAH_CONFIG, self.HTCONDOR_CE_CONFIG_FILE}
+
     def gateway_services(self):
         services = set([])
         if self.htcondor_gateway_enabled:
@@ -0,0 +1,62 @@
+""" Module to list the configuration modules and load them on demand """
+
+import importlib
+from collections import namedtuple
+
+__all__ = ['ModuleInfo',
+           'MODULES',
+           'find_module',
+           'load_module',
+           'load_modules']
+
+# name -- what module_name() returns; used by -m and -l
+# import_name -- name of the module in osg_configure.configure_modules
+# class_name -- name of the configuration class in that module
+# section -- the config section the module reads its settings from
+# separately_configurable -- what separately_configurable() returns
+ModuleInfo = namedtuple('ModuleInfo', 'name import_name class_name section separately_configurable')
+
+MODULES = [
+    ModuleInfo('BaseConfiguration', 'bosco', 'BoscoConfiguration', 'BOSCO', False),
+    ModuleInfo('Condor', 'condor', 'CondorConfiguration', 'Condor', True),
+    ModuleInfo('Gateway', 'gateway', 'GatewayConfiguration', 'Gateway', False),
+    ModuleInfo('Gratia', 'gratia', 'GratiaConfiguration', 'Gratia', False),
+    ModuleInfo('Infoservices', 'infoservices', 'InfoServicesConfiguration', 'Info Services', False),
+    ModuleInfo('LocalSettings', 'localsettings', 'LocalSettings', 'Local Settings', True),
+    ModuleInfo('LSF', 'lsf', 'LSFConfiguration', 'LSF', True),
+    ModuleInfo('PBS', 'pbs', 'PBSConfiguration', 'PBS', True),
+    ModuleInfo('RSV', 'rsv', 'RsvConfiguration', 'RSV', True),
+    ModuleInfo('SGE', 'sge', 'SGEConfiguration', 'SGE', True),
+    ModuleInfo('SiteInformation', 'siteinformation', 'SiteInformation', 'Site Information', True),
+    ModuleInfo('SLURM', 'slurm', 'SlurmConfiguration', 'SLURM', True),
+    ModuleInfo('Squid', 'squid', 'SquidConfiguration', 'Squid', True),
+    ModuleInfo('Storage', 'storage', 'StorageConfiguration', 'Storage', True),
+]
+
+
+def find_module(name):
+    """
+    Return the ModuleInfo for the module with the given name (compared
+    case-insensitively), or None if there is no such module
+    """
+    for info in MODULES:
+        if info.name.lower() == name.lower():
+            return info
+    return None
+
+
+def load_module(info, *args, **kwargs):
+    """
+    Import the configuration module described by info and return an
+    instance of its configuration class; any arguments are passed to the
+    class's constructor
+    """
+    module_ref = importlib.import_module('osg_configure.configure_modules.' + info.import_name)
+    return getattr(module_ref, info.class_name)(*args, **kwargs)
+
+
+def load_modules(infos=None):
+    """Return instances of the given modules, or of every module if infos is None"""
+    if infos is None:
+        infos = MODULES
+    return [load_module(info) for info in infos]
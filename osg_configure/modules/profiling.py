@@ -0,0 +1,198 @@
+""" Module to time the phases of an osg-configure run and the external commands it runs """
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from osg_configure.modules import commandrunner
+from osg_configure.modules import resolver
+from osg_configure.modules import utilities
+
+__all__ = ['Profiler',
+           'start',
+           'stop',
+           'phase',
+           'active_profiler']
+
+logger = logging.getLogger(__name__)
+
+_profiler = None
+
+
+def _child_cpu_time():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class Profiler:
+    """
+    Records the wall and CPU time of named phases, and every external command
+    run via commandrunner and every DNS lookup made via resolver while it is
+    installed.  Nothing in the standard library is replaced; the Profiler
+    only registers itself as an observer of those two modules between
+    install() and uninstall().
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.calls = []
+        self.start_time = None
+        self.end_time = None
+        self.wall_time = self.cpu_time = self.child_cpu_time = None
+        # each thread has its own stack of the phases it is in
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self):
+        """Start the clock and begin recording external commands and DNS lookups"""
+        commandrunner.add_observer(self._record_command)
+        resolver.add_observer(self._record_lookup)
+        self._installed = True
+        self.start_time = time.time()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._start_child_cpu = _child_cpu_time()
+
+    def uninstall(self):
+        """Stop the clock and stop recording external commands and DNS lookups"""
+        if not self._installed:
+            return
+        commandrunner.remove_observer(self._record_command)
+        resolver.remove_observer(self._record_lookup)
+        self._installed = False
+        self.end_time = time.time()
+        self.wall_time = time.perf_counter() - self._start_wall
+        self.cpu_time = time.process_time() - self._start_cpu
+        self.child_cpu_time = _child_cpu_time() - self._start_child_cpu
+
+    def _phase_stack(self):
+        if not hasattr(self._local, 'phase_stack'):
+            self._local.phase_stack = []
+        return self._local.phase_stack
+
+    def _record_command(self, result):
+        self.record_call('command', result.argv, result.wall_time, result.returncode)
+
+    def _record_lookup(self, result):
+        self.record_call('dns', [result.function] + ([result.host] if result.host else []), result.wall_time)
+
+    def record_call(self, kind, argv, duration, status=None):
+        """Record an external command or DNS lookup"""
+        if isinstance(argv, (list, tuple)):
+            argv = [str(x) for x in argv]
+        phase_stack = self._phase_stack()
+        with self._lock:
+            self.calls.append({'kind': kind,
+                               'argv': argv,
+                               'phase': phase_stack[-1] if phase_stack else None,
+                               'wall_time': duration,
+                               'status': status})
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager that records the time spent in a named phase"""
+        # reserve a slot so phases are listed in the order they started
+        with self._lock:
+            index = len(self.phases)
+            self.phases.append(None)
+        phase_stack = self._phase_stack()
+        phase_stack.append(name)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        child_cpu = _child_cpu_time()
+        try:
+            yield
+        finally:
+            phase_stack.pop()
+            self.phases[index] = {'name': name,
+                                  'parent': phase_stack[-1] if phase_stack else None,
+                                  'wall_time': time.perf_counter() - wall,
+                                  'cpu_time': time.process_time() - cpu,
+                                  'child_cpu_time': _child_cpu_time() - child_cpu}
+
+    def report(self):
+        """Return the recorded timings as a dict suitable for writing as JSON"""
+        report = {'start_time': self.start_time,
+                  'phases': [x for x in self.phases if x is not None],
+                  'calls': self.calls}
+        if self.end_time is not None:
+            report.update({'end_time': self.end_time,
+                           'wall_time': self.wall_time,
+                           'cpu_time': self.cpu_time,
+                           'child_cpu_time': self.child_cpu_time})
+        return report
+
+    def write_report(self, filename):
+        """Write the report as JSON to filename; returns True if successful"""
+        return utilities.atomic_write(filename, json.dumps(self.report(), indent=1), encoding="utf-8",
+                                      mode=0o644)
+
+    def summary(self, max_calls=10):
+        """Return a table summarizing the phases and the slowest external calls"""
+        lines = ["%s %s %s %s" % ('Phase'.ljust(40), 'Wall (s)'.rjust(10), 'CPU (s)'.rjust(10),
+                                  'Child CPU (s)'.rjust(14)),
+                 "%s %s %s %s" % (''.ljust(40, '-'), ''.ljust(10, '-'), ''.ljust(10, '-'), ''.ljust(14, '-'))]
+        for entry in self.report()['phases']:
+            name = entry['name']
+            if entry['parent']:
+                name = '  ' + name
+            lines.append("%s %10.3f %10.3f %14.3f" % (name[:40].ljust(40), entry['wall_time'], entry['cpu_time'],
+                                                      entry['child_cpu_time']))
+        if self.end_time is not None:
+            lines.append("%s %10.3f %10.3f %14.3f" % ('Total'.ljust(40), self.wall_time, self.cpu_time,
+                                                      self.child_cpu_time))
+
+        calls = sorted(self.calls, key=lambda x: x['wall_time'], reverse=True)[:max_calls]
+        if calls:
+            total = sum(x['wall_time'] for x in self.calls)
+            lines.append("")
+            lines.append("%d external calls taking %.3f s; slowest:" % (len(self.calls), total))
+            for call in calls:
+                argv = call['argv']
+                if isinstance(argv, list):
+                    argv = ' '.join(argv)
+                lines.append("%10.3f  %-8s %s" % (call['wall_time'], call['kind'], argv))
+        return "\n".join(lines) + "\n"
+
+
+def start():
+    """Create and install a Profiler that phase() records into, and return it"""
+    global _profiler
+    stop()
+    _profiler = Profiler()
+    _profiler.install()
+    return _profiler
+
+
+def stop():
+    """Uninstall the active Profiler, if any, and return it"""
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    if profiler is not None:
+        profiler.uninstall()
+    return profiler
+
+
+def active_profiler():
+    """Return the active Profiler, or None if profiling is off"""
+    return _profiler
+
+
+def phase(name):
+    """
+    Context manager that records the time spent in a named phase if
+    profiling is on, and does nothing otherwise
+    """
+    if _profiler is None:
+        return _no_phase()
+    return _profiler.phase(name)
+
+
+@contextlib.contextmanager
+def _no_phase():
+    yield
@@ -0,0 +1,179 @@
+""" Module to resolve hostnames concurrently, with a deadline, remembering the results for the run """
+
+import logging
+import socket
+import threading
+import time
+from collections import namedtuple
+
+__all__ = ['DEFAULT_TIMEOUT',
+           'DEFAULT_CONCURRENCY',
+           'LookupResult',
+           'Resolver',
+           'get_resolver',
+           'set_resolver',
+           'prefetch',
+           'resolve',
+           'getfqdn',
+           'add_observer',
+           'remove_observer']
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 16
+
+logger = logging.getLogger(__name__)
+
+# function -- the name of the lookup function called
+# host -- the hostname looked up
+# address -- the result, or None if it failed
+# wall_time -- how many seconds it took
+LookupResult = namedtuple('LookupResult', 'function host address wall_time')
+
+# functions called with each LookupResult; profiling uses this
+_observers = []
+
+
+def add_observer(observer):
+    """
+    Call observer(result) with the LookupResult of every lookup made by a
+    Resolver or getfqdn()
+    """
+    _observers.append(observer)
+
+
+def remove_observer(observer):
+    """Stop calling an observer passed to add_observer()"""
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _notify(function, host, address, start):
+    result = LookupResult(function, host, address, time.perf_counter() - start)
+    for observer in list(_observers):
+        observer(result)
+
+
+class _Lookup:
+    """The state of the lookup of one hostname"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.started = None
+        self.address = None
+        self.timed_out = False
+
+
+class Resolver:
+    """
+    Resolves hostnames in background threads, up to max_concurrent at once.
+    Hostnames can be handed to prefetch() as soon as they are known (e.g.
+    while parsing the configuration) so they are resolved by the time
+    resolve() is asked for them.  A lookup that takes longer than timeout
+    seconds counts as failed; results are remembered for the life of the
+    Resolver.
+    """
+
+    def __init__(self, lookup=None, timeout=DEFAULT_TIMEOUT, max_concurrent=DEFAULT_CONCURRENCY):
+        """
+        Keyword arguments:
+        lookup -- function taking a hostname and returning its address or
+                  raising OSError; socket.gethostbyname if None
+        timeout -- the number of seconds to allow each lookup
+        max_concurrent -- the maximum number of lookups to run at once
+        """
+        self.lookup = lookup
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._lock = threading.Lock()
+        self._lookups = {}
+
+    def _run(self, host, lookup):
+        with self._semaphore:
+            lookup.started = time.monotonic()
+            function = self.lookup or socket.gethostbyname
+            start = time.perf_counter()
+            try:
+                lookup.address = function(host)
+            except (OSError, UnicodeError) as err:
+                logger.debug("%s does not resolve: %s", host, err)
+            finally:
+                lookup.done.set()
+                _notify(getattr(function, '__name__', 'lookup'), host, lookup.address, start)
+
+    def _start(self, host):
+        with self._lock:
+            lookup = self._lookups.get(host)
+            if lookup is None:
+                lookup = self._lookups[host] = _Lookup()
+                # daemon threads so a hung lookup doesn't hold up exiting
+                thread = threading.Thread(target=self._run, args=(host, lookup), daemon=True)
+                thread.start()
+        return lookup
+
+    def prefetch(self, hosts):
+        """Start resolving any of hosts that have not been looked up yet"""
+        for host in hosts:
+            if host:
+                self._start(host)
+
+    def resolve(self, host):
+        """
+        Return the address of host, or None if it does not resolve or the
+        lookup took longer than the timeout
+        """
+        lookup = self._start(host)
+        while not lookup.done.is_set() and not lookup.timed_out:
+            if lookup.started is None:
+                # still waiting for a free slot
+                lookup.done.wait(0.05)
+                continue
+            remaining = lookup.started + self.timeout - time.monotonic()
+            if remaining <= 0 or not lookup.done.wait(remaining):
+                if not lookup.done.is_set() and not lookup.timed_out:
+                    lookup.timed_out = True
+                    logger.warning("Looking up %s took longer than %s seconds; treating it as "
+                                   "unresolvable" % (host, self.timeout))
+        if lookup.timed_out:
+            return None
+        return lookup.address
+
+
+_resolver = Resolver()
+
+
+def get_resolver():
+    """Return the Resolver used for the run"""
+    return _resolver
+
+
+def set_resolver(resolver=None):
+    """
+    Replace the Resolver used for the run, forgetting all earlier lookups; a
+    new default Resolver is used if resolver is None.  Used by tests to
+    provide a stub lookup, e.g. set_resolver(Resolver(lookup=fake_gethostbyname))
+    """
+    global _resolver
+    if resolver is None:
+        resolver = Resolver()
+    _resolver = resolver
+
+
+def prefetch(hosts):
+    """Start resolving hosts with the run's Resolver"""
+    _resolver.prefetch(hosts)
+
+
+def resolve(host):
+    """Return the address of host according to the run's Resolver, or None"""
+    return _resolver.resolve(host)
+
+
+def getfqdn():
+    """Return the fully qualified name of this host, as socket.getfqdn() does"""
+    start = time.perf_counter()
+    name = None
+    try:
+        name = socket.getfqdn()
+        return name
+    finally:
+        _notify('getfqdn', '', name, start)
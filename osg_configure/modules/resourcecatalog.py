@@ -1,5 +1,6 @@
-import classad
+import io
 import logging
+import re
 from collections import namedtuple
 from . import utilities
 
@@ -14,6 +15,8 @@ def _extra_transforms_to_classad(extra_transforms):
     """Ensure extra_transforms is surrounded by exactly one pair of brackets
     so it can be parsed as a classad
     """
+    # Import classad here: only extra_transforms needs the HTCondor bindings
+    import classad
     return classad.parseOne('[' + extra_transforms.lstrip('[ \t').rstrip('] \t') + ']')
 
 
@@ -21,6 +24,26 @@ def _to_classad_list(a_list):
     return "{ " + ", ".join([utilities.classad_quote(it) for it in a_list if it]) + " }"
 
 
+def _advertised_size(value):
+    """Return the size of an OSG_ResourceCatalog value as it is advertised to
+    the collectors; exact if the HTCondor bindings can be imported, estimated
+    by collapsing whitespace otherwise
+    """
+    try:
+        import classad
+    except ImportError:
+        return len(re.sub(r'\s+', ' ', value.replace('\\\n', '')))
+    name = 'OSG_ResourceCatalog'
+    ad = classad.ClassAd()
+    ad[name] = classad.ExprTree(value.replace('\\\n', ''))
+    return len(ad.printOld().strip()) - len('%s = ' % name)
+
+
+def _format_attribute(attribkey, value):
+    """Return an attribute as a line of an entry in the OSG_ResourceCatalog attribute"""
+    return '    %s = %s; \\\n' % (attribkey, value)
+
+
 class RCAttribute(namedtuple("RCAttribute", "rce_field classad_attr format_fn")):
     """The mapping of an RCEntry field to a classad attribute, with a format function"""
 
@@ -45,8 +68,17 @@ ATTRIBUTE_MAPPINGS = [
     RCAttribute("is_pilot", "IsPilotEntry", bool),
 ]
 
+# attributes whose values are often the same across entries; entries with
+# the same value keep one copy of it
+SHARED_ATTRIBUTES = ("AllowedVOs", "Requirements", "Transform")
+
 
 class RCEntry(object):
+    # a site can have thousands of entries, so don't give each one a __dict__
+    __slots__ = ("name", "cpus", "memory", "allowed_vos", "max_wall_time", "queue", "subclusters", "vo_tag",
+                 "extra_requirements", "extra_transforms", "gpus", "max_pilots", "whole_node",
+                 "require_singularity", "os", "send_tests", "is_pilot")
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', '')
         self.cpus = kwargs.get('cpus', 0)
@@ -90,7 +122,7 @@ class RCEntry(object):
     def get_transform(self, attributes):
         if self.is_pilot:
             return None
-        transform_classad = classad.ClassAd()
+        transform_classad = {}
         if "CPUs" in attributes:
             transform_classad["set_xcount"] = "RequestCPUs"
         if "Memory" in attributes:
@@ -101,17 +133,21 @@ class RCEntry(object):
             transform_classad['set_remote_queue'] = utilities.classad_quote(self.queue)
         if self.extra_transforms:
             try:
-                transform_classad.update(_extra_transforms_to_classad(self.extra_transforms))
+                extra_transforms_classad = _extra_transforms_to_classad(self.extra_transforms)
             except SyntaxError as e:
                 raise ValueError("Unable to parse 'extra_transforms': %s" % e)
+            # merge into a real ClassAd, whose attribute names are case-insensitive
+            import classad
+            merged_classad = classad.ClassAd()
+            for key, value in transform_classad.items():
+                merged_classad[key] = value
+            merged_classad.update(extra_transforms_classad)
+            transform_classad = merged_classad
 
         if transform_classad:
-            transform = "["
-            for key in sorted(transform_classad.keys()):
-                transform += f" {key} = {transform_classad[key]};"
-            transform += " ]"
-
-            return transform
+            return ("["
+                    + "".join(f" {key} = {transform_classad[key]};" for key in sorted(transform_classad.keys()))
+                    + " ]")
         return None
 
     def as_attributes(self):
@@ -135,36 +171,85 @@ class RCEntry(object):
 
         return attributes
 
+    def sorted_attributes(self):
+        """Return this entry as a tuple of (name, value) pairs of classad
+        attributes, sorted by name"""
+        return tuple(sorted(self.as_attributes().items()))
+
 
 class ResourceCatalog(object):
-    """Class for building an OSG_ResourceCatalog attribute in condor-ce configs for the ce-collector"""
+    """Class for building an OSG_ResourceCatalog attribute in condor-ce configs for the ce-collector
+
+    Rather than a dict of its attributes, each entry is kept as a tuple of
+    the formatted text of its other attributes and (name, value) pairs for
+    its SHARED_ATTRIBUTES; entries with the same value share one pair.  The
+    catalog is written out piece by piece instead of being built up with
+    string concatenation.
+    """
 
     def __init__(self):
         self.entries = {}
+        self._values = {}
 
     def add_rcentry(self, rcentry):
-        self.entries[rcentry.name] = rcentry.as_attributes()
+        entry = []
+        lines = []
+        for attribkey, value in rcentry.sorted_attributes():
+            if attribkey in SHARED_ATTRIBUTES:
+                if lines:
+                    entry.append(''.join(lines))
+                    lines = []
+                entry.append(self._values.setdefault((attribkey, value), (attribkey, value)))
+            else:
+                lines.append(_format_attribute(attribkey, value))
+        if lines:
+            entry.append(''.join(lines))
+        self.entries[rcentry.name] = tuple(entry)
 
         return self
 
+    def write_value(self, out):
+        """Write the OSG_ResourceCatalog classad attribute made of all the
+        entries in this object to out, a text file-like object"""
+        if not self.entries:
+            out.write('{}')
+            return
+        out.write('{ \\\n')
+        separator = ''
+        for entrykey in sorted(self.entries):
+            out.write(separator)
+            out.write('  [ \\\n')
+            for part in self.entries[entrykey]:
+                if isinstance(part, str):
+                    out.write(part)
+                else:
+                    out.write(_format_attribute(*part))
+            out.write('  ]')
+            separator = ', \\\n'
+        out.write(' \\\n}')
+
     def format_value(self) -> str:
         """Return the OSG_ResourceCatalog classad attribute made of all the entries in this object"""
-        if not self.entries:
-            catalog = '{}'
-        else:
-            entry_texts = []
-            for entrykey in sorted(self.entries):
-                entry = self.entries[entrykey]
-                entry_text = '  [ \\\n'
-                for attribkey in sorted(entry):
-                    entry_text += '    %s = %s; \\\n' % (attribkey, entry[attribkey])
-                entry_text += '  ]'
-                entry_texts.append(entry_text)
-            catalog = ('{ \\\n'
-                       + ', \\\n'.join(entry_texts)
-                       + ' \\\n}')
-        return catalog
+        out = io.StringIO()
+        self.write_value(out)
+        return out.getvalue()
+
+    def write_text(self, out):
+        """Write the whole OSG_ResourceCatalog setting to out, a text file-like object"""
+        out.write('OSG_ResourceCatalog = ')
+        self.write_value(out)
 
     def compose_text(self):
-        catalog = self.format_value()
-        return 'OSG_ResourceCatalog = ' + catalog
+        out = io.StringIO()
+        self.write_text(out)
+        return out.getvalue()
+
+    def size_report(self):
+        """Return a dict of
+        config -- the size of the OSG_ResourceCatalog setting in the config
+        advertised -- the size of the attribute in the ad sent to the
+                      collectors (see _advertised_size())
+        Sizes are in bytes.
+        """
+        return {'config': len(self.compose_text()),
+                'advertised': _advertised_size(self.format_value())}
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import errno
 import fnmatch
+import json
+import os
 import pwd
 import re
 import sys
@@ -8,10 +10,17 @@ import logging
 
 from collections import namedtuple
 
+from osg_configure.modules import utilities
+
 
 DEFAULT_VOMS_MAPFILE = "/usr/share/osg/voms-mapfile-default"
-VOMS_MAPFILE = " /etc/grid-security/voms-mapfile "
+VOMS_MAPFILE = "/etc/grid-security/voms-mapfile"
 BAN_MAPFILE = "/etc/grid-security/ban-voms-mapfile"
+ALLOWED_VOS_CACHE_FILE = "/var/lib/osg/osg-configure-allowed-vos-cache.json"
+ALLOWED_VOS_CACHE_VERSION = 1
+
+# username -> whether the user exists
+_user_exists = {}
 
 
 class Mapping(namedtuple('Mapping', 'pattern user')):
@@ -77,28 +86,65 @@ def read_banfile():
     return bans
 
 
+class BanMatcher:
+    """Matches VOMS attrib patterns against a list of ban patterns all at once,
+    with the same results as trying ``fnmatch.fnmatch`` with each ban in turn.
+    The bans are compiled into a single regular expression, so checking a
+    pattern takes one regex match instead of one fnmatch per ban.
+    """
+
+    def __init__(self, bans):
+        self.bans = list(bans)
+        # fnmatch.fnmatch only differs from fnmatchcase by applying
+        # os.path.normcase, which does nothing on POSIX
+        if self.bans:
+            self._regex = re.compile("|".join(fnmatch.translate(ban) for ban in self.bans))
+        else:
+            self._regex = None
+
+    def matches(self, pattern):
+        """Return True if ``pattern`` matches any of the bans"""
+        return self._regex is not None and self._regex.match(pattern) is not None
+
+
 def filter_out_bans(mappings, bans):
     """Get a list of mappings minus any that match the patterns in ``bans``
     
     :return: List of Mappings
     """
-    new_mappings = []
-    for mapping in mappings:
-        for ban in bans:
-            if fnmatch.fnmatch(mapping.pattern, ban):
-                break
-        else:
-            new_mappings.append(mapping)
-    return new_mappings
+    matcher = BanMatcher(bans)
+    return [mapping for mapping in mappings if not matcher.matches(mapping.pattern)]
+
+
+def user_exists(username):
+    """Return True if there is a Unix user named ``username``; the answers are
+    remembered, so each user is only looked up once
+
+    :return: bool
+    """
+    if username not in _user_exists:
+        try:
+            pwd.getpwnam(username)
+            _user_exists[username] = True
+        except KeyError:
+            _user_exists[username] = False
+    return _user_exists[username]
+
+
+def clear_user_cache():
+    """Forget which users exist"""
+    _user_exists.clear()
 
 
 def filter_by_existing_users(mappings):
-    """Get a list of mappings minus any that do not have corresponding Unix users
-    
+    """Get a list of mappings minus any that do not have corresponding Unix users.
+    Only the users named in the mappings are looked up, since enumerating every
+    user can be slow (or disabled) with a network user directory.
+
     :return: List of Mappings
     """
-    usernames = [x[0] for x in pwd.getpwall()]
-    new_mappings = [mapping for mapping in mappings if mapping.user in usernames]
+    existing_users = set(username for username in set(m.user for m in mappings) if user_exists(username))
+    new_mappings = [mapping for mapping in mappings if mapping.user in existing_users]
     return new_mappings
 
 
@@ -115,17 +161,74 @@ def get_vos(mappings):
     return vo_groups
 
 
-def get_allowed_vos():
+def _get_mapfile_fingerprints():
+    """Get [path, mtime, size] for each of the mapfiles; mtime and size are None
+    if the file does not exist
+
+    :return: List of fingerprints
+    """
+    fingerprints = []
+    for filepath in [DEFAULT_VOMS_MAPFILE, VOMS_MAPFILE, BAN_MAPFILE]:
+        try:
+            stat_result = os.stat(filepath)
+            fingerprints.append([filepath, stat_result.st_mtime_ns, stat_result.st_size])
+        except FileNotFoundError:
+            fingerprints.append([filepath, None, None])
+    return fingerprints
+
+
+def _load_allowed_vos(cache_file, fingerprints):
+    """Get the allowed VOs saved in ``cache_file`` if they were computed from
+    mapfiles matching ``fingerprints``
+
+    :return: Set of VOs, or None if there is no usable cache
+    """
+    try:
+        with open(cache_file, "r", encoding="utf-8") as filehandle:
+            cache = json.load(filehandle)
+        if cache["version"] != ALLOWED_VOS_CACHE_VERSION or cache["fingerprints"] != fingerprints:
+            return None
+        return set(cache["allowed_vos"])
+    except FileNotFoundError:
+        return None
+    except (EnvironmentError, ValueError, KeyError, TypeError) as err:
+        logging.getLogger(__name__).debug("Ignoring unusable allowed VOs cache %s: %s", cache_file, err)
+        return None
+
+
+def _save_allowed_vos(cache_file, fingerprints, allowed_vos):
+    """Save the allowed VOs computed from mapfiles matching ``fingerprints``; failures are ignored"""
+    cache = {"version": ALLOWED_VOS_CACHE_VERSION,
+             "fingerprints": fingerprints,
+             "allowed_vos": sorted(allowed_vos)}
+    if not utilities.atomic_write(cache_file, json.dumps(cache), encoding="utf-8", mode=0o644):
+        logging.getLogger(__name__).debug("Unable to write allowed VOs cache %s", cache_file)
+
+
+def get_allowed_vos(cache_file=ALLOWED_VOS_CACHE_FILE):
     """Get a set of all the VOs that might be allowed on this site (based on voms-mapfiles and Unix users on the CE)
+
+    The result is saved in ``cache_file`` and reused until one of the mapfiles
+    changes; pass None to neither use nor save a cache.  Changes to the Unix
+    users alone are not noticed until a mapfile changes or the cache is removed.
+
     :return: Set of VOs
     """
-    return get_vos(filter_by_existing_users(filter_out_bans(read_mapfiles(), read_banfile())))
+    fingerprints = _get_mapfile_fingerprints()
+    if cache_file:
+        allowed_vos = _load_allowed_vos(cache_file, fingerprints)
+        if allowed_vos is not None:
+            return allowed_vos
+    allowed_vos = get_vos(filter_by_existing_users(filter_out_bans(read_mapfiles(), read_banfile())))
+    if cache_file:
+        _save_allowed_vos(cache_file, fingerprints, allowed_vos)
+    return allowed_vos
 
 
 def main(*args):
     """main function for testing"""
     logging.basicConfig(level=logging.WARNING)
-    print(get_allowed_vos())
+    print(get_allowed_vos(cache_file=None))
     return 0
 
 
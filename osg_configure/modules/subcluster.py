@@ -1,9 +1,11 @@
+import hashlib
 import logging
 import re
 import textwrap
-from typing import List, Optional
+from typing import Dict, List, Optional
 from configparser import NoSectionError, NoOptionError, InterpolationError, ConfigParser
 
+from osg_configure.modules import configurestate
 from osg_configure.modules import exceptions
 from osg_configure.modules import utilities
 
@@ -77,23 +79,40 @@ ENTRY_RANGES = {
 CPUCOUNT_DEFAULT = 1
 RAM_MB_DEFAULT = 2500
 
+# the types of sections, named by the prefix of the section name
+SUBCLUSTER_SECTION = "subcluster"
+RESOURCE_ENTRY_SECTION = "resource entry"
+PILOT_SECTION = "pilot"
+SECTION_TYPES = (SUBCLUSTER_SECTION, RESOURCE_ENTRY_SECTION, PILOT_SECTION)
+
 log = logging.getLogger(__name__)
 
 
+def section_type(section: str) -> Optional[str]:
+    """Return SUBCLUSTER_SECTION, RESOURCE_ENTRY_SECTION or PILOT_SECTION
+    depending on the section name, or None if it's none of them
+    """
+    normalized = section.lstrip().lower()
+    for type_ in SECTION_TYPES:
+        if normalized.startswith(type_):
+            return type_
+    return None
+
+
 def is_subcluster(section: str) -> bool:
-    return section.lstrip().lower().startswith("subcluster")
+    return section_type(section) == SUBCLUSTER_SECTION
 
 
 def is_resource_entry(section: str) -> bool:
-    return section.lstrip().lower().startswith("resource entry")
+    return section_type(section) == RESOURCE_ENTRY_SECTION
 
 
 def is_pilot(section: str) -> bool:
-    return section.lstrip().lower().startswith("pilot")
+    return section_type(section) == PILOT_SECTION
 
 
 def is_subcluster_like(section: str) -> bool:
-    return is_pilot(section) or is_subcluster(section) or is_resource_entry(section)
+    return section_type(section) is not None
 
 
 def check_entry(config, section, option, status, kind):
@@ -196,17 +215,17 @@ def check_section(config, section):
             raise exceptions.SettingError(msg)
 
 
-def check_config(config: ConfigParser) -> bool:
+def check_config(config: ConfigParser, index: "SectionIndex" = None) -> bool:
     """
     Check all subcluster definitions in an entire config
+    :param index: the SectionIndex of config, if already made
     :return: True if there are any subcluster definitions, False otherwise
     """
-    has_sc = False
-    for section in config.sections():
-        if is_subcluster_like(section):
-            has_sc = True
-            check_section(config, section)
-    return has_sc
+    if index is None:
+        index = SectionIndex(config)
+    for section in index.sections:
+        check_section(config, section)
+    return bool(index.sections)
 
 
 def rce_section_get_name(config: ConfigParser, section: str) -> Optional[str]:
@@ -224,6 +243,58 @@ def rce_section_get_name(config: ConfigParser, section: str) -> Optional[str]:
     return config[section].get("name", default_name).strip()
 
 
+class SectionIndex:
+    """The Subcluster, Resource Entry and Pilot sections of a config, sorted
+    out in one pass over the config so the checks and the resource catalog
+    don't each go through every section again.
+
+    Attributes:
+    sections -- all the Subcluster/Resource Entry/Pilot sections, in config order
+    by_type -- dict of each type in SECTION_TYPES to the sections of that type
+    names -- dict of each of those sections to its name (see rce_section_get_name())
+    sections_by_name -- dict of each name to the sections using it
+    subcluster_names -- set of the names of the Subcluster sections, which
+                        Resource Entry sections can refer to
+    """
+
+    def __init__(self, config: ConfigParser):
+        self.sections = []
+        self.by_type = dict((type_, []) for type_ in SECTION_TYPES)
+        self.names = {}
+        self.sections_by_name = {}
+        for section in config.sections():
+            type_ = section_type(section)
+            if type_ is None:
+                continue
+            self.sections.append(section)
+            self.by_type[type_].append(section)
+            try:
+                name = rce_section_get_name(config, section)
+            except InterpolationError:
+                # check_section() reports the problem
+                name = None
+            self.names[section] = name
+            if name is not None:
+                self.sections_by_name.setdefault(name, []).append(section)
+        self.subcluster_names = set(self.names[section] for section in self.by_type[SUBCLUSTER_SECTION])
+
+    @property
+    def subclusters(self) -> List[str]:
+        return self.by_type[SUBCLUSTER_SECTION]
+
+    @property
+    def resource_entries(self) -> List[str]:
+        return self.by_type[RESOURCE_ENTRY_SECTION]
+
+    @property
+    def pilots(self) -> List[str]:
+        return self.by_type[PILOT_SECTION]
+
+    def duplicate_names(self) -> Dict[str, List[str]]:
+        """Return a dict of each name used by more than one section to those sections"""
+        return dict((name, sections) for name, sections in self.sections_by_name.items() if len(sections) > 1)
+
+
 class ResourceCatalog:  # forward declaration for type checking
     def compose_text(self) -> str:
         pass
@@ -232,10 +303,61 @@ class ResourceCatalog:  # forward declaration for type checking
         pass
 
 
-def resource_catalog_from_config(config: ConfigParser, default_allowed_vos: List[str] = None) -> ResourceCatalog:
+# (fingerprint of the subcluster-like sections, default_allowed_vos) -> ResourceCatalog
+_resource_catalog_cache = {}
+# only the catalogs of the last few configurations are kept
+_RESOURCE_CATALOG_CACHE_SIZE = 8
+
+
+def subcluster_sections_fingerprint(config: ConfigParser, index: SectionIndex = None) -> str:
+    """Return a hash of the names and contents of the Subcluster/Resource Entry/Pilot
+    sections in a config, in order; the ResourceCatalog only depends on these
+    :param index: the SectionIndex of config, if already made
+    """
+    if index is None:
+        index = SectionIndex(config)
+    digest = hashlib.sha256()
+    for section in index.sections:
+        digest.update(("%s\0%s\0" % (section, configurestate.section_hash(config, section))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def clear_resource_catalog_cache():
+    """Forget the ResourceCatalogs built by resource_catalog_from_config()"""
+    _resource_catalog_cache.clear()
+
+
+def resource_catalog_from_config(config: ConfigParser, default_allowed_vos: List[str] = None,
+                                 index: SectionIndex = None) -> ResourceCatalog:
+    """
+    Create a ResourceCatalog from the subcluster entries in a config
+
+    The catalog is built once for each set of Subcluster/Resource Entry/Pilot
+    sections, so validating the config while parsing it and writing the
+    catalog out later share the same result; the returned catalog must not
+    be modified.  Errors are raised (and not remembered) every time.
+    :param default_allowed_vos: The allowed_vos to use if the user specified "*"
+    :param index: the SectionIndex of config, if already made
+    """
+    assert isinstance(config, ConfigParser)
+    if index is None:
+        index = SectionIndex(config)
+    key = (subcluster_sections_fingerprint(config, index), tuple(default_allowed_vos or []))
+    rc = _resource_catalog_cache.get(key)
+    if rc is None:
+        rc = _build_resource_catalog(config, default_allowed_vos, index)
+        if len(_resource_catalog_cache) >= _RESOURCE_CATALOG_CACHE_SIZE:
+            _resource_catalog_cache.clear()
+        _resource_catalog_cache[key] = rc
+    return rc
+
+
+def _build_resource_catalog(config: ConfigParser, default_allowed_vos: List[str] = None,
+                            index: SectionIndex = None) -> ResourceCatalog:
     """
     Create a ResourceCatalog from the subcluster entries in a config
     :param default_allowed_vos: The allowed_vos to use if the user specified "*"
+    :param index: the SectionIndex of config, if already made
     """
     logger = logging.getLogger(__name__)
     assert isinstance(config, ConfigParser)
@@ -249,15 +371,13 @@ def resource_catalog_from_config(config: ConfigParser, default_allowed_vos: List
 
     rc = ResourceCatalog()
 
-    # list of section names of all subcluster sections
-    subcluster_sections = [section for section in config.sections() if is_subcluster(section)]
-    subcluster_names = [rce_section_get_name(config, section) for section in subcluster_sections]
+    if index is None:
+        index = SectionIndex(config)
+    for name, sections in sorted(index.duplicate_names().items()):
+        logger.warning("The name '%s' is used by more than one section: '%s'" % (name, "', '".join(sections)))
 
     sections_without_max_wall_time = []
-    for section in config.sections():
-        if not is_subcluster_like(section):
-            continue
-
+    for section in index.sections:
         check_section(config, section)
 
         rcentry = RCEntry()
@@ -304,7 +424,7 @@ def resource_catalog_from_config(config: ConfigParser, default_allowed_vos: List
         scs = utilities.split_comma_separated_list(safeget("subclusters", ""))
         if scs:
             for sc in scs:
-                if sc not in subcluster_names:
+                if sc not in index.subcluster_names:
                     raise exceptions.SettingError("Undefined subcluster '%s' mentioned in section '%s'" % (sc, section))
             rcentry.subclusters = scs
         else:
@@ -330,7 +450,7 @@ def resource_catalog_from_config(config: ConfigParser, default_allowed_vos: List
             rcentry.is_pilot = True
 
         rc.add_rcentry(rcentry)
-    # end for section in config.sections()
+    # end for section in index.sections
 
     if sections_without_max_wall_time:
         logger.warning("No max_wall_time specified for some sections; defaulting to 1440."
@@ -1,5 +1,7 @@
 """ Module to hold various utility functions """
+import contextlib
 import errno
+import functools
 import glob
 import logging
 import os
@@ -7,13 +9,20 @@ import platform
 import re
 import socket
 import stat
-import subprocess
 import sys
 import tempfile
+import threading
 from configparser import ConfigParser, NoOptionError, NoSectionError
 from typing import List
 
+from osg_configure.modules import commandrunner
+from osg_configure.modules import resolver
+
 CONFIG_DIRECTORY = "/etc/osg"
+# how long to let commands that only look things up run
+QUERY_TIMEOUT = 120
+# how long to let fetch-crl run
+FETCH_CRL_TIMEOUT = 1800
 
 logger = logging.getLogger(__name__)
 
@@ -111,7 +120,7 @@ def get_set_membership(test_set, reference_set, defaults=None):
 def get_hostname():
     """Returns the hostname of the current system"""
     try:
-        return socket.getfqdn()
+        return resolver.getfqdn()
     except socket.error:
         return None
 
@@ -166,10 +175,9 @@ def service_enabled(service_name):
     """
     if service_name is None or service_name == "":
         return False
-    process = subprocess.Popen(['/sbin/service', '--list', service_name],
-                               stdout=subprocess.PIPE, encoding="latin-1")
-    output = process.communicate()[0]
-    if process.returncode != 0:
+    result = commandrunner.run(['/sbin/service', '--list', service_name], timeout=QUERY_TIMEOUT)
+    output = result.stdout
+    if result.returncode != 0:
         return False
 
     match = re.search(service_name + r'\s*\|.*\|\s*([a-z ]*)$', output)
@@ -216,21 +224,21 @@ def fetch_crl():
                                      'CRL retrieval for',
                                      r'^\s*$',
                                      ]
-        try:
-            fetch_crl_process = subprocess.Popen([crl_path, '-p', '10', '-T', '30'], stdout=subprocess.PIPE,
-                                                 stderr=subprocess.STDOUT, encoding="latin-1")
-        except OSError as e:
-            if e.errno == errno.ENOENT:
-                sys.stdout.write("Can't find fetch-crl script, skipping fetch-crl invocation\n")
-                sys.stdout.flush()
-                return True
-            else:
-                raise
+        if not os.path.exists(crl_path):
+            sys.stdout.write("Can't find fetch-crl script, skipping fetch-crl invocation\n")
+            sys.stdout.flush()
+            return True
         sys.stdout.write("Running %s, this process may take " % crl_path +
                          "some time to fetch all the crl updates\n")
         sys.stdout.flush()
-        outerr = fetch_crl_process.communicate()[0]
-        if fetch_crl_process.returncode != 0:
+        result = commandrunner.run([crl_path, '-p', '10', '-T', '30'], timeout=FETCH_CRL_TIMEOUT,
+                                   merge_stderr=True)
+        if result.error is not None or result.timed_out:
+            sys.stdout.write("Unable to run fetch-crl: %s\n" % (result.error or "timed out"))
+            sys.stdout.flush()
+            return False
+        outerr = result.stdout
+        if result.returncode != 0:
             sys.stdout.write("fetch-crl script had some errors:\n" + outerr + "\n")
             sys.stdout.flush()
             for line in outerr.rstrip("\n").split("\n"):
@@ -246,28 +254,20 @@ def fetch_crl():
     return True
 
 
-def run_script(script):
+def run_script(script, timeout=commandrunner.DEFAULT_TIMEOUT):
     """
     Arguments:
     script - a string or a list of arguments to run formatted while
              the args argument to subprocess.Popen
+    timeout - the number of seconds after which the script is killed
 
     Returns:
     True if script runs successfully, False otherwise
     """
-
-    try:
-        process = subprocess.Popen(script)
-    except OSError as e:
-        if e.errno == errno.ENOENT:
-            return False
-        else:
-            raise
-    process.communicate()
-    if process.returncode != 0:
-        return False
-
-    return True
+    result = commandrunner.run(script, timeout=timeout, capture=False)
+    if result.returncode == commandrunner.EXIT_NOT_EXECUTABLE and result.error is not None:
+        raise OSError(result.error)
+    return result.returncode == 0
 
 
 def get_condor_location(default_location='/usr'):
@@ -296,6 +296,173 @@ def get_condor_config(default_config='/etc/condor/condor_config'):
         return os.path.join(get_condor_location(), 'etc/condor_config')
 
 
+class CondorConfigView:
+    """
+    The values of HTCondor configuration variables as reported by one
+    condor_config_val executable for one subsystem.  Variables are looked
+    up in batches with a single invocation (or in-process with the htcondor
+    Python bindings when allowed) and remembered, since each invocation of
+    condor_config_val re-reads the entire HTCondor configuration.
+    """
+
+    def __init__(self, executable, subsystem=None, use_bindings=False, stub=None):
+        """
+        Arguments:
+        executable - the condor_config_val executable to run
+        subsystem - if passed, query a specific subsystem (SCHEDD, COLLECTOR, etc.)
+        use_bindings - if True, use htcondor.param instead of running
+                       executable when the htcondor module can be imported
+        stub - if passed, a dict of the variables that are defined and their
+               values, used instead of running executable
+        """
+        self.executable = executable
+        self.subsystem = subsystem
+        self.use_bindings = use_bindings
+        self.stub = stub
+        # variable -> value, or None if undefined or the lookup failed
+        self._values = {}
+        self._undefined = set()
+
+    def prefetch(self, variables):
+        """Look up any of the given variables that have not been looked up yet"""
+        missing = []
+        for variable in variables:
+            if variable not in self._values and variable not in missing:
+                missing.append(variable)
+        if not missing:
+            return
+        if self.stub is not None:
+            for variable in missing:
+                self._values[variable] = self.stub.get(variable)
+                if self._values[variable] is None:
+                    self._undefined.add(variable)
+            return
+        if self.use_bindings and self._fetch_with_bindings(missing):
+            return
+        if not self._fetch_with_executable(missing):
+            # could not match up the output with the variables; fall back to
+            # looking up the variables one at a time
+            for variable in missing:
+                self._fetch_with_executable([variable])
+
+    def get(self, variable, quiet_undefined=False):
+        """
+        Return the expanded value of a variable, or None if it is undefined or
+        condor_config_val reports an error
+
+        Arguments:
+        variable - name of the variable whose value to return
+        quiet_undefined - set to True if messages claiming the variable is
+                          undefined should be silenced
+        """
+        self.prefetch([variable])
+        if variable in self._undefined and not quiet_undefined:
+            sys.stderr.write("Not defined: %s\n" % variable)
+        return self._values[variable]
+
+    def _fetch_with_bindings(self, variables):
+        try:
+            import htcondor
+        except ImportError:
+            return False
+        for variable in variables:
+            value = htcondor.param.get(variable)
+            if value is None:
+                self._undefined.add(variable)
+            else:
+                value = value.strip()
+            self._values[variable] = value
+        return True
+
+    def _fetch_with_executable(self, variables):
+        cmd = [self.executable]
+        if self.subsystem:
+            cmd.extend(["-subsystem", self.subsystem])
+        cmd.extend(variables)
+        result = commandrunner.run(cmd, timeout=QUERY_TIMEOUT)
+        if result.error is not None or result.timed_out:
+            for variable in variables:
+                self._values[variable] = None
+            return True
+        output, error = result.stdout, result.stderr
+
+        # condor_config_val prints one line per defined variable and reports
+        # undefined variables on stderr
+        undefined = set()
+        for line in error.splitlines():
+            if line.startswith('Not defined:'):
+                undefined.add(line[len('Not defined:'):].strip())
+            elif line.strip():
+                sys.stderr.write(line + "\n")
+        defined = [variable for variable in variables if variable not in undefined]
+        values = output.splitlines()
+        if result.returncode != 0 and not undefined:
+            for variable in variables:
+                self._values[variable] = None
+            return True
+        if len(values) != len(defined):
+            return False
+
+        for variable, value in zip(defined, values):
+            self._values[variable] = value.strip()
+        for variable in undefined.intersection(variables):
+            self._values[variable] = None
+            self._undefined.add(variable)
+        return True
+
+
+_condor_config_views = {}
+# condor_config_val executable name -> dict of variable -> value, used
+# instead of running the executables; None to run them
+_condor_config_stubs = None
+
+
+def condor_config_view(executable=None, subsystem=None):
+    """
+    Return the CondorConfigView for the given condor_config_val executable and
+    subsystem, creating it if necessary.  If executable is not given, the
+    condor_config_val from the Condor install is used, or the htcondor Python
+    bindings if they are available and no subsystem is requested.
+    """
+    use_bindings = False
+    if not executable:
+        condor_location = get_condor_location()
+        if condor_location:
+            executable = os.path.join(condor_location, "bin/condor_config_val")
+        else:
+            executable = "condor_config_val"
+        use_bindings = not subsystem
+
+    key = (executable, subsystem, os.environ.get('CONDOR_CONFIG'))
+    if key not in _condor_config_views:
+        stub = None
+        if _condor_config_stubs is not None:
+            stub = _condor_config_stubs.get(os.path.basename(executable), {})
+        _condor_config_views[key] = CondorConfigView(executable, subsystem, use_bindings, stub)
+    return _condor_config_views[key]
+
+
+def clear_condor_config_cache():
+    """Forget all remembered HTCondor configuration values"""
+    _condor_config_views.clear()
+
+
+def set_condor_config_stubs(stubs=None):
+    """
+    Answer HTCondor configuration lookups from stubs instead of running
+    condor_config_val, or run it again if stubs is None
+
+    Arguments:
+    stubs - dict mapping the name of a condor_config_val executable (e.g.
+            condor_config_val or condor_ce_config_val) to a dict of the
+            variables it defines and their values; variables not listed are
+            undefined
+    """
+    global _condor_config_stubs
+    _condor_config_stubs = stubs
+    clear_condor_config_cache()
+
+
 def get_condor_config_val(variable, executable=None, quiet_undefined=False, subsystem=None):
     """
     Use condor_config_val to return the expanded value of a variable.
@@ -311,29 +478,7 @@ def get_condor_config_val(variable, executable=None, quiet_undefined=False, subs
     The stripped output of condor_config_val, or None if
     condor_config_val reports an error.
     """
-    if not executable:
-        condor_location = get_condor_location()
-        if condor_location:
-            executable = os.path.join(condor_location, "bin/condor_config_val")
-        else:
-            executable = "condor_config_val"
-
-    try:
-        cmd = [executable]
-        if subsystem:
-            cmd.extend(["-subsystem", subsystem])
-        cmd.append(variable)
-        process = subprocess.Popen(cmd,
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                   encoding="latin-1")
-        output, error = process.communicate()
-        if error and not (error.startswith('Not defined:') and quiet_undefined):
-            sys.stderr.write(error)
-        if process.returncode != 0:
-            return None
-        return output.strip()
-    except OSError:
-        return None
+    return condor_config_view(executable, subsystem).get(variable, quiet_undefined)
 
 
 def get_condor_ce_config_val(variable, *args, **kwargs):
@@ -352,19 +497,305 @@ def read_file(filename, default=None):
     """
     contents = default
     try:
-        fh = open(filename, "r", encoding="latin-1")
-        try:
-            contents = fh.read()
-        finally:
-            fh.close()
+        contents = current_contents(filename)
     except EnvironmentError:
         pass
     return contents
 
 
+def current_contents(filename):
+    """
+    Return the contents of a file, including changes made by atomic_write that
+    are staged in the write transaction but not yet committed
+
+    :param filename: name of file to read
+    :type filename: str
+    :return: contents of the file
+    :raises EnvironmentError: if the file cannot be read
+    """
+    transaction = _transaction
+    if transaction is not None:
+        staged = transaction.contents(filename)
+        if staged is not None:
+            return staged.decode("latin-1")
+    with open(filename, "r", encoding="latin-1") as fh:
+        return fh.read()
+
+
+# Files that atomic_write has changed during this run, in the order they
+# were first changed
+_changed_files = []
+_changed_files_lock = threading.Lock()
+
+
+def _record_changed_file(filename):
+    filename = os.path.abspath(filename)
+    with _changed_files_lock:
+        if filename not in _changed_files:
+            _changed_files.append(filename)
+
+
+def changed_files():
+    """
+    Return a list of the absolute paths of the files whose contents or
+    permissions atomic_write has changed since the start of the run (or the
+    last call to clear_changed_files)
+    """
+    with _changed_files_lock:
+        return list(_changed_files)
+
+
+def file_changed(filename):
+    """Return True if atomic_write has changed filename during this run"""
+    with _changed_files_lock:
+        return os.path.abspath(filename) in _changed_files
+
+
+def clear_changed_files():
+    """Forget which files atomic_write has changed"""
+    with _changed_files_lock:
+        del _changed_files[:]
+
+
+def _same_contents(filename, contents):
+    """Return True if filename is a regular file containing exactly contents"""
+    try:
+        if os.path.getsize(filename) != len(contents):
+            return False
+        with open(filename, "rb") as file_handle:
+            return file_handle.read() == contents
+    except EnvironmentError:
+        return False
+
+
+class WriteTransaction:
+    """
+    Files written with atomic_write while the transaction is active; they are
+    all written at once by commit(), or not at all.  Files written right away
+    inside unstaged_writes() are put back as they were by rollback().
+    """
+
+    def __init__(self):
+        # absolute path -> (contents as bytes, mode or None)
+        self.staged = {}
+        # absolute path -> (contents as bytes or None if it did not exist,
+        # mode or None) before it was first written inside unstaged_writes()
+        self.originals = {}
+        self._lock = threading.Lock()
+
+    def stage(self, filename, contents, mode=None):
+        """Stage contents to be written to filename with permissions mode"""
+        with self._lock:
+            self.staged[os.path.abspath(filename)] = (contents, mode)
+
+    def unstage(self, filename):
+        """Forget the staged contents of filename"""
+        with self._lock:
+            self.staged.pop(os.path.abspath(filename), None)
+
+    def save_original(self, filename):
+        """Remember the contents of filename before it is written outside of the transaction"""
+        filename = os.path.abspath(filename)
+        with self._lock:
+            if filename in self.originals:
+                return
+        try:
+            with open(filename, "rb") as file_handle:
+                original = (file_handle.read(), stat.S_IMODE(os.fstat(file_handle.fileno()).st_mode))
+        except FileNotFoundError:
+            original = (None, None)
+        except EnvironmentError as err:
+            logger.debug("Unable to save %s; it will not be restored on rollback: %s", filename, err)
+            return
+        with self._lock:
+            self.originals.setdefault(filename, original)
+
+    def rollback(self):
+        """
+        Forget the staged files and put back the previous versions of the
+        files written outside of the transaction
+
+        Returns:
+        True if every file was put back, False otherwise
+        """
+        with self._lock:
+            self.staged = {}
+            originals = sorted(self.originals.items())
+            self.originals = {}
+
+        restored = True
+        for filename, (contents, mode) in originals:
+            if contents is None:
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    pass
+                except EnvironmentError as err:
+                    logger.error("Unable to remove %s: %s", filename, err)
+                    restored = False
+                    continue
+            elif not atomic_write(filename, contents, mode=mode):
+                logger.error("Unable to restore %s", filename)
+                restored = False
+                continue
+            logger.debug("Restored %s", filename)
+        return restored
+
+    def contents(self, filename):
+        """Return the staged contents of filename as bytes, or None if not staged"""
+        with self._lock:
+            staged = self.staged.get(os.path.abspath(filename))
+        if staged is None:
+            return None
+        return staged[0]
+
+    def commit(self):
+        """
+        Write every staged file that differs from what is on disk: write
+        all the temporary files and sync them, then rename them all into
+        place.  If anything fails, the files already renamed are restored
+        to their previous versions.  Changed files are added to
+        changed_files().
+
+        Returns:
+        True if every file was written, False otherwise
+        """
+        with self._lock:
+            staged = sorted(self.staged.items())
+            self.staged = {}
+            originals = self.originals
+            self.originals = {}
+
+        temp_files = []
+        renamed = []
+        try:
+            for filename, (contents, mode) in staged:
+                current_mode = None
+                if os.path.exists(filename):
+                    current_mode = stat.S_IMODE(os.stat(filename).st_mode)
+                    if _same_contents(filename, contents) and mode in (None, current_mode):
+                        continue
+                if mode is None:
+                    # keep the previous permissions, or give new files 0644 permissions
+                    mode = current_mode if current_mode is not None else 0o644
+                (temp_fd, temp_name) = tempfile.mkstemp(dir=os.path.dirname(filename))
+                temp_files.append((filename, temp_name, temp_fd))
+                os.write(temp_fd, contents)
+                os.fchmod(temp_fd, mode)
+            # sync the data of all the files before any of them is renamed
+            for _, _, temp_fd in temp_files:
+                os.fsync(temp_fd)
+            for filename, temp_name, _ in temp_files:
+                backup_name = None
+                if os.path.exists(filename):
+                    backup_name = temp_name + ".orig"
+                    os.link(filename, backup_name)
+                os.rename(temp_name, filename)
+                renamed.append((filename, backup_name))
+                logger.debug("Wrote %s", filename)
+        except EnvironmentError as err:
+            logger.error("Unable to write %s: %s", getattr(err, 'filename', None) or "files", err)
+            for filename, backup_name in reversed(renamed):
+                try:
+                    if backup_name:
+                        os.rename(backup_name, filename)
+                    else:
+                        os.unlink(filename)
+                    logger.debug("Restored %s", filename)
+                except EnvironmentError as restore_err:
+                    logger.error("Unable to restore %s: %s", filename, restore_err)
+            for filename, temp_name, _ in temp_files[len(renamed):]:
+                try:
+                    os.unlink(temp_name)
+                except EnvironmentError:
+                    pass
+            # nothing from this transaction is kept
+            with self._lock:
+                self.originals = originals
+            self.rollback()
+            return False
+        finally:
+            for _, _, temp_fd in temp_files:
+                os.close(temp_fd)
+
+        for filename, backup_name in renamed:
+            if backup_name:
+                try:
+                    os.unlink(backup_name)
+                except EnvironmentError:
+                    pass
+            _record_changed_file(filename)
+        return True
+
+
+_transaction = None
+_thread_state = threading.local()
+
+
+def begin_transaction():
+    """
+    Start staging the files written by atomic_write instead of writing them,
+    until commit_transaction() or rollback_transaction() is called.  Service
+    reconfigs requested before the transaction are forgotten.
+    """
+    global _transaction
+    _clear_reconfig_requests()
+    _transaction = WriteTransaction()
+    return _transaction
+
+
+def commit_transaction():
+    """
+    Write all files staged since begin_transaction()
+
+    Returns:
+    True if every file was written (or no transaction was active), False
+    if nothing was changed because a file could not be written
+    """
+    global _transaction
+    transaction = _transaction
+    _transaction = None
+    if transaction is None:
+        return True
+    return transaction.commit()
+
+
+def rollback_transaction():
+    """
+    Discard all files staged since begin_transaction(), and the service
+    reconfigs requested for them; files written inside unstaged_writes()
+    since then are put back as they were
+    """
+    global _transaction
+    transaction = _transaction
+    _transaction = None
+    _clear_reconfig_requests()
+    if transaction is not None:
+        transaction.rollback()
+
+
+@contextlib.contextmanager
+def unstaged_writes():
+    """
+    Context manager in which atomic_write in the current thread writes files
+    immediately even if a transaction is active, for code that runs commands
+    that read the files it has just written.  The files are still put back
+    as they were if the transaction is rolled back.
+    """
+    _thread_state.unstaged = True
+    try:
+        yield
+    finally:
+        _thread_state.unstaged = False
+
+
 def atomic_write(filename=None, contents=None, encoding="latin-1", errors="strict", mode=None):
     """
-    Atomically write contents to a file
+    Atomically write contents to a file.  If the file already has exactly
+    these contents it is left alone, except for changing its permissions if
+    mode is given.  Files that are changed are added to changed_files().
+    While a transaction is active (see begin_transaction()), the contents are
+    staged and written when the transaction is committed.
 
     Arguments:
     filename - name of the file that needs to be written
@@ -383,6 +814,30 @@ def atomic_write(filename=None, contents=None, encoding="latin-1", errors="stric
         return True
 
     try:
+        if not isinstance(contents, bytes):
+            contents = contents.encode(encoding, errors)
+        transaction = _transaction
+        if transaction is not None:
+            if getattr(_thread_state, 'unstaged', False):
+                # this write already includes any staged changes (read back
+                # through current_contents), so they must not overwrite it
+                transaction.unstage(filename)
+                transaction.save_original(filename)
+            elif not os.path.isdir(os.path.dirname(os.path.abspath(filename))):
+                return False
+            else:
+                transaction.stage(filename, contents, mode)
+                return True
+
+        if _same_contents(filename, contents):
+            if mode is not None and stat.S_IMODE(os.stat(filename).st_mode) != mode:
+                os.chmod(filename, mode)
+                logger.debug("Changed permissions of %s", filename)
+                _record_changed_file(filename)
+            else:
+                logger.debug("%s is unchanged", filename)
+            return True
+
         (config_fd, temp_name) = tempfile.mkstemp(dir=os.path.dirname(filename))
         # Note: config_fd is opened in binary mode
         if mode is None:
@@ -396,8 +851,6 @@ def atomic_write(filename=None, contents=None, encoding="latin-1", errors="stric
                     raise
         try:
             try:
-                if not isinstance(contents, bytes):
-                    contents = contents.encode(encoding, errors)
                 os.write(config_fd, contents)
                 # need to fsync data to make sure data is written on disk before renames
                 # see ext4 documentation for more information
@@ -410,11 +863,118 @@ def atomic_write(filename=None, contents=None, encoding="latin-1", errors="stric
         os.rename(temp_name, filename)
         logger.debug("Wrote %s", filename)
         os.chmod(filename, mode)
+        _record_changed_file(filename)
     except EnvironmentError:
         return False
     return True
 
 
+# Packages that osg-configure checks for; they are all looked up together
+# the first time any package is checked, so a run needs only one rpm query
+KNOWN_RPMS = ['frontier-squid',
+              'gratia-probe-htcondor-ce',
+              'htcondor-ce',
+              'osg-ce',
+              'osg-htcondor-ce',
+              'rsv-consumers-zabbix',
+              'rsv-core']
+
+
+def query_installed_rpms(rpm_names):
+    """
+    Look up which of the given rpms are installed with a single query, using
+    the rpm Python bindings if they are available and "rpm -q" otherwise
+
+    Arguments:
+    rpm_names - a list of rpm names
+
+    Returns:
+    the set of rpm names that are installed
+    """
+    rpm_names = list(rpm_names)
+    try:
+        import rpm
+    except ImportError:
+        rpm = None
+    if rpm is not None:
+        transaction_set = rpm.TransactionSet()
+        return set(name for name in rpm_names if transaction_set.dbMatch('name', name).count() > 0)
+
+    result = commandrunner.run(["rpm", "-q", "--queryformat", "%{NAME}\\n"] + rpm_names, timeout=QUERY_TIMEOUT)
+    if result.error is not None or result.timed_out:
+        logger.debug("Unable to run rpm, assuming no rpms are installed: %s", result.error or "timed out")
+        return set()
+    output = result.stdout
+    # uninstalled packages are reported as "package NAME is not installed"
+    return set(output.split("\n")).intersection(rpm_names)
+
+
+class RpmOracle:
+    """
+    Answers whether rpms are installed, remembering the answers for the life
+    of the process.  The first query looks up every rpm in KNOWN_RPMS at once.
+    """
+
+    def __init__(self, backend=query_installed_rpms):
+        """
+        Arguments:
+        backend - function that takes a list of rpm names and returns the set
+                  of those that are installed; tests can pass a fake one
+        """
+        self.backend = backend
+        self._installed = {}
+
+    def prefetch(self, rpm_names):
+        """Look up any of the given rpms that have not been looked up yet"""
+        missing = [name for name in rpm_names if name not in self._installed]
+        if not missing:
+            return
+        installed = self.backend(missing)
+        for name in missing:
+            self._installed[name] = name in installed
+
+    def installed(self, rpm_name):
+        """Return True if the rpm is installed"""
+        if rpm_name not in self._installed:
+            self.prefetch(KNOWN_RPMS + [rpm_name])
+        return self._installed[rpm_name]
+
+    def clear(self):
+        """Forget all earlier answers"""
+        self._installed = {}
+
+
+_rpm_oracle = RpmOracle()
+
+
+def set_rpm_backend(backend=query_installed_rpms):
+    """
+    Replace the function used to look up installed rpms and forget all earlier
+    answers; used by tests to provide a fake set of installed packages, e.g.
+    set_rpm_backend(lambda names: {'htcondor-ce'}.intersection(names))
+    """
+    global _rpm_oracle
+    global __ce_installed
+    global __gateway_installed
+
+    _rpm_oracle = RpmOracle(backend)
+    __ce_installed = None
+    __gateway_installed = None
+
+
+def clear_rpm_cache():
+    """
+    Forget which rpms are installed, so they are looked up again; for
+    long-running processes, since packages may have been installed or removed
+    """
+    global __ce_installed
+    global __gateway_installed
+
+    _rpm_oracle.clear()
+    __ce_installed = None
+    __gateway_installed = None
+
+
 __ce_installed = None
 __gateway_installed = None
 
@@ -466,15 +1026,12 @@ def rpm_installed(rpm_name):
     True if rpms are installed, False otherwise
     """
     if isinstance(rpm_name, str):
-        return subprocess.call(["rpm", "-q", rpm_name], stdout=subprocess.DEVNULL,
-                               stderr=subprocess.DEVNULL) == 0
+        return _rpm_oracle.installed(rpm_name)
 
     # check with iterable type
-    for name in rpm_name:
-        if subprocess.call(["rpm", "-q", name], stdout=subprocess.DEVNULL,
-                           stderr=subprocess.DEVNULL) != 0:
-            return False
-    return True
+    rpm_names = list(rpm_name)
+    _rpm_oracle.prefetch(rpm_names)
+    return all(_rpm_oracle.installed(name) for name in rpm_names)
 
 
 def get_test_config(config_file=''):
@@ -561,10 +1118,37 @@ def config_safe_getboolean(configuration: ConfigParser, section: str, option: st
         return default
 
 
-# Import classad here because it might not be available for e.g. SEs
+# How classad.quote() writes each byte of the UTF-8 encoding of a string:
+# C-style escapes for these characters, octal escapes for other bytes that
+# aren't printable ASCII, and everything else as is
+_CLASSAD_ESCAPES = {'\a': '\\a', '\b': '\\b', '\f': '\\f', '\n': '\\n', '\r': '\\r', '\t': '\\t',
+                    '\v': '\\v', '\\': '\\\\', '"': '\\"'}
+_CLASSAD_QUOTE_TABLE = [_CLASSAD_ESCAPES.get(chr(byte), chr(byte) if 0x20 <= byte < 0x7f else '\\%03o' % byte)
+                        for byte in range(256)]
+_CLASSAD_QUOTE_ASCII = str.maketrans(dict((byte, escape) for byte, escape in enumerate(_CLASSAD_QUOTE_TABLE[:128])
+                                          if escape != chr(byte)))
+
+
+@functools.lru_cache(maxsize=4096)
+def _classad_quote(value):
+    if '\0' in value:
+        # the bindings can't make a string containing NUL either
+        raise ValueError("embedded null character")
+    try:
+        # str.isascii() would be quicker but needs Python 3.7
+        value.encode('ascii')
+    except UnicodeEncodeError:
+        return '"' + ''.join(_CLASSAD_QUOTE_TABLE[byte] for byte in value.encode('utf-8')) + '"'
+    return '"' + value.translate(_CLASSAD_QUOTE_ASCII) + '"'
+
+
 def classad_quote(input_value):
-    import classad
-    return classad.quote(str(input_value))
+    """
+    Return str(input_value) as a quoted ClassAd string literal, exactly as
+    classad.quote() does, without needing the HTCondor bindings (which might
+    not be available, e.g. on SEs)
+    """
+    return _classad_quote(str(input_value))
 
 
 def add_or_replace_setting(old_buf, variable, new_value, quote_value=True):
@@ -627,18 +1211,109 @@ def split_host_port(host_port):
 
 def reconfig_service(service, reconfig_cmd):
     """If condor is running, run condor_reconfig to make it reload its configuration"""
-    if os.system('/sbin/service %s status >/dev/null 2>&1' % service) != 0:
+    if commandrunner.run(['/sbin/service', service, 'status'], timeout=QUERY_TIMEOUT).returncode != 0:
         logger.info("%s is not running -- skipping reconfigure" % service)
         return True
 
     logger.info("Reconfiguring %s using %s" % (service, reconfig_cmd))
-    if os.system(reconfig_cmd + ' >/dev/null') == 0:
+    if commandrunner.run(reconfig_cmd, timeout=QUERY_TIMEOUT).returncode == 0:
         logger.info("Reconfigure successful")
         return True
 
     return False
 
 
+# The HTCondor and HTCondor-CE config directories; also used as the
+# shared_resources() of the modules that write into them or read the config
+# with condor_config_val/condor_ce_config_val while configuring
+HTCONDOR_CONFIG_PATH = '/etc/condor/'
+HTCONDOR_CE_CONFIG_PATH = '/etc/condor-ce/'
+
+# Services that osg-configure can ask to reload their configuration, in the
+# order they are reconfigured, with the config directories (ending in "/")
+# whose contents they always read; files written elsewhere are passed to
+# request_reconfig().  A service only needs reconfiguring if one of those
+# has changed
+RECONFIG_SERVICE_PATHS = [
+    ('condor', [HTCONDOR_CONFIG_PATH]),
+    ('condor-ce', [HTCONDOR_CE_CONFIG_PATH]),
+]
+
+# service -> reconfig command, for the services to reconfigure at the end of the run
+_reconfig_requests = {}
+# service -> files outside RECONFIG_SERVICE_PATHS that the service reads
+_reconfig_paths = {}
+_reconfig_requests_lock = threading.Lock()
+
+
+def request_reconfig(service, reconfig_cmd, paths=()):
+    """
+    Ask for service to be reconfigured with reconfig_cmd by
+    run_requested_reconfigs() at the end of the run; asking more than once
+    only reconfigures it once
+
+    Arguments:
+    service -- name of the service
+    reconfig_cmd -- command that makes the service reload its configuration
+    paths -- files the service reads besides those in RECONFIG_SERVICE_PATHS,
+             e.g. the output_files() of the module that wrote them
+    """
+    with _reconfig_requests_lock:
+        _reconfig_requests.setdefault(service, reconfig_cmd)
+        _reconfig_paths.setdefault(service, set()).update(os.path.abspath(x) for x in paths)
+
+
+def _clear_reconfig_requests():
+    """Forget all the reconfigs passed to request_reconfig()"""
+    with _reconfig_requests_lock:
+        _reconfig_requests.clear()
+        _reconfig_paths.clear()
+
+
+def _service_config_changed(service, extra_paths=()):
+    """Return True if atomic_write has changed any file service reads during this run"""
+    for name, paths in RECONFIG_SERVICE_PATHS:
+        if name == service:
+            break
+    else:
+        # don't know what the service reads, so assume it has changed
+        return True
+    paths = list(paths) + list(extra_paths)
+    for filename in changed_files():
+        for path in paths:
+            if filename == path or (path.endswith('/') and filename.startswith(path)):
+                return True
+    return False
+
+
+def run_requested_reconfigs(force=False):
+    """
+    Reconfigure each service passed to request_reconfig() if any of the files
+    it reads changed during this run (or if force is True), in the order of
+    RECONFIG_SERVICE_PATHS, then forget the requests
+
+    Returns:
+    True if every reconfig that was run succeeded, False otherwise
+    """
+    with _reconfig_requests_lock:
+        requests = dict(_reconfig_requests)
+        extra_paths = dict(_reconfig_paths)
+        _reconfig_requests.clear()
+        _reconfig_paths.clear()
+    order = [name for name, _ in RECONFIG_SERVICE_PATHS]
+    services = sorted(requests, key=lambda x: (order.index(x) if x in order else len(order)))
+
+    status = True
+    for service in services:
+        if not force and not _service_config_changed(service, extra_paths.get(service, ())):
+            logger.info("Configuration for %s has not changed -- skipping reconfigure" % service)
+            continue
+        if not reconfig_service(service, requests[service]):
+            logger.warning("Error reloading %s config" % service)
+            status = False
+    return status
+
+
 def split_comma_separated_list(a_str: str) -> List[str]:
     a_str = a_str.strip()
     if not a_str:
@@ -6,8 +6,9 @@ import socket
 import os
 import pwd
 import sys
-from io import StringIO
-from configparser import ConfigParser, ParsingError
+from configparser import Error, ParsingError, RawConfigParser
+
+from osg_configure.modules import resolver
 
 __all__ = ['valid_domain',
            'valid_email',
@@ -20,13 +21,37 @@ __all__ = ['valid_domain',
            'valid_boolean',
            'valid_executable',
            'valid_ini_file',
+           'parse_ini_file',
+           'parse_ini_string',
            'valid_integer',
            'valid_ipv4_address',
            'valid_ipv6_address',
+           'set_host_checks',
+           'prefetch_domains',
            ]
 
 log = logging.getLogger(__name__)
 
+# Used as the default section name when parsing single ini files so that
+# a [DEFAULT] section is kept as a regular section
+NO_DEFAULT_SECTION = "\0"
+
+# Object answering the checks below that look at the local host (whether
+# paths and users exist and whether hosts resolve), for validating the
+# configuration of a different host; None to look at the local host
+_host_checks = None
+
+
+def set_host_checks(host_checks=None):
+    """
+    Have the checks that look at the local host ask host_checks instead:
+    host_checks.path_exists(path, kind) with kind 'file', 'directory' or
+    None for either, host_checks.user_exists(username) and
+    host_checks.resolves(host).  Pass None to look at the local host again.
+    """
+    global _host_checks
+    _host_checks = host_checks
+
 
 def valid_ipv4_address(addr):
     """Return True if the address is a valid IPv4 address, False otherwise.
@@ -68,15 +93,28 @@ def valid_domain(host, resolve=False):
         return False
     if not resolve:
         return True
-    try:
-        ip = socket.gethostbyname(host)
-        log.debug("%s resolves to %s", host, ip)
-    except (socket.herror, socket.gaierror):
+    if _host_checks is not None:
+        return _host_checks.resolves(host)
+    ip = resolver.resolve(host)
+    if ip is None:
         log.debug("%s does not resolve", host)
         return False
+    log.debug("%s resolves to %s", host, ip)
     return True
 
 
+def prefetch_domains(hosts):
+    """
+    Start resolving the valid hostnames in hosts in the background, so a
+    later valid_domain(host, resolve=True) does not have to wait for them
+    """
+    if _host_checks is not None:
+        return
+    resolver.prefetch([host for host in hosts
+                       if host and not valid_ipv4_address(host) and not valid_ipv6_address(host) and
+                       valid_hostname(host)])
+
+
 def valid_hostname(hostname):
     """Return if a hostname is valid according to the standard"""
     # from https://stackoverflow.com/a/2532344
@@ -108,6 +146,8 @@ def valid_email(address):
 
 def valid_location(location):
     """Returns True if location points to an existing directory or file"""
+    if location and _host_checks is not None:
+        return _host_checks.path_exists(location, None)
     if location and os.path.exists(location):
         return os.path.isdir(location) or os.path.isfile(location)
 
@@ -116,6 +156,8 @@ def valid_location(location):
 
 def valid_file(location):
     """Returns True if location points to an existing file"""
+    if location and _host_checks is not None:
+        return _host_checks.path_exists(location, 'file')
     if location and os.path.exists(location):
         return os.path.isfile(location)
 
@@ -124,6 +166,8 @@ def valid_file(location):
 
 def valid_directory(location):
     """Returns True if location points to an existing file"""
+    if location and _host_checks is not None:
+        return _host_checks.path_exists(location, 'directory')
     if location and os.path.exists(location):
         return os.path.isdir(location)
 
@@ -134,6 +178,8 @@ def valid_user(username):
     """
     Returns True if the username given is a valid username on the system
     """
+    if username and _host_checks is not None:
+        return _host_checks.user_exists(username)
     try:
         if username and pwd.getpwnam(username):
             return True
@@ -257,37 +303,63 @@ def valid_ini_file(filename):
     if filename == "" or filename is None:
         return False
 
-    config_file = os.path.abspath(filename)
-    configuration = ConfigParser()
-    file_buffer = StringIO()
-    temp = open(config_file, "r", encoding="latin-1").read()
-    temp = temp.replace('%(', '-')
-    file_buffer.write(temp)
-    file_buffer.seek(0)
+    return parse_ini_file(os.path.abspath(filename)) is not None
+
+
+def parse_ini_file(filename):
+    """
+    Parse a single ini file and check that it conforms to our requirements
+    (see valid_ini_file).  The file is read and parsed exactly once.
+
+    returns a RawConfigParser (see parse_ini_string), or None if the file is
+    not valid
+    """
+    with open(filename, "r", encoding="latin-1") as file_handle:
+        contents = file_handle.read()
+    return parse_ini_string(contents, filename)
+
+
+def parse_ini_string(contents, filename):
+    """
+    Parse the contents of an ini file and check that it conforms to our
+    requirements (see valid_ini_file).
+
+    The returned parser preserves the case of option names, does no
+    interpolation, and treats a [DEFAULT] section like any other section,
+    so it holds exactly the raw values written in this file.
+
+    returns a RawConfigParser, or None if the contents are not valid
+    """
+    configuration = RawConfigParser(default_section=NO_DEFAULT_SECTION)
+    configuration.optionxform = str
     try:
-        configuration.readfp(file_buffer)  # TODO readfp is deprecated
+        configuration.read_string(contents, filename)
     except ParsingError as e:
         print("Error while parsing: %s\n%s" % (filename, e), file=sys.stderr)
         print("Lines with options should not start with a space", file=sys.stderr)
-        return False
-
-    sections = configuration.sections()
-    for section in sections:
-        for option in configuration.options(section):
-            try:
-                value = configuration.get(section, option)
-                if "\n" in value:
-                    # pylint: disable-msg=E1103
-                    error_line = value.split('\n')[1]
-                    print("INI syntax error in section %s: " % section, file=sys.stderr)
-                    print("The following line starts with a space: %s" % error_line, file=sys.stderr)
-                    print("Please removing the leading space", file=sys.stderr)
-                    return False
-            except ValueError:
-                print("syntax error in section %s with option %s" % (section, option), file=sys.stderr)
-                return False
-
-    return True
+        return None
+    except Error as e:
+        print("Error while parsing: %s\n%s" % (filename, e), file=sys.stderr)
+        return None
+
+    for section in configuration.sections():
+        seen_options = set()
+        for option, value in configuration.items(section):
+            # option names are case-insensitive everywhere but Local Settings
+            if option.lower() in seen_options:
+                print("INI syntax error in section %s: " % section, file=sys.stderr)
+                print("Option %s is given more than once" % option, file=sys.stderr)
+                return None
+            seen_options.add(option.lower())
+            if "\n" in value:
+                # pylint: disable-msg=E1103
+                error_line = value.split('\n')[1]
+                print("INI syntax error in section %s: " % section, file=sys.stderr)
+                print("The following line starts with a space: %s" % error_line, file=sys.stderr)
+                print("Please removing the leading space", file=sys.stderr)
+                return None
+
+    return configuration
 
 
 # Quick function to check if configuration value is an integer
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmark building and formatting a ResourceCatalog against the previous
+dict-per-entry, string-concatenating implementation
+
+Needs the HTCondor Python bindings (classad).  Run from the tests directory:
+    python3 bench_resourcecatalog.py [--sizes N,N,...] [--repeat N]
+"""
+
+import optparse
+import os
+import sys
+import time
+import tracemalloc
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules.resourcecatalog import ResourceCatalog, RCEntry
+
+
+_DEFAULTS = dict((field, getattr(RCEntry(), field)) for field in RCEntry.__slots__)
+
+
+class OldRCEntry(object):
+    """RCEntry as it was, with a __dict__"""
+
+    def __init__(self, **kwargs):
+        for field, default in _DEFAULTS.items():
+            setattr(self, field, kwargs.get(field, default))
+
+    get_requirements = RCEntry.get_requirements
+    get_transform = RCEntry.get_transform
+    as_attributes = RCEntry.as_attributes
+
+
+class OldResourceCatalog(object):
+    """The previous implementation: a dict of attributes per entry, formatted with +="""
+
+    def __init__(self):
+        self.entries = {}
+
+    def add_rcentry(self, rcentry):
+        self.entries[rcentry.name] = rcentry.as_attributes()
+        return self
+
+    def format_value(self):
+        if not self.entries:
+            catalog = '{}'
+        else:
+            entry_texts = []
+            for entrykey in sorted(self.entries):
+                entry = self.entries[entrykey]
+                entry_text = '  [ \\\n'
+                for attribkey in sorted(entry):
+                    entry_text += '    %s = %s; \\\n' % (attribkey, entry[attribkey])
+                entry_text += '  ]'
+                entry_texts.append(entry_text)
+            catalog = ('{ \\\n'
+                       + ', \\\n'.join(entry_texts)
+                       + ' \\\n}')
+        return catalog
+
+
+def make_entries(count):
+    """Make keyword arguments for count RCEntries like the ones a large site has"""
+    entries = []
+    for index in range(count):
+        kwargs = dict(name="entry%05d.example.org" % index,
+                      cpus=1 + index % 64,
+                      memory=2000 * (1 + index % 16),
+                      allowed_vos=["osg", "atlas", "cms"][:1 + index % 3],
+                      max_wall_time=1440,
+                      queue="queue%d" % (index % 10))
+        if index % 5 == 0:
+            kwargs.update(is_pilot=True, max_pilots=1000, whole_node=False, require_singularity=True,
+                          send_tests=True)
+        elif index % 5 == 1:
+            kwargs.update(vo_tag="ANALYSIS", extra_transforms="set_WantRHEL7 = 1")
+        entries.append(kwargs)
+    return entries
+
+
+def measure(catalog_class, entry_class, entries):
+    """Return (seconds, peak bytes, text) for building and formatting one catalog"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = catalog_class()
+    for kwargs in entries:
+        catalog.add_rcentry(entry_class(**kwargs))
+    text = catalog.format_value()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, text
+
+
+def best(catalog_class, entry_class, entries, repeat):
+    results = [measure(catalog_class, entry_class, entries) for _ in range(repeat)]
+    return min(x[0] for x in results), min(x[1] for x in results), results[0][2]
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('--sizes', default='1000,2500,5000,10000',
+                      help='comma-separated numbers of entries (default 1000,2500,5000,10000)')
+    parser.add_option('--repeat', type='int', default=3, help='number of timing runs (default 3)')
+    options, _ = parser.parse_args()
+
+    sys.stdout.write("%8s  %12s %12s  %12s %12s  %14s\n" %
+                     ("entries", "old s", "new s", "old peak MB", "new peak MB", "new us/entry"))
+    for size in [int(x) for x in options.sizes.split(',')]:
+        entries = make_entries(size)
+        old_time, old_peak, old_text = best(OldResourceCatalog, OldRCEntry, entries, options.repeat)
+        new_time, new_peak, new_text = best(ResourceCatalog, RCEntry, entries, options.repeat)
+        if old_text != new_text:
+            sys.stderr.write("Output differs with %d entries!\n" % size)
+            return 1
+        sys.stdout.write("%8d  %12.3f %12.3f  %12.2f %12.2f  %14.1f\n" %
+                         (size, old_time, new_time, old_peak / 1e6, new_peak / 1e6, new_time / size * 1e6))
+
+    catalog = ResourceCatalog()
+    for kwargs in entries:
+        catalog.add_rcentry(RCEntry(**kwargs))
+    sizes = catalog.size_report()
+    sys.stdout.write("\n%d entries: %d bytes of config, %d bytes advertised\n" %
+                     (len(catalog.entries), sizes['config'], sizes['advertised']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark reversevomap.filter_out_bans against trying fnmatch with each ban
+
+Run from the tests directory:
+    python3 bench_reversevomap.py [--mappings N] [--bans N] [--repeat N]
+"""
+
+import fnmatch
+import optparse
+import os
+import random
+import sys
+import time
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import reversevomap
+
+
+def filter_out_bans_pairwise(mappings, bans):
+    """The previous implementation: one fnmatch per (mapping, ban) pair"""
+    new_mappings = []
+    for mapping in mappings:
+        for ban in bans:
+            if fnmatch.fnmatch(mapping.pattern, ban):
+                break
+        else:
+            new_mappings.append(mapping)
+    return new_mappings
+
+
+def make_inputs(num_mappings, num_bans, seed=0):
+    """Make mappings and bans that look like the ones in the default VOMS mapfile"""
+    rand = random.Random(seed)
+    vos = ["vo%d" % x for x in range(500)]
+    roles = ["NULL", "pilot", "production", "lcgadmin", "t1access"]
+    mappings = []
+    for index in range(num_mappings):
+        vo = rand.choice(vos)
+        pattern = "/%s/group%d/Role=%s/Capability=NULL" % (vo, index % 50, rand.choice(roles))
+        mappings.append(reversevomap.Mapping(pattern, "user%d" % (index % 200)))
+    bans = []
+    for index in range(num_bans):
+        vo = rand.choice(vos)
+        kind = index % 4
+        if kind == 0:
+            bans.append("/%s/*" % vo)
+        elif kind == 1:
+            bans.append("/%s/group%d/*" % (vo, rand.randrange(50)))
+        elif kind == 2:
+            bans.append("/%s/*/Role=%s/*" % (vo, rand.choice(roles)))
+        else:
+            bans.append("/%s/group?/Role=NULL/Capability=NULL" % vo)
+    return mappings, bans
+
+
+def best_time(function, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('--mappings', type='int', default=10000, help='number of mappings (default 10000)')
+    parser.add_option('--bans', type='int', default=1000, help='number of ban patterns (default 1000)')
+    parser.add_option('--repeat', type='int', default=3, help='number of timing runs (default 3)')
+    options, _ = parser.parse_args()
+
+    mappings, bans = make_inputs(options.mappings, options.bans)
+    old_time, old_result = best_time(lambda: filter_out_bans_pairwise(mappings, bans), options.repeat)
+    new_time, new_result = best_time(lambda: reversevomap.filter_out_bans(mappings, bans), options.repeat)
+    if old_result != new_result:
+        sys.stderr.write("Results differ!\n")
+        return 1
+
+    sys.stdout.write("%d mappings x %d bans, %d kept\n" % (len(mappings), len(bans), len(new_result)))
+    sys.stdout.write("pairwise fnmatch:  %8.3f s\n" % old_time)
+    sys.stdout.write("compiled matcher:  %8.3f s\n" % new_time)
+    sys.stdout.write("speedup:           %8.1fx\n" % (old_time / new_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Unit tests to test the osg_configure.api module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure import api
+from osg_configure.modules import moduleregistry
+from osg_configure.modules import utilities
+
+
+class FailingModule:
+    """Stand-in for a configuration module whose settings don't check out"""
+
+    config_section = 'Failing'
+    options = {}
+
+    def parse_configuration(self, configuration):
+        pass
+
+    def get_attributes(self):
+        return {'FAILING': 'yes'}
+
+    def check_attributes(self, attributes):
+        return False
+
+    def module_name(self):
+        return 'Failing'
+
+    def input_sections(self, configuration):
+        return [self.config_section]
+
+
+class TestApi(unittest.TestCase):
+    """
+    Unit test class to test the osg_configure.api module
+    """
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.config_dir, '01-squid.ini'), 'w') as file_handle:
+            file_handle.write("[Squid]\nenabled = True\nlocation = test.com:3128\n")
+        utilities.set_rpm_backend(lambda rpm_names: set())
+
+    def tearDown(self):
+        utilities.set_rpm_backend()
+        shutil.rmtree(self.config_dir)
+        shutil.rmtree(self.output_dir)
+
+    def squid_module(self):
+        return moduleregistry.load_module(moduleregistry.find_module('Squid'))
+
+    def test_verify(self):
+        """
+        Test that verify() returns a true result with the module attributes
+        """
+        result = api.verify(self.config_dir, module_objects=[self.squid_module()])
+        self.assertTrue(result, result.error)
+        self.assertEqual(result.checked_modules, ['Squid'])
+        self.assertEqual(result.attributes['OSG_SQUID_LOCATION'], 'test.com:3128')
+
+    def test_verify_failure(self):
+        """
+        Test that verify() returns a false result rather than exiting on
+        invalid settings or a missing config directory
+        """
+        result = api.verify(self.config_dir, module_objects=[self.squid_module(), FailingModule()])
+        self.assertFalse(result)
+        self.assertEqual(result.error, "Invalid attributes found")
+
+        result = api.verify(os.path.join(self.config_dir, 'missing'))
+        self.assertFalse(result)
+        self.assertTrue(result.error.startswith("Can't read configuration files"), result.error)
+
+    def test_configure(self):
+        """
+        Test that configure() only configures the modules asked for, and
+        skips modules whose settings are unchanged on the next run
+        """
+        state_file = os.path.join(self.output_dir, 'state.json')
+        result = api.configure(self.config_dir, self.output_dir, modules=['squid'], state_file=state_file,
+                               module_objects=[self.squid_module(), FailingModule()], force=True)
+        self.assertTrue(result, result.error)
+        self.assertTrue(result.invalid_attributes)
+        self.assertEqual(result.configured_modules, ['Squid'])
+        self.assertEqual(result.skipped_modules, ['Failing'])
+
+        result = api.configure(self.config_dir, self.output_dir, state_file=state_file,
+                               module_objects=[self.squid_module()])
+        self.assertTrue(result, result.error)
+        self.assertEqual(result.configured_modules, [])
+        self.assertEqual(result.skipped_modules, ['Squid'])
+
+        result = api.configure(self.config_dir, self.output_dir, modules=['Nonexistent'], state_file=state_file,
+                               module_objects=[self.squid_module()])
+        self.assertFalse(result)
+        self.assertEqual(result.error, "Nonexistent specified but that module is not present")
+
+        result = api.configure(self.config_dir, self.output_dir, state_file=state_file,
+                               module_objects=[self.squid_module(), FailingModule()])
+        self.assertFalse(result)
+        self.assertEqual(result.error, "Invalid attributes found")
+
+    def test_query(self):
+        """
+        Test that query() returns the matching options and the patterns not found
+        """
+        result = api.query(['Squid.location', 'Squid.missing'], self.config_dir)
+        self.assertTrue(result)
+        self.assertEqual([(x.section, x.option, x.value) for x in result.results],
+                         [('Squid', 'location', 'test.com:3128')])
+        self.assertEqual(result.not_found, ['Squid.missing'])
+
+    def test_enabled_services(self):
+        """
+        Test that enabled_services() collects the services of every module
+        """
+        result = api.enabled_services(self.config_dir, module_objects=[self.squid_module()])
+        self.assertTrue(result, result.error)
+        self.assertEqual(result.services, set())
+
+        result = api.enabled_services(os.path.join(self.config_dir, 'missing'),
+                                      module_objects=[self.squid_module()])
+        self.assertFalse(result)
+        self.assertTrue(result.error.startswith("Can't read configuration files"), result.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Unit tests to test the commandrunner module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import pwd
+import sys
+import time
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import commandrunner
+from osg_configure.modules import profiling
+from osg_configure.modules import utilities
+
+
+class TestCommandRunner(unittest.TestCase):
+    """
+    Unit test class to test the commandrunner module
+    """
+
+    def test_run(self):
+        """
+        Test that output is captured and exit codes are normalized
+        """
+        runner = commandrunner.CommandRunner()
+        result = runner.run(['sh', '-c', 'echo out; echo err >&2; exit 3'])
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (3, "out\n", "err\n"))
+        self.assertEqual(result.argv, ['sh', '-c', 'echo out; echo err >&2; exit 3'])
+        self.assertFalse(result.timed_out)
+
+        result = runner.run('sh -c "echo out; echo err >&2"', merge_stderr=True)
+        self.assertEqual(result.stdout, "out\nerr\n")
+
+        self.assertEqual(runner.run(['cat'], input="abc").stdout, "abc")
+        self.assertEqual(runner.run(['sh', '-c', 'kill -9 $$']).returncode, 128 + 9)
+
+        result = runner.run(['/nonexistent/command'])
+        self.assertEqual(result.returncode, commandrunner.EXIT_NOT_FOUND)
+        self.assertTrue(result.error)
+        self.assertEqual(len(runner.records), 5)
+
+    def test_records_bounded(self):
+        """
+        Test that only the last commands are kept in records, without their output
+        """
+        runner = commandrunner.CommandRunner(max_records=3)
+        results = [runner.run(['echo', str(x)]) for x in range(5)]
+        self.assertEqual([x.stdout for x in results], ["%d\n" % x for x in range(5)])
+        self.assertEqual([x.argv[1] for x in runner.records], ['2', '3', '4'])
+        self.assertEqual(set((x.stdout, x.stderr) for x in runner.records), set([('', '')]))
+
+    def test_timeout(self):
+        """
+        Test that a command running past its deadline is killed
+        """
+        runner = commandrunner.CommandRunner()
+        start = time.monotonic()
+        result = runner.run(['sleep', '10'], timeout=0.2)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.returncode, commandrunner.EXIT_TIMEOUT)
+
+    def test_timeout_kills_session(self):
+        """
+        Test that the commands started by a command running past its deadline
+        are killed along with it
+        """
+        runner = commandrunner.CommandRunner()
+        start = time.monotonic()
+        result = runner.run(['sh', '-c', 'sleep 30 & echo $!; wait'], timeout=0.5)
+        self.assertLess(time.monotonic() - start, commandrunner.KILL_GRACE)
+        self.assertTrue(result.timed_out)
+        pid = int(result.stdout)
+        for _ in range(50):
+            try:
+                with open('/proc/%d/stat' % pid) as stat_file:
+                    if stat_file.read().split()[2] == 'Z':
+                        break
+            except FileNotFoundError:
+                break
+            time.sleep(0.1)
+        else:
+            self.fail("sleep %d is still running" % pid)
+
+    def test_concurrency_limit(self):
+        """
+        Test that run_many() runs commands at once, up to the limit
+        """
+        runner = commandrunner.CommandRunner(max_concurrent=2)
+        start = time.monotonic()
+        results = runner.run_many([['sleep', '0.3']] * 4)
+        elapsed = time.monotonic() - start
+        self.assertEqual([x.returncode for x in results], [0] * 4)
+        self.assertGreaterEqual(elapsed, 0.6)
+        self.assertLess(elapsed, 1.2)
+
+    def test_run_script(self):
+        """
+        Test that run_script goes through the runner and respects its timeout
+        """
+        self.assertTrue(utilities.run_script(['true']))
+        self.assertFalse(utilities.run_script(['false']))
+        self.assertFalse(utilities.run_script(['/nonexistent/command']))
+        self.assertFalse(utilities.run_script(['sleep', '10'], timeout=0.2))
+
+    @unittest.skipIf(os.getuid() != 0, "must be root to run commands as another user")
+    def test_run_as_user(self):
+        """
+        Test that a preexec_fn is run in the command started by run(), so
+        commands can be run as another user
+        """
+        try:
+            user = pwd.getpwnam('nobody')
+        except KeyError:
+            self.skipTest("no nobody user")
+
+        groups = os.getgrouplist(user.pw_name, user.pw_gid)
+
+        def demote():
+            os.setgroups(groups)
+            os.setgid(user.pw_gid)
+            os.setuid(user.pw_uid)
+
+        result = commandrunner.run(['id', '-u'], preexec_fn=demote)
+        self.assertEqual((result.returncode, result.stdout.strip()), (0, str(user.pw_uid)))
+        result = commandrunner.run(['id', '-G'], preexec_fn=demote)
+        self.assertNotIn('0', result.stdout.split())
+
+    def test_profiled(self):
+        """
+        Test that commands are recorded in the phase they were run in
+        """
+        profiler = profiling.start()
+        try:
+            with profiling.phase("commands"):
+                commandrunner.run(['true'])
+        finally:
+            profiling.stop()
+        calls = [x for x in profiler.calls if x['argv'] == ['true']]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['phase'], "commands")
+        self.assertEqual(calls[0]['status'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
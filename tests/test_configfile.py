@@ -3,8 +3,13 @@
 # pylint: disable=W0703
 # pylint: disable=R0904
 
+import contextlib
+import io
+import logging
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 import configparser
 
@@ -14,6 +19,7 @@ sys.path.insert(0, pathname)
 
 from osg_configure.modules import exceptions
 from osg_configure.modules import configfile
+from osg_configure.modules.baseconfiguration import BaseConfiguration
 from osg_configure.modules.utilities import get_test_config
 
 
@@ -149,6 +155,161 @@ class TestConfigFile(unittest.TestCase):
                          "Didn't get the correct location for missing_opt:" +
                          "got %s expected None" % (opt_location))
 
+    def test_option_index(self):
+        """
+        Test the option provenance index kept by ConfigSnapshot
+        """
+        config_directory = get_test_config('config-test1.d')
+        snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        first_file = get_test_config('config-test1.d/00-test.ini')
+        second_file = get_test_config('config-test1.d/10-test.ini')
+
+        self.assertEqual(configfile.OptionLocation(first_file, 2, 'foo'),
+                         snapshot.option_index.location('Common', 'first_opt'))
+        self.assertEqual([configfile.OptionLocation(first_file, 3, 'baz'),
+                          configfile.OptionLocation(second_file, 2, 'bar')],
+                         snapshot.option_index.history('Common', 'Second_Opt'))
+        self.assertIsNone(snapshot.option_index.location('Common', 'missing_opt'))
+        self.assertIsNone(snapshot.option_index.location('Missing', 'first_opt'))
+        self.assertEqual(second_file, snapshot.get_option_location('second_opt', 'Common'))
+        # get_option_location() is answered from the snapshot it is given
+        self.assertEqual(second_file,
+                         configfile.get_option_location('second_opt', 'Common', snapshot=snapshot))
+        self.assertEqual(second_file,
+                         configfile.get_option_location('second_opt', 'Common',
+                                                        config_directory=config_directory))
+
+        config_directory = get_test_config('config-case.d')
+        snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        self.assertEqual(configfile.OptionLocation(get_test_config('config-case.d/00-test.ini'), 2, 'default'),
+                         snapshot.option_index.location('Common', 'default_opt'))
+
+    def test_invalid_file(self):
+        """
+        Test that an invalid config file raises ConfigFileError instead of
+        exiting
+        """
+        config_directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(config_directory, '10-bad.ini'), 'w') as file_handle:
+                file_handle.write("option = without a section\n")
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertRaises(exceptions.ConfigFileError, configfile.ConfigSnapshot,
+                                  config_directory=config_directory)
+        finally:
+            shutil.rmtree(config_directory)
+
+    def test_log_option_location(self):
+        """
+        Test that modules name the file in their own snapshot that sets an
+        option, not one in the default config directory
+        """
+        config_directory = get_test_config('config-test1.d')
+        module = BaseConfiguration()
+        module.config_snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        with self.assertLogs(module.logger, level=logging.WARNING) as logs:
+            module.log("bad value", option='second_opt', section='Common', level=logging.WARNING)
+        self.assertIn(get_test_config('config-test1.d/10-test.ini'), logs.output[0])
+
+    def test_query(self):
+        """
+        Test looking up several options and patterns at once
+        """
+        config_directory = get_test_config('config-case.d')
+        snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        first_file = get_test_config('config-case.d/00-test.ini')
+        second_file = get_test_config('config-case.d/10-test.ini')
+
+        results = snapshot.query(['Common.Mixed_Case', 'default_opt', 'Local*.*var', 'Missing.opt'])
+        self.assertEqual([('Common.Mixed_Case', 'Common', 'mixed_case', 'two', second_file, 5),
+                          ('default_opt', 'Local Settings', 'default_opt', 'default', first_file, 2),
+                          ('default_opt', 'Common', 'default_opt', 'default', first_file, 2),
+                          ('Local*.*var', 'Local Settings', 'myvar', 'second', second_file, 2),
+                          ('Local*.*var', 'Local Settings', 'othervar', '50%', first_file, 6)],
+                         [tuple(result) for result in results])
+
+    def test_config_cache(self):
+        """
+        Test that the config cache is used only when no config file has changed
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            config_directory = os.path.join(temp_dir, 'config.d')
+            shutil.copytree(get_test_config('config-case.d'), config_directory)
+            cache_file = os.path.join(temp_dir, 'cache.json')
+
+            snapshot = configfile.ConfigSnapshot(config_directory=config_directory, cache_file=cache_file)
+            self.assertFalse(snapshot.from_cache)
+            self.assertTrue(os.path.exists(cache_file))
+
+            cached = configfile.ConfigSnapshot(config_directory=config_directory, cache_file=cache_file)
+            self.assertTrue(cached.from_cache)
+            for case_sensitive in [False, True]:
+                expected = snapshot.get_config(case_sensitive)
+                config = cached.get_config(case_sensitive)
+                self.assertEqual(expected.sections(), config.sections())
+                for section in expected.sections():
+                    self.assertEqual(expected.items(section, raw=True), config.items(section, raw=True))
+            self.assertEqual(snapshot.option_index.history('Local Settings', 'myvar'),
+                             cached.option_index.history('Local Settings', 'myvar'))
+
+            # a changed file invalidates the cache
+            with open(os.path.join(config_directory, '10-test.ini'), 'a') as file_handle:
+                file_handle.write("new_opt = 1\n")
+            snapshot = configfile.ConfigSnapshot(config_directory=config_directory, cache_file=cache_file)
+            self.assertFalse(snapshot.from_cache)
+            self.assertEqual('1', snapshot.config.get('Common', 'new_opt'))
+
+            # so does a new file
+            with open(os.path.join(config_directory, '20-test.ini'), 'w') as file_handle:
+                file_handle.write("[Other]\nopt = 2\n")
+            snapshot = configfile.ConfigSnapshot(config_directory=config_directory, cache_file=cache_file)
+            self.assertFalse(snapshot.from_cache)
+            self.assertEqual('2', snapshot.config.get('Other', 'opt'))
+            self.assertTrue(configfile.ConfigSnapshot(config_directory=config_directory,
+                                                      cache_file=cache_file).from_cache)
+
+            # a corrupt cache falls back to parsing the files
+            with open(cache_file, 'w') as file_handle:
+                file_handle.write('{"version": ')
+            snapshot = configfile.ConfigSnapshot(config_directory=config_directory, cache_file=cache_file)
+            self.assertFalse(snapshot.from_cache)
+            self.assertEqual('2', snapshot.config.get('Other', 'opt'))
+            self.assertTrue(configfile.ConfigSnapshot(config_directory=config_directory,
+                                                      cache_file=cache_file).from_cache)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_config_cache_directories(self):
+        """
+        Test that the config cache holds several directories, and keeps
+        unvalidated contents apart from validated ones
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(temp_dir, 'cache.json')
+            first = os.path.join(temp_dir, 'first.d')
+            second = os.path.join(temp_dir, 'second.d')
+            shutil.copytree(get_test_config('config-case.d'), first)
+            os.mkdir(second)
+            # continuation lines are rejected by validation but not by ConfigParser
+            with open(os.path.join(second, '10-test.ini'), 'w') as file_handle:
+                file_handle.write("[Site Information]\nresource = CE\nsponsor = osg\n  cms\n")
+
+            self.assertFalse(configfile.ConfigSnapshot(config_directory=first, cache_file=cache_file).from_cache)
+            unvalidated = configfile.ConfigSnapshot(config_directory=second, cache_file=cache_file, validate=False)
+            self.assertFalse(unvalidated.from_cache)
+            self.assertEqual('osg\ncms', unvalidated.config.get('Site Information', 'sponsor'))
+
+            self.assertTrue(configfile.ConfigSnapshot(config_directory=first, cache_file=cache_file).from_cache)
+            cached = configfile.ConfigSnapshot(config_directory=second, cache_file=cache_file, validate=False)
+            self.assertTrue(cached.from_cache)
+            self.assertEqual('osg\ncms', cached.config.get('Site Information', 'sponsor'))
+            self.assertRaises(exceptions.ConfigFileError, configfile.ConfigSnapshot,
+                              config_directory=second, cache_file=cache_file)
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_get_file_list(self):
         """
         Test the list of files that the module things it's reading and the order
@@ -176,6 +337,40 @@ class TestConfigFile(unittest.TestCase):
                          "Didn't get the files in the correct order: " +
                          " %s\n instead of\n %s" % (file_list, file_order))
 
+    def test_config_snapshot(self):
+        """
+        Test that both views of a ConfigSnapshot hold the merged contents of
+        the config files
+        """
+        config_directory = get_test_config('config-test1.d')
+        snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        self.assertEqual(configfile.get_file_list(config_directory=config_directory),
+                         snapshot.file_list)
+        config = snapshot.config
+        self.assertEqual('bar', config.get('Common', 'second_opt'))
+        self.assertEqual('foo', config.get('Common', 'first_opt'))
+        self.assertEqual('2', config.get('Common', 'bar'))
+        self.assertIs(config, snapshot.get_config())
+
+        config_directory = get_test_config('config-case.d')
+        snapshot = configfile.ConfigSnapshot(config_directory=config_directory)
+        config = snapshot.config
+        self.assertEqual('second', config.get('Local Settings', 'myvar'))
+        self.assertEqual('two', config.get('Common', 'mixed_case'))
+        self.assertEqual('default', config.get('Common', 'default_opt'))
+        self.assertEqual('50%', config.get('Local Settings', 'othervar', raw=True))
+
+        config = snapshot.case_sensitive_config
+        self.assertEqual('second', config.get('Local Settings', 'MyVar'))
+        self.assertFalse(config.has_option('Local Settings', 'myvar'))
+        self.assertEqual('one', config.get('Common', 'Mixed_Case'))
+        self.assertEqual('two', config.get('Common', 'mixed_case'))
+        self.assertEqual(['default_opt'], list(config.defaults().keys()))
+
+        self.assertEqual(configfile.read_config_files(config_directory=config_directory,
+                                                      case_sensitive=True).items('Common', raw=True),
+                         config.items('Common', raw=True))
+
     def test_jobmanager_enabled(self):
         """
         Test configurations to make sure that they are properly understood as being for a CE
@@ -0,0 +1,143 @@
+"""Unit tests to test the configurescheduler module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import configurescheduler
+from osg_configure.modules import exceptions
+from osg_configure.modules.baseconfiguration import BaseConfiguration
+from osg_configure.configure_modules.bosco import BoscoConfiguration
+from osg_configure.configure_modules.condor import CondorConfiguration
+from osg_configure.configure_modules.gratia import GratiaConfiguration
+from osg_configure.configure_modules.infoservices import InfoServicesConfiguration
+from osg_configure.configure_modules.squid import SquidConfiguration
+
+
+class FakeConfiguration(BaseConfiguration):
+    """Configuration module that sleeps and keeps track of what it overlaps with"""
+    lock = threading.Lock()
+    running = set()
+    events = []
+
+    def __init__(self, name, delay=0.0, resources=(), error=False):
+        super().__init__()
+        self.logger = logging.getLogger('test_configurescheduler')
+        self.name = name
+        self.delay = delay
+        self.resources = set(resources)
+        self.error = error
+        self.overlapped = set()
+
+    def configure(self, attributes):
+        with self.lock:
+            self.overlapped |= self.running
+            for other in self.running:
+                other.overlapped.add(self)
+            self.running.add(self)
+            self.events.append(('start', self.name))
+        self.log("configuring %s" % self.name, level=logging.WARNING)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running.discard(self)
+            self.events.append(('end', self.name))
+        if self.error:
+            raise exceptions.ConfigureError("%s failed" % self.name)
+        return self.name
+
+    def module_name(self):
+        return self.name
+
+    def shared_resources(self):
+        return self.resources
+
+
+class ListHandler(logging.Handler):
+    """Handler that keeps the messages it is given"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestConfigureScheduler(unittest.TestCase):
+    """
+    Unit test class to test the configurescheduler module
+    """
+
+    def setUp(self):
+        FakeConfiguration.events = []
+        self.handler = ListHandler()
+        logging.getLogger().addHandler(self.handler)
+
+    def tearDown(self):
+        logging.getLogger().removeHandler(self.handler)
+
+    def test_parallel_and_log_order(self):
+        """
+        Test that independent modules run concurrently and that their log
+        messages come out in module order
+        """
+        modules = [FakeConfiguration('A', 0.2), FakeConfiguration('B', 0.1), FakeConfiguration('C')]
+        results = configurescheduler.configure_modules(modules, {}, max_workers=3)
+        self.assertEqual(['A', 'B', 'C'], results)
+        self.assertIn(modules[1], modules[0].overlapped)
+        self.assertEqual(['configuring A', 'configuring B', 'configuring C'], self.handler.messages)
+
+    def test_shared_resources(self):
+        """
+        Test that modules sharing a resource are never configured at once
+        """
+        modules = [FakeConfiguration('PBS', 0.1, resources=['/etc/blah.config']),
+                   FakeConfiguration('SLURM', 0.1, resources=['/etc/blah.config']),
+                   FakeConfiguration('Squid', 0.1)]
+        configurescheduler.configure_modules(modules, {}, max_workers=3)
+        self.assertNotIn(modules[1], modules[0].overlapped)
+        self.assertIn(modules[2], modules[0].overlapped)
+
+    def test_module_shared_resources(self):
+        """
+        Test that the modules that write or read the same HTCondor and
+        HTCondor-CE config declare a shared resource, so they are never
+        configured at once
+        """
+        def share(first, second):
+            return bool(first.shared_resources() & second.shared_resources())
+
+        condor = CondorConfiguration()
+        gratia = GratiaConfiguration()
+        infoservices = InfoServicesConfiguration()
+        bosco = BoscoConfiguration()
+        self.assertTrue(share(condor, gratia))
+        self.assertTrue(share(condor, infoservices))
+        self.assertTrue(share(bosco, infoservices))
+        self.assertTrue(share(condor, bosco))
+        self.assertFalse(share(condor, SquidConfiguration()))
+
+    def test_fail_fast(self):
+        """
+        Test that no more modules are started once one fails and that the
+        failure is re-raised
+        """
+        modules = [FakeConfiguration('A', error=True), FakeConfiguration('B'), FakeConfiguration('C')]
+        self.assertRaises(exceptions.ConfigureError, configurescheduler.configure_modules, modules, {},
+                          max_workers=1)
+        self.assertEqual([('start', 'A'), ('end', 'A')], FakeConfiguration.events)
+        self.assertEqual(['configuring A'], self.handler.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Unit tests to test the configurestate module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import configparser
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import configurestate
+from osg_configure.modules import utilities
+from osg_configure.configure_modules.gratia import GratiaConfiguration
+from osg_configure.configure_modules.squid import SquidConfiguration
+
+
+class TestConfigureState(unittest.TestCase):
+    """
+    Unit test class to test the configurestate module
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, 'state.json')
+        self.config = configparser.ConfigParser()
+        self.config.read_string("""
+[Squid]
+enabled = True
+location = squid.example.net
+
+[Site Information]
+resource = TEST_RESOURCE
+
+[Gratia]
+enabled = True
+""")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        utilities.set_rpm_backend()
+
+    def test_section_hash(self):
+        """
+        Test that section hashes only change when the section contents change
+        """
+        squid_hash = configurestate.section_hash(self.config, 'Squid')
+        self.assertEqual(squid_hash, configurestate.section_hash(self.config, 'Squid'))
+        self.assertNotEqual(squid_hash, configurestate.section_hash(self.config, 'Gratia'))
+        self.assertIsNone(configurestate.section_hash(self.config, 'Missing'))
+
+        self.config.set('Squid', 'location', 'UNAVAILABLE')
+        self.assertNotEqual(squid_hash, configurestate.section_hash(self.config, 'Squid'))
+
+    def test_module_changed(self):
+        """
+        Test that modules are only reported as changed if a section they
+        depend on changes
+        """
+        squid = SquidConfiguration()
+        gratia = GratiaConfiguration()
+        state = configurestate.ConfigureState(state_file=self.state_file)
+        squid_hashes = configurestate.module_input_hashes(squid, self.config)
+        gratia_hashes = configurestate.module_input_hashes(gratia, self.config)
+        self.assertEqual(['Squid'], list(squid_hashes.keys()))
+        self.assertEqual(['Condor', 'Gratia', 'Site Information'], list(gratia_hashes.keys()))
+
+        # nothing has been recorded yet
+        self.assertTrue(state.module_changed(squid, squid_hashes))
+        state.record(squid, squid_hashes)
+        state.record(gratia, gratia_hashes)
+        self.assertTrue(state.save())
+
+        state = configurestate.ConfigureState(state_file=self.state_file)
+        self.assertFalse(state.module_changed(squid, squid_hashes))
+        self.assertFalse(state.module_changed(gratia, gratia_hashes))
+
+        self.config.set('Site Information', 'resource', 'OTHER_RESOURCE')
+        self.assertFalse(state.module_changed(squid, configurestate.module_input_hashes(squid, self.config)))
+        self.assertTrue(state.module_changed(gratia, configurestate.module_input_hashes(gratia, self.config)))
+
+    def test_module_state(self):
+        """
+        Test that modules are reported as changed if an rpm they check for is
+        installed or removed, or if one of the files they write changes
+        """
+        output_file = os.path.join(self.temp_dir, 'squid.conf')
+
+        class OutputSquidConfiguration(SquidConfiguration):
+            def output_files(self):
+                return {output_file}
+
+        squid = OutputSquidConfiguration()
+        utilities.set_rpm_backend(lambda names: {'htcondor-ce'}.intersection(names))
+        state = configurestate.ConfigureState(state_file=self.state_file)
+        squid_state = configurestate.module_state(squid, self.config)
+        self.assertEqual(['Squid', 'file:' + output_file, 'rpm:frontier-squid', 'rpm:htcondor-ce'],
+                         sorted(squid_state.keys()))
+        self.assertIsNone(squid_state['file:' + output_file])
+        state.record(squid, squid_state)
+        self.assertFalse(state.module_changed(squid, configurestate.module_state(squid, self.config)))
+
+        with open(output_file, 'w') as file_handle:
+            file_handle.write('written by osg-configure\n')
+        self.assertTrue(state.module_changed(squid, configurestate.module_state(squid, self.config)))
+        state.record(squid, configurestate.module_state(squid, self.config))
+        self.assertFalse(state.module_changed(squid, configurestate.module_state(squid, self.config)))
+
+        with open(output_file, 'w') as file_handle:
+            file_handle.write('edited by hand\n')
+        self.assertTrue(state.module_changed(squid, configurestate.module_state(squid, self.config)))
+        state.record(squid, configurestate.module_state(squid, self.config))
+
+        utilities.set_rpm_backend(lambda names: {'htcondor-ce', 'frontier-squid'}.intersection(names))
+        self.assertTrue(state.module_changed(squid, configurestate.module_state(squid, self.config)))
+
+    def test_bad_state_file(self):
+        """
+        Test that a corrupt state file is ignored
+        """
+        with open(self.state_file, 'w') as file_handle:
+            file_handle.write('{"version": 1, "modules"')
+        squid = SquidConfiguration()
+        state = configurestate.ConfigureState(state_file=self.state_file)
+        self.assertTrue(state.module_changed(squid, configurestate.module_input_hashes(squid, self.config)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Unit tests to test the configwatch module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import configfile
+from osg_configure.modules import configwatch
+
+
+class TestConfigWatch(unittest.TestCase):
+    """
+    Unit test class to test the configwatch module
+    """
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.config_dir, '10-test.ini')
+        self.write_config("[Squid]\nenabled = True\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+        shutil.rmtree(self.config_dir + '.old', ignore_errors=True)
+
+    def write_config(self, contents, filename=None):
+        with open(filename or self.config_file, 'w') as file_handle:
+            file_handle.write(contents)
+
+    def check_wait_for_change(self, watcher):
+        self.assertFalse(watcher.changed())
+
+        def edit():
+            time.sleep(0.1)
+            self.write_config("[Squid]\nenabled = False\n")
+            time.sleep(0.1)
+            self.write_config("[Storage]\nse_available = False\n", os.path.join(self.config_dir, '20-test.ini'))
+
+        editor = threading.Thread(target=edit)
+        editor.start()
+        start = time.time()
+        watcher.wait_for_change(debounce=0.3)
+        editor.join()
+        # both edits are picked up by a single wait
+        self.assertGreaterEqual(time.time() - start, 0.5)
+        self.assertFalse(watcher.changed())
+
+    def test_wait_for_change(self):
+        """
+        Test that a burst of edits is reported as one change
+        """
+        watcher = configwatch.ConfigWatcher(self.config_dir)
+        try:
+            self.check_wait_for_change(watcher)
+        finally:
+            watcher.close()
+
+    def test_wait_for_change_polling(self):
+        """
+        Test waiting for changes without inotify
+        """
+        watcher = configwatch.ConfigWatcher(self.config_dir, poll_interval=0.05)
+        watcher.close()
+        self.check_wait_for_change(watcher)
+
+    def wait_in_thread(self, watcher, edit):
+        """Run edit while waiting for a change; return True if the change was seen"""
+        waiter = threading.Thread(target=watcher.wait_for_change, kwargs=dict(debounce=0.1))
+        waiter.daemon = True
+        waiter.start()
+        time.sleep(0.1)
+        edit()
+        waiter.join(5)
+        return not waiter.is_alive()
+
+    def test_directory_replaced(self):
+        """
+        Test that the watch follows the config directory when it is moved
+        away and replaced
+        """
+        watcher = configwatch.ConfigWatcher(self.config_dir)
+        if watcher.inotify_fd is None:
+            self.skipTest("inotify is not available")
+        try:
+            def replace():
+                os.rename(self.config_dir, self.config_dir + '.old')
+                os.mkdir(self.config_dir)
+                self.write_config("[Squid]\nenabled = False\n")
+
+            self.assertTrue(self.wait_in_thread(watcher, replace))
+            self.assertIsNotNone(watcher.inotify_fd)
+            # edits to the new directory are still seen
+            self.assertTrue(self.wait_in_thread(watcher, lambda: self.write_config("[Squid]\nenabled = True\n")))
+        finally:
+            watcher.close()
+
+    def test_snapshot_reuse(self):
+        """
+        Test that a snapshot only re-reads files that changed since the
+        previous snapshot
+        """
+        other_file = os.path.join(self.config_dir, '20-test.ini')
+        self.write_config("[Storage]\nse_available = False\n", other_file)
+        first = configfile.ConfigSnapshot(config_directory=self.config_dir, previous=None)
+        self.assertIsNone(first.fingerprints)
+        first = configfile.ConfigSnapshot(config_directory=self.config_dir, previous=first)
+
+        time.sleep(0.01)
+        self.write_config("[Squid]\nenabled = False\nlocation = squid.example.net\n")
+        second = configfile.ConfigSnapshot(config_directory=self.config_dir, previous=first)
+        self.assertEqual('False', second.config.get('Squid', 'enabled'))
+        self.assertEqual('squid.example.net', second.config.get('Squid', 'location'))
+        self.assertEqual('False', second.config.get('Storage', 'se_available'))
+        # the unchanged file's entries were reused rather than read again
+        self.assertIs(dict(first.file_entries)[other_file], dict(second.file_entries)[other_file])
+        self.assertIsNot(dict(first.file_entries)[self.config_file], dict(second.file_entries)[self.config_file])
+
+
+if __name__ == '__main__':
+    unittest.main()
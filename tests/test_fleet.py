@@ -0,0 +1,112 @@
+"""Unit tests to test the fleet and hostprofile modules"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure import fleet
+from osg_configure.modules import exceptions
+from osg_configure.modules import hostprofile
+from osg_configure.modules import utilities
+from osg_configure.modules import validation
+
+
+class TestFleet(unittest.TestCase):
+    """
+    Unit test class to test the fleet and hostprofile modules
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.profile_file = os.path.join(self.temp_dir, 'profile.json')
+        with open(self.profile_file, 'w') as file_handle:
+            json.dump({'rpms': ['condor'],
+                       'condor_config_val': {'condor_config_val': {'COLLECTOR_PORT': '9618'}},
+                       'paths': ['/usr', '/usr/bin/', '/etc/condor/condor_config'],
+                       'users': ['condor'],
+                       'resolvable_hosts': ['ce.example.org']}, file_handle)
+
+    def tearDown(self):
+        hostprofile.HostProfile.uninstall()
+        shutil.rmtree(self.temp_dir)
+
+    def make_tree(self, name, contents):
+        config_dir = os.path.join(self.temp_dir, name)
+        os.mkdir(config_dir)
+        with open(os.path.join(config_dir, '20-condor.ini'), 'w') as file_handle:
+            file_handle.write(contents)
+        return config_dir
+
+    def test_host_profile(self):
+        """
+        Test that an installed host profile answers the host probes
+        """
+        hostprofile.HostProfile.load(self.profile_file).install()
+        self.assertTrue(utilities.rpm_installed('condor'))
+        self.assertFalse(utilities.rpm_installed('htcondor-ce'))
+        self.assertEqual(utilities.get_condor_config_val('COLLECTOR_PORT'), '9618')
+        self.assertEqual(utilities.get_condor_config_val('UNDEFINED', quiet_undefined=True), None)
+        self.assertEqual(utilities.get_condor_ce_config_val('COLLECTOR_PORT', quiet_undefined=True), None)
+        self.assertTrue(validation.valid_location('/usr/bin'))
+        self.assertTrue(validation.valid_file('/etc/condor/condor_config'))
+        self.assertFalse(validation.valid_directory('/opt/condor'))
+        self.assertTrue(validation.valid_user('condor'))
+        self.assertFalse(validation.valid_user('root'))
+        self.assertTrue(validation.valid_domain('ce.example.org', resolve=True))
+        self.assertFalse(validation.valid_domain('other.example.org', resolve=True))
+
+        hostprofile.HostProfile().install()
+        self.assertTrue(validation.valid_directory('/opt/condor'))
+        self.assertTrue(validation.valid_user('nobody-at-all'))
+
+    def test_bad_profile(self):
+        """
+        Test that an invalid profile file is rejected
+        """
+        with open(self.profile_file, 'w') as file_handle:
+            json.dump({'rpm': ['condor']}, file_handle)
+        self.assertRaises(exceptions.Error, hostprofile.HostProfile.load, self.profile_file)
+        self.assertRaises(exceptions.Error, fleet.verify_trees, [self.temp_dir],
+                          profile_file=os.path.join(self.temp_dir, 'missing.json'))
+
+    def test_verify_trees(self):
+        """
+        Test that each tree is verified against the profile and reported on
+        """
+        good = self.make_tree('good', "[Condor]\nenabled = True\ncondor_location = /usr\n"
+                                      "condor_config = /etc/condor/condor_config\n")
+        bad = self.make_tree('bad', "[Condor]\nenabled = True\ncondor_location = /opt/condor\n"
+                                    "condor_config = /etc/condor/condor_config\n")
+        missing = os.path.join(self.temp_dir, 'missing')
+        report = fleet.verify_trees([good, bad, missing], profile_file=self.profile_file, max_workers=2)
+        self.assertFalse(report['ok'])
+        self.assertEqual(report['failed'], [bad, missing])
+        self.assertEqual([tree['config_dir'] for tree in report['trees']], [good, bad, missing])
+
+        good_report, bad_report, missing_report = report['trees']
+        self.assertTrue(good_report['ok'], good_report['error'])
+        self.assertIn('Condor', good_report['checked_modules'])
+        self.assertEqual(bad_report['error'], "Invalid attributes found")
+        self.assertTrue(any('/opt/condor' in x['message'] for x in bad_report['messages']),
+                        bad_report['messages'])
+        # option locations name the file in the tree, not in /etc/osg/config.d
+        self.assertTrue(any(os.path.join(bad, '20-condor.ini') in x['message'] for x in bad_report['messages']),
+                        bad_report['messages'])
+        self.assertTrue(missing_report['error'].startswith("Can't read configuration files"))
+
+        # nothing was written to the trees
+        self.assertEqual(os.listdir(good), ['20-condor.ini'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""Unit tests to test the module registry"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import sys
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import moduleregistry
+from osg_configure.modules import utilities
+
+
+class TestModuleRegistry(unittest.TestCase):
+    """
+    Unit test class to test the module registry
+    """
+
+    def test_registry_complete(self):
+        """
+        Test that every configuration module is in the registry
+        """
+        module_dir = os.path.join(os.path.dirname(os.path.dirname(utilities.__file__)), 'configure_modules')
+        module_files = set(x[:-3] for x in os.listdir(module_dir)
+                           if x.endswith('.py') and x not in ('__init__.py', 'siteattributes.py'))
+        self.assertEqual(module_files, set(info.import_name for info in moduleregistry.MODULES))
+
+    def test_registry_metadata(self):
+        """
+        Test that the metadata in the registry matches the modules
+        """
+        for info in moduleregistry.MODULES:
+            module = moduleregistry.load_module(info)
+            self.assertEqual(info.name, module.module_name())
+            self.assertEqual(info.section, module.config_section)
+            self.assertEqual(info.separately_configurable, module.separately_configurable())
+
+    def test_find_module(self):
+        """
+        Test looking up modules by name
+        """
+        self.assertEqual('squid', moduleregistry.find_module('Squid').import_name)
+        self.assertEqual('squid', moduleregistry.find_module('squid').import_name)
+        self.assertIsNone(moduleregistry.find_module('NoSuchModule'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Unit tests to test the profiling module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import commandrunner
+from osg_configure.modules import profiling
+from osg_configure.modules import resolver
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Unit test class to test the profiling module
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_phases_and_commands(self):
+        """
+        Test that phases and the commands run in them are recorded
+        """
+        with profiling.phase("not profiling"):
+            pass
+        profiler = profiling.start()
+        with profiling.phase("outer"):
+            with profiling.phase("inner"):
+                commandrunner.run(["true"])
+            commandrunner.run("sh -c true")
+        self.assertIs(profiler, profiling.stop())
+        self.assertIsNone(profiling.active_profiler())
+        commandrunner.run(["true"])
+
+        report = profiler.report()
+        self.assertEqual(["outer", "inner"], [x['name'] for x in report['phases']])
+        self.assertEqual([None, "outer"], [x['parent'] for x in report['phases']])
+        self.assertEqual([(["true"], "inner", 0), (["sh", "-c", "true"], "outer", 0)],
+                         [(x['argv'], x['phase'], x['status']) for x in report['calls']])
+        self.assertGreaterEqual(report['wall_time'], report['phases'][0]['wall_time'])
+
+        summary = profiler.summary()
+        self.assertIn("  inner", summary)
+        self.assertIn("2 external calls", summary)
+
+        report_file = os.path.join(self.temp_dir, 'profile.json')
+        self.assertTrue(profiler.write_report(report_file))
+        with open(report_file) as file_handle:
+            self.assertEqual(2, len(json.load(file_handle)['calls']))
+
+    def test_lookups(self):
+        """
+        Test that DNS lookups made through the resolver are recorded
+        """
+        def fake_gethostbyname(host):
+            if host == 'bad.example.com':
+                raise OSError("unknown host")
+            return '192.0.2.1'
+
+        profiler = profiling.start()
+        resolver.Resolver(lookup=fake_gethostbyname).resolve('good.example.com')
+        resolver.Resolver(lookup=fake_gethostbyname).resolve('bad.example.com')
+        profiling.stop()
+        self.assertEqual([('dns', ['fake_gethostbyname', 'good.example.com']),
+                          ('dns', ['fake_gethostbyname', 'bad.example.com'])],
+                         [(x['kind'], x['argv']) for x in profiler.calls])
+
+    def test_unpatched(self):
+        """
+        Test that nothing in the standard library is replaced, and that the
+        profiler stops observing commands and lookups when it is stopped
+        """
+        def patched():
+            return (subprocess.Popen, os.system, socket.getfqdn, socket.gethostbyname, socket.getaddrinfo)
+
+        originals = patched()
+        with profiling.phase("not profiling"):
+            self.assertEqual(originals, patched())
+        self.assertIsNone(profiling.stop())
+
+        first = profiling.start()
+        self.assertEqual(originals, patched())
+        # starting again replaces the active profiler
+        second = profiling.start()
+        profiling.stop()
+        self.assertEqual(originals, patched())
+        commandrunner.run(["true"])
+        self.assertEqual([], first.calls)
+        self.assertEqual([], second.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Unit tests to test the resolver module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import resolver
+from osg_configure.modules import validation
+
+
+class FakeLookup:
+    """Stand-in for socket.gethostbyname that takes delay seconds per lookup"""
+
+    def __init__(self, addresses, delay=0.0):
+        self.addresses = addresses
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, host):
+        with self.lock:
+            self.calls.append(host)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if host not in self.addresses:
+                raise socket.gaierror("Name or service not known")
+            return self.addresses[host]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestResolver(unittest.TestCase):
+    """
+    Unit test class to test the resolver module
+    """
+
+    def tearDown(self):
+        resolver.set_resolver()
+
+    def test_memoized(self):
+        """
+        Test that each host is only looked up once
+        """
+        lookup = FakeLookup({'ce.example.org': '192.0.2.1'})
+        host_resolver = resolver.Resolver(lookup=lookup)
+        self.assertEqual(host_resolver.resolve('ce.example.org'), '192.0.2.1')
+        self.assertEqual(host_resolver.resolve('ce.example.org'), '192.0.2.1')
+        self.assertEqual(host_resolver.resolve('missing.example.org'), None)
+        self.assertEqual(host_resolver.resolve('missing.example.org'), None)
+        self.assertEqual(lookup.calls, ['ce.example.org', 'missing.example.org'])
+
+    def test_concurrent(self):
+        """
+        Test that prefetched hosts are looked up concurrently, up to the limit
+        """
+        hosts = ['host%d.example.org' % x for x in range(8)]
+        lookup = FakeLookup(dict((host, '192.0.2.1') for host in hosts), delay=0.2)
+        host_resolver = resolver.Resolver(lookup=lookup, max_concurrent=4)
+        start = time.monotonic()
+        host_resolver.prefetch(hosts)
+        for host in hosts:
+            self.assertEqual(host_resolver.resolve(host), '192.0.2.1')
+        self.assertLess(time.monotonic() - start, 1.2)
+        self.assertEqual(lookup.max_running, 4)
+
+    def test_timeout(self):
+        """
+        Test that a lookup that takes too long counts as unresolvable
+        """
+        lookup = FakeLookup({'slow.example.org': '192.0.2.1'}, delay=2)
+        host_resolver = resolver.Resolver(lookup=lookup, timeout=0.1)
+        start = time.monotonic()
+        self.assertEqual(host_resolver.resolve('slow.example.org'), None)
+        self.assertEqual(host_resolver.resolve('slow.example.org'), None)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_valid_domain(self):
+        """
+        Test that valid_domain uses the run's resolver
+        """
+        lookup = FakeLookup({'ce.example.org': '192.0.2.1'})
+        resolver.set_resolver(resolver.Resolver(lookup=lookup))
+        validation.prefetch_domains(['ce.example.org', '192.0.2.2', 'bad..name', None])
+        self.assertTrue(validation.valid_domain('ce.example.org', resolve=True))
+        self.assertFalse(validation.valid_domain('missing.example.org', resolve=True))
+        self.assertTrue(validation.valid_domain('192.0.2.2', resolve=True))
+        self.assertEqual(sorted(lookup.calls), ['ce.example.org', 'missing.example.org'])
+
+
+if __name__ == '__main__':
+    unittest.main()
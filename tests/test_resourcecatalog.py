@@ -17,6 +17,12 @@ except ImportError:
 from osg_configure.modules import exceptions
 from osg_configure.modules.utilities import get_test_config, split_comma_separated_list
 
+# extra_transforms are parsed with the HTCondor bindings
+try:
+    import classad
+except ImportError:
+    classad = None
+
 
 class TestResourceCatalog(unittest.TestCase):
     def assertDoesNotRaise(self, exception, function, *args, **kwargs):
@@ -91,6 +97,7 @@ class TestResourceCatalog(unittest.TestCase):
   ] \
 }""")
 
+    @unittest.skipIf(classad is None, "classad not available")
     def testExtraTransforms(self):
         rce = RCEntry(name='sc', cpus=1, memory=2000, extra_transforms='set_WantRHEL6 = 1')
         self.rc.add_rcentry(rce)
@@ -187,6 +194,7 @@ allowed_vos = osg, atlas
                 sys.stderr.write("Failed to raise error on " + config_filename)
                 raise
 
+    @unittest.skipIf(classad is None, "classad not available")
     def testFullWithExtraTransforms(self):
         config = configparser.SafeConfigParser()
         config_string = r"""
@@ -340,6 +348,49 @@ os = rhel8
         actual_string = subcluster.resource_catalog_from_config(config_parser).compose_text()
         self.assertLongStringEqual(actual_string, expected_string)
 
+    def testSizeReport(self):
+        for index in range(10):
+            self.rc.add_rcentry(RCEntry(name='sc%d' % index, cpus=1 + index % 2, memory=2000,
+                                        allowed_vos=['osg', 'atlas', 'cms', 'ligo', 'fermilab'], queue='red'))
+        sizes = self.rc.size_report()
+        self.assertEqual(sizes['config'], len(self.rc.compose_text()))
+        self.assertLess(sizes['advertised'], sizes['config'])
+        # the advertised attribute has no line continuations or indentation
+        self.assertLessEqual(sizes['advertised'], len(' '.join(self.rc.format_value().replace('\\\n', '').split())))
+
+    def testMemoized(self):
+        config = configparser.SafeConfigParser()
+        config.read(get_test_config("subcluster/resourceentry_and_sc.ini"))
+        subcluster.clear_resource_catalog_cache()
+        builds = []
+        saved_build = subcluster._build_resource_catalog
+
+        def counting_build(config, default_allowed_vos=None, index=None):
+            builds.append(default_allowed_vos)
+            return saved_build(config, default_allowed_vos, index)
+
+        subcluster._build_resource_catalog = counting_build
+        try:
+            rc = subcluster.resource_catalog_from_config(config, default_allowed_vos=[])
+            self.assertIs(subcluster.resource_catalog_from_config(config, default_allowed_vos=[]), rc)
+            self.assertEqual(len(builds), 1)
+
+            # sections that aren't subcluster-like don't matter
+            config.add_section("Squid")
+            config.set("Squid", "location", "squid.example.org")
+            self.assertIs(subcluster.resource_catalog_from_config(config, default_allowed_vos=[]), rc)
+            self.assertEqual(len(builds), 1)
+
+            subcluster.resource_catalog_from_config(config, default_allowed_vos=["osg"])
+            self.assertEqual(len(builds), 2)
+
+            config.set("Resource Entry Valid", "cpucount", "3")
+            self.assertIsNot(subcluster.resource_catalog_from_config(config, default_allowed_vos=[]), rc)
+            self.assertEqual(len(builds), 3)
+        finally:
+            subcluster._build_resource_catalog = saved_build
+            subcluster.clear_resource_catalog_cache()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+"""Unit tests to test the reversevomap module"""
+
+# pylint: disable=W0703
+# pylint: disable=R0904
+
+import fnmatch
+import os
+import pwd
+import shutil
+import sys
+import tempfile
+import unittest
+
+# setup system library path
+pathname = os.path.realpath('../')
+sys.path.insert(0, pathname)
+
+from osg_configure.modules import reversevomap
+
+
+class TestReverseVOMap(unittest.TestCase):
+    """
+    Unit test class to test the reversevomap module
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved_paths = (reversevomap.DEFAULT_VOMS_MAPFILE, reversevomap.VOMS_MAPFILE, reversevomap.BAN_MAPFILE)
+        reversevomap.DEFAULT_VOMS_MAPFILE = os.path.join(self.temp_dir, 'voms-mapfile-default')
+        reversevomap.VOMS_MAPFILE = os.path.join(self.temp_dir, 'voms-mapfile')
+        reversevomap.BAN_MAPFILE = os.path.join(self.temp_dir, 'ban-voms-mapfile')
+        self.cache_file = os.path.join(self.temp_dir, 'cache.json')
+        self.existing_user = pwd.getpwuid(os.getuid()).pw_name
+        self.write(reversevomap.DEFAULT_VOMS_MAPFILE,
+                   '"/osg/*" %s\n'
+                   '"/cms/Role=pilot/Capability=NULL" %s\n'
+                   '"/glow/*" nosuchuser12345\n' % (self.existing_user, self.existing_user))
+        self.write(reversevomap.BAN_MAPFILE, '"/cms/*"\n')
+        reversevomap.clear_user_cache()
+
+    def tearDown(self):
+        (reversevomap.DEFAULT_VOMS_MAPFILE, reversevomap.VOMS_MAPFILE, reversevomap.BAN_MAPFILE) = self.saved_paths
+        reversevomap.clear_user_cache()
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def write(filename, contents):
+        with open(filename, 'w') as file_handle:
+            file_handle.write(contents)
+
+    def test_filter_by_existing_users(self):
+        """
+        Test that each user in the mappings is only looked up once
+        """
+        lookups = []
+        saved_getpwnam = reversevomap.pwd.getpwnam
+
+        def fake_getpwnam(username):
+            lookups.append(username)
+            return saved_getpwnam(username)
+
+        reversevomap.pwd.getpwnam = fake_getpwnam
+        try:
+            mappings = reversevomap.read_mapfiles()
+            self.assertEqual(reversevomap.filter_by_existing_users(mappings), mappings[:2])
+            self.assertEqual(reversevomap.filter_by_existing_users(mappings), mappings[:2])
+        finally:
+            reversevomap.pwd.getpwnam = saved_getpwnam
+        self.assertEqual(sorted(lookups), sorted([self.existing_user, 'nosuchuser12345']))
+
+    def test_ban_matcher(self):
+        """
+        Test that BanMatcher gives the same answers as fnmatch with each ban
+        """
+        bans = ['/cms/*', '/glow/Role=?ilot*', '/osg/[abc]*', '/x[!0-9]/*', '/dots.+(|)/*', '/lit[', '/exact']
+        patterns = ['/cms/Role=pilot', '/cmsx/Role=pilot', '/glow/Role=pilot/Capability=NULL', '/glow/Role=xxpilot',
+                    '/osg/b/Role=NULL', '/osg/d', '/xa/y', '/x1/y', '/dots.+(|)/z', '/dotsa+(|)/z', '/lit[',
+                    '/exact', '/exact/', '/EXACT']
+        matcher = reversevomap.BanMatcher(bans)
+        for pattern in patterns:
+            expected = any(fnmatch.fnmatch(pattern, ban) for ban in bans)
+            self.assertEqual(matcher.matches(pattern), expected, pattern)
+        self.assertFalse(reversevomap.BanMatcher([]).matches('/cms/Role=pilot'))
+
+        mappings = [reversevomap.Mapping(pattern, 'user') for pattern in patterns]
+        self.assertEqual(reversevomap.filter_out_bans(mappings, bans),
+                         [m for m in mappings if not any(fnmatch.fnmatch(m.pattern, ban) for ban in bans)])
+
+    def test_allowed_vos_cache(self):
+        """
+        Test that the allowed VOs are saved and reused until a mapfile changes
+        """
+        self.assertEqual(reversevomap.get_allowed_vos(self.cache_file), set(['osg']))
+        self.assertTrue(os.path.exists(self.cache_file))
+
+        # the cache is used while the mapfiles are unchanged
+        saved_read_mapfiles = reversevomap.read_mapfiles
+        reversevomap.read_mapfiles = lambda: self.fail("mapfiles read despite the cache")
+        try:
+            self.assertEqual(reversevomap.get_allowed_vos(self.cache_file), set(['osg']))
+        finally:
+            reversevomap.read_mapfiles = saved_read_mapfiles
+
+        # a new mapfile invalidates the cache
+        self.write(reversevomap.VOMS_MAPFILE, '"/atlas/*" %s\n' % self.existing_user)
+        self.assertEqual(reversevomap.get_allowed_vos(self.cache_file), set(['osg', 'atlas']))
+
+        # so does removing the ban file
+        os.unlink(reversevomap.BAN_MAPFILE)
+        self.assertEqual(reversevomap.get_allowed_vos(self.cache_file), set(['osg', 'atlas', 'cms']))
+        self.assertEqual(reversevomap.get_allowed_vos(None), set(['osg', 'atlas', 'cms']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -328,6 +328,19 @@ class TestRSV(unittest.TestCase):
         self.assertTrue(settings.check_attributes(attributes),
                         "Correct configuration incorrectly flagged as incorrect")
 
+    def testOutputFiles(self):
+        """
+        Test that the files RSV writes are declared, including the per-host
+        metrics config for HTCondor-CE hosts
+        """
+        settings = self.load_settings_from_files("rsv/rsv1.ini")
+        settings._htcondor_ce_hosts = ['my.host.com']
+        files = settings.output_files()
+        for path in [settings.rsv_conf, rsv.CONDOR_CRON_SYSCONFIG, rsv.CONDOR_CRON_LOCATION_CONFIG,
+                     rsv.CONDOR_CRON_IDS_CONFIG,
+                     os.path.join(settings.rsv_metrics_dir, 'my.host.com', 'allmetrics.conf')]:
+            self.assertTrue(path in files, "%s missing from output files" % path)
+
     def testServiceList(self):
         """
         Test to make sure right services get returned
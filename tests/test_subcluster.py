@@ -179,6 +179,33 @@ class TestSubcluster(unittest.TestCase):
         config_parser.set("Pilot chtc.cs.wisc.edu", "os", "rhel7")
         self.assertTrue(subcluster.check_config(config_parser), msg="Pilot w/ no singularity but with os failed")
 
+    def test_section_index(self):
+        """
+        Make sure the SectionIndex sorts out the sections by type and name
+        """
+        config_parser = configparser.SafeConfigParser()
+        config_file = get_test_config("subcluster/resourceentry_and_sc.ini")
+        config_parser.read(config_file)
+        config_parser.read_string("""
+[ pilot Sub Cluster 2]
+allowed_vos = osg
+
+[Pilotless]
+""")
+        index = subcluster.SectionIndex(config_parser)
+        self.assertEqual(index.subclusters, ["Subcluster SC1", "Subcluster Sub Cluster 2"])
+        self.assertEqual(index.resource_entries, ["Resource Entry Valid"])
+        self.assertEqual(index.pilots, [" pilot Sub Cluster 2", "Pilotless"])
+        self.assertEqual(index.sections, ["Subcluster SC1", "Subcluster Sub Cluster 2", "Resource Entry Valid",
+                                          " pilot Sub Cluster 2", "Pilotless"])
+        self.assertEqual(index.subcluster_names, {"SC1", "Sub Cluster 2"})
+        self.assertEqual(index.names["Resource Entry Valid"], "Valid")
+        self.assertEqual(index.names["Pilotless"], None)
+        self.assertEqual(index.duplicate_names(),
+                         {"Sub Cluster 2": ["Subcluster Sub Cluster 2", " pilot Sub Cluster 2"]})
+        for section in config_parser.sections():
+            self.assertEqual(section in index.sections, subcluster.is_subcluster_like(section), section)
+
 
 if __name__ == '__main__':
     console = logging.StreamHandler()
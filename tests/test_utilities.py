@@ -3,8 +3,12 @@
 # pylint: disable=W0703
 # pylint: disable=R0904
 
+import importlib.util
 import os
+import shutil
+import stat
 import sys
+import tempfile
 import unittest
 
 # setup system library path
@@ -40,6 +44,201 @@ class TestUtilities(unittest.TestCase):
             if os.path.exists(attribute_file):
                 os.unlink(attribute_file)
 
+    def test_atomic_write_unchanged(self):
+        """
+        Check that atomic_write leaves identical files alone and keeps track
+        of the files it changes
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, 'test.conf')
+            utilities.clear_changed_files()
+            self.assertTrue(utilities.atomic_write(filename, "a = 1\n"))
+            self.assertEqual([filename], utilities.changed_files())
+            inode = os.stat(filename).st_ino
+
+            utilities.clear_changed_files()
+            self.assertTrue(utilities.atomic_write(filename, "a = 1\n"))
+            self.assertEqual(inode, os.stat(filename).st_ino)
+            self.assertFalse(utilities.file_changed(filename))
+
+            # only the permissions change
+            self.assertTrue(utilities.atomic_write(filename, "a = 1\n", mode=0o600))
+            self.assertEqual(inode, os.stat(filename).st_ino)
+            self.assertEqual(0o600, os.stat(filename).st_mode & 0o777)
+            self.assertTrue(utilities.file_changed(filename))
+
+            utilities.clear_changed_files()
+            self.assertTrue(utilities.atomic_write(filename, "a = 2\n"))
+            self.assertEqual("a = 2\n", utilities.read_file(filename))
+            self.assertEqual(0o600, os.stat(filename).st_mode & 0o777)
+            self.assertTrue(utilities.file_changed(filename))
+        finally:
+            utilities.clear_changed_files()
+            shutil.rmtree(temp_dir)
+
+    def test_requested_reconfigs(self):
+        """
+        Check that services are only reconfigured once, in order, and only
+        if a file they read has changed
+        """
+        reconfigured = []
+
+        def fake_reconfig_service(service, reconfig_cmd):
+            reconfigured.append((service, reconfig_cmd))
+            return True
+
+        saved_reconfig_service = utilities.reconfig_service
+        utilities.reconfig_service = fake_reconfig_service
+        utilities.clear_changed_files()
+        try:
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            utilities.request_reconfig('condor', 'condor_reconfig')
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            self.assertTrue(utilities.run_requested_reconfigs())
+            self.assertEqual([], reconfigured)
+
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            utilities.request_reconfig('condor', 'condor_reconfig')
+            self.assertTrue(utilities.run_requested_reconfigs(force=True))
+            self.assertEqual([('condor', 'condor_reconfig'), ('condor-ce', 'condor_ce_reconfig')], reconfigured)
+
+            del reconfigured[:]
+            utilities._changed_files.append('/etc/condor-ce/config.d/50-osg-configure.conf')
+            utilities.request_reconfig('condor', 'condor_reconfig')
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            self.assertTrue(utilities.run_requested_reconfigs())
+            self.assertEqual([('condor-ce', 'condor_ce_reconfig')], reconfigured)
+            self.assertTrue(utilities.run_requested_reconfigs())
+            self.assertEqual(1, len(reconfigured))
+
+            # files outside the service's config directory count if they are
+            # passed with the request
+            del reconfigured[:]
+            utilities.clear_changed_files()
+            utilities._changed_files.append('/srv/osg/osg-job-environment.conf')
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            self.assertTrue(utilities.run_requested_reconfigs())
+            self.assertEqual([], reconfigured)
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig',
+                                       paths=['/srv/osg/osg-job-environment.conf'])
+            self.assertTrue(utilities.run_requested_reconfigs())
+            self.assertEqual([('condor-ce', 'condor_ce_reconfig')], reconfigured)
+        finally:
+            utilities.reconfig_service = saved_reconfig_service
+            utilities.clear_changed_files()
+
+    def test_transaction_reconfigs(self):
+        """
+        Check that the reconfigs requested in a transaction that is rolled
+        back, or before a transaction starts, are not run
+        """
+        reconfigured = []
+
+        def fake_reconfig_service(service, reconfig_cmd):
+            reconfigured.append((service, reconfig_cmd))
+            return True
+
+        saved_reconfig_service = utilities.reconfig_service
+        utilities.reconfig_service = fake_reconfig_service
+        try:
+            utilities.begin_transaction()
+            utilities.request_reconfig('condor', 'condor_reconfig')
+            utilities.rollback_transaction()
+            self.assertTrue(utilities.run_requested_reconfigs(force=True))
+            self.assertEqual([], reconfigured)
+
+            utilities.request_reconfig('condor', 'condor_reconfig')
+            utilities.begin_transaction()
+            utilities.request_reconfig('condor-ce', 'condor_ce_reconfig')
+            self.assertTrue(utilities.commit_transaction())
+            self.assertTrue(utilities.run_requested_reconfigs(force=True))
+            self.assertEqual([('condor-ce', 'condor_ce_reconfig')], reconfigured)
+        finally:
+            utilities.rollback_transaction()
+            utilities.reconfig_service = saved_reconfig_service
+
+    def test_write_transaction(self):
+        """
+        Check that writes are staged until the transaction is committed and
+        that a failed commit restores the previous files
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            first = os.path.join(temp_dir, 'first.conf')
+            second = os.path.join(temp_dir, 'second.conf')
+            utilities.atomic_write(first, "old\n")
+            utilities.clear_changed_files()
+
+            utilities.begin_transaction()
+            self.assertTrue(utilities.atomic_write(first, "new\n"))
+            self.assertTrue(utilities.atomic_write(second, "second\n"))
+            self.assertFalse(utilities.atomic_write(os.path.join(temp_dir, 'missing', 'x.conf'), "x"))
+            self.assertEqual("old\n", open(first).read())
+            self.assertFalse(os.path.exists(second))
+            # reads see the staged contents
+            self.assertEqual("new\n", utilities.read_file(first))
+            self.assertTrue(utilities.commit_transaction())
+            self.assertEqual("new\n", open(first).read())
+            self.assertEqual("second\n", open(second).read())
+            self.assertEqual(sorted([first, second]), sorted(utilities.changed_files()))
+
+            utilities.begin_transaction()
+            utilities.atomic_write(first, "discarded\n")
+            utilities.rollback_transaction()
+            self.assertEqual("new\n", utilities.read_file(first))
+
+            # the rename of the second file fails since it is now a directory
+            # that is not empty, so the first file has to be restored
+            utilities.begin_transaction()
+            utilities.atomic_write(first, "newer\n")
+            utilities.atomic_write(second, "newer\n")
+            os.unlink(second)
+            os.mkdir(second)
+            open(os.path.join(second, 'file'), 'w').close()
+            self.assertFalse(utilities.commit_transaction())
+            self.assertEqual("new\n", open(first).read())
+            self.assertEqual(['file'], os.listdir(second))
+            self.assertEqual(sorted(['first.conf', 'second.conf']), sorted(os.listdir(temp_dir)))
+        finally:
+            utilities.rollback_transaction()
+            utilities.clear_changed_files()
+            shutil.rmtree(temp_dir)
+
+    def test_unstaged_rollback(self):
+        """
+        Check that files written inside unstaged_writes() are written right
+        away and put back as they were when the transaction is rolled back
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            existing = os.path.join(temp_dir, 'existing.conf')
+            new = os.path.join(temp_dir, 'new.conf')
+            utilities.atomic_write(existing, "old\n", mode=0o600)
+
+            utilities.begin_transaction()
+            with utilities.unstaged_writes():
+                self.assertTrue(utilities.atomic_write(existing, "new\n", mode=0o644))
+                self.assertTrue(utilities.atomic_write(existing, "newer\n"))
+                self.assertTrue(utilities.atomic_write(new, "new\n"))
+            self.assertEqual("newer\n", open(existing).read())
+            self.assertEqual("new\n", open(new).read())
+            utilities.rollback_transaction()
+            self.assertEqual("old\n", open(existing).read())
+            self.assertEqual(0o600, stat.S_IMODE(os.stat(existing).st_mode))
+            self.assertFalse(os.path.exists(new))
+
+            # a committed transaction keeps them
+            utilities.begin_transaction()
+            with utilities.unstaged_writes():
+                utilities.atomic_write(existing, "new\n")
+            self.assertTrue(utilities.commit_transaction())
+            self.assertEqual("new\n", open(existing).read())
+        finally:
+            utilities.rollback_transaction()
+            utilities.clear_changed_files()
+            shutil.rmtree(temp_dir)
+
     def test_get_set_membership(self):
         """
         Test get_set_membership functionality
@@ -100,6 +299,35 @@ class TestUtilities(unittest.TestCase):
         self.assertTrue(utilities.blank('unavAilablE'),
                         'blank did not indicate unavAilablE was a blank value')
 
+    def test_classad_quote(self):
+        """
+        Test that classad_quote quotes strings the way classad.quote does
+        """
+        expected = {'abc': '"abc"',
+                    'a"b': r'"a\"b"',
+                    'a\\b': r'"a\\b"',
+                    'a\nb\tc\r\a\b\f\v': r'"a\nb\tc\r\a\b\f\v"',
+                    "q?'x": '"q?\'x"',
+                    '\x01\x7f\x1f': r'"\001\177\037"',
+                    'caf\u00e9': r'"caf\303\251"',
+                    '': '""'}
+        for value, quoted in expected.items():
+            self.assertEqual(utilities.classad_quote(value), quoted, repr(value))
+        self.assertEqual(utilities.classad_quote(42), '"42"')
+        self.assertRaises(ValueError, utilities.classad_quote, 'a\x00b')
+
+    @unittest.skipIf(importlib.util.find_spec('classad') is None, "classad not available")
+    def test_classad_quote_bindings(self):
+        """
+        Test that classad_quote gives the same results as the HTCondor
+        bindings' classad.quote
+        """
+        import classad
+        values = ["it's", "'", 'back\\slash', '\\', 'both \\\' and "', 'caf\u00e9', '\u65e5\u672c \U0001f600',
+                  '\u00ff\\\u00e9\'', ''.join(chr(x) for x in range(1, 256)), 'a\nb\tc', '']
+        for value in values:
+            self.assertEqual(utilities.classad_quote(value), classad.quote(value), repr(value))
+
     def test_get_vos(self):
         """
         Test get_vos function
@@ -135,6 +363,77 @@ class TestUtilities(unittest.TestCase):
         self.assertTrue(utilities.any_rpms_installed('filesystem', '__foo__'))
         self.assertFalse(utilities.any_rpms_installed('__foo__', '__bar__'))
 
+    def test_rpm_oracle(self):
+        """
+        Test that rpm lookups are batched and remembered
+        """
+        queries = []
+
+        def fake_backend(rpm_names):
+            queries.append(list(rpm_names))
+            return {'htcondor-ce', 'filesystem'}.intersection(rpm_names)
+
+        utilities.set_rpm_backend(fake_backend)
+        try:
+            self.assertTrue(utilities.gateway_installed())
+            self.assertFalse(utilities.ce_installed())
+            self.assertTrue(utilities.rpm_installed('htcondor-ce'))
+            self.assertFalse(utilities.rpm_installed(['htcondor-ce', 'rsv-core']))
+            # the first query looked up every known rpm
+            self.assertEqual(1, len(queries))
+            self.assertEqual(set(utilities.KNOWN_RPMS), set(queries[0]))
+
+            self.assertTrue(utilities.any_rpms_installed('__foo__', 'filesystem'))
+            self.assertTrue(utilities.rpm_installed('filesystem'))
+            self.assertEqual(3, len(queries))
+            self.assertEqual(['__foo__'], queries[1])
+            self.assertEqual(['filesystem'], queries[2])
+
+            # after clearing, the rpms are looked up again
+            utilities.clear_rpm_cache()
+            self.assertTrue(utilities.gateway_installed())
+            self.assertEqual(4, len(queries))
+        finally:
+            utilities.set_rpm_backend()
+
+    def test_condor_config_view(self):
+        """
+        Test that condor_config_val lookups are batched and remembered
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            log_file = os.path.join(temp_dir, 'calls')
+            executable = os.path.join(temp_dir, 'condor_config_val')
+            with open(executable, 'w') as script:
+                script.write("""#!/bin/sh
+echo "$@" >> %s
+status=0
+for var in "$@"; do
+    case $var in
+        SPOOL) echo /var/lib/condor/spool ;;
+        EMPTY) echo ;;
+        -subsystem|SCHEDD) ;;
+        *) echo "Not defined: $var" >&2; status=1 ;;
+    esac
+done
+exit $status
+""" % log_file)
+            os.chmod(executable, 0o755)
+
+            view = utilities.condor_config_view(executable)
+            view.prefetch(['SPOOL', 'UNDEFINED', 'EMPTY'])
+            self.assertEqual('/var/lib/condor/spool', view.get('SPOOL'))
+            self.assertEqual('', utilities.get_condor_config_val('EMPTY', executable=executable))
+            self.assertIsNone(utilities.get_condor_config_val('UNDEFINED', executable=executable,
+                                                              quiet_undefined=True))
+            self.assertEqual('/var/lib/condor/spool',
+                             utilities.get_condor_config_val('SPOOL', executable=executable, subsystem='SCHEDD'))
+            with open(log_file) as calls:
+                self.assertEqual(["SPOOL UNDEFINED EMPTY", "-subsystem SCHEDD SPOOL"], calls.read().splitlines())
+        finally:
+            utilities.clear_condor_config_cache()
+            shutil.rmtree(temp_dir)
+
 
 if __name__ == '__main__':
     unittest.main()